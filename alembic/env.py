@@ -21,9 +21,13 @@ from app.infrastructure.database.models import Base
 # access to the values within the .ini file in use.
 config = context.config
 
+# Connection passed by DatabaseManager when it upgrades the schema on startup
+external_connection = config.attributes.get("connection")
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-if config.config_file_name is not None:
+# Skipped when running inside the bot so its logging setup is kept.
+if config.config_file_name is not None and external_connection is None:
     fileConfig(config.config_file_name)
 
 # Load environment variables and set sqlalchemy.url
@@ -77,6 +81,15 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    if external_connection is not None:
+        context.configure(
+            connection=external_connection, target_metadata=target_metadata
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
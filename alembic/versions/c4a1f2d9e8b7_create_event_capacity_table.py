@@ -0,0 +1,49 @@
+"""Create event capacity counters
+
+Revision ID: c4a1f2d9e8b7
+Revises: 79d8e5e1f53c
+Create Date: 2025-10-22 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a1f2d9e8b7"
+down_revision: Union[str, None] = "79d8e5e1f53c"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if "event_capacity" not in inspector.get_table_names():
+        op.create_table(
+            "event_capacity",
+            sa.Column("event_id", sa.String(length=32), primary_key=True),
+            sa.Column("group_id", sa.String(length=32), nullable=False),
+            sa.Column("capacity", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("taken", sa.Integer(), nullable=False, server_default="0"),
+        )
+        op.create_index("ix_event_capacity_group_id", "event_capacity", ["group_id"], unique=False)
+
+    # Лимиты берутся из расписания при первой регистрации, здесь переносим только занятые места
+    op.execute(
+        """
+        INSERT INTO event_capacity (event_id, group_id, capacity, taken)
+        SELECT event_id, MAX(group_id), 0, COUNT(*)
+        FROM event_registrations
+        GROUP BY event_id
+        ON CONFLICT (event_id) DO UPDATE SET taken = EXCLUDED.taken
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_event_capacity_group_id", table_name="event_capacity")
+    op.drop_table("event_capacity")
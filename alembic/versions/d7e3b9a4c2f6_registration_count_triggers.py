@@ -0,0 +1,184 @@
+"""Maintain registration counters with triggers and notify about changes
+
+Revision ID: d7e3b9a4c2f6
+Revises: c4a1f2d9e8b7
+Create Date: 2025-10-23 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7e3b9a4c2f6"
+down_revision: Union[str, None] = "c4a1f2d9e8b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if "debate_case_counts" not in inspector.get_table_names():
+        op.create_table(
+            "debate_case_counts",
+            sa.Column("case_number", sa.Integer(), primary_key=True),
+            sa.Column("registered", sa.Integer(), nullable=False, server_default="0"),
+        )
+
+    op.execute(
+        """
+        INSERT INTO debate_case_counts (case_number, registered)
+        SELECT debate_reg, COUNT(*)
+        FROM users
+        WHERE debate_reg IS NOT NULL
+        GROUP BY debate_reg
+        ON CONFLICT (case_number) DO UPDATE SET registered = EXCLUDED.registered
+        """
+    )
+
+    # Счётчики мест могли разойтись, пока их вёл код приложения – пересчитываем перед включением триггеров
+    op.execute("UPDATE event_capacity SET taken = 0")
+    op.execute(
+        """
+        INSERT INTO event_capacity (event_id, group_id, capacity, taken)
+        SELECT event_id, MAX(group_id), 0, COUNT(*)
+        FROM event_registrations
+        GROUP BY event_id
+        ON CONFLICT (event_id) DO UPDATE SET taken = EXCLUDED.taken, group_id = EXCLUDED.group_id
+        """
+    )
+
+    # Уникальный номер нужен, чтобы Postgres не склеивал одинаковые уведомления одной транзакции
+    op.execute("CREATE SEQUENCE IF NOT EXISTS registration_counts_nid_seq")
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION notify_registration_counts(payload jsonb) RETURNS void AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'registration_counts',
+                (payload || jsonb_build_object(
+                    'nid', nextval('registration_counts_nid_seq'),
+                    'source', COALESCE(current_setting('app.counts_source', true), '')
+                ))::text
+            );
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION users_debate_counts() RETURNS trigger AS $$
+        DECLARE
+            old_case integer;
+            new_case integer;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_case := OLD.debate_reg;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_case := NEW.debate_reg;
+            END IF;
+            IF old_case IS NOT DISTINCT FROM new_case THEN
+                RETURN NULL;
+            END IF;
+
+            IF old_case IS NOT NULL THEN
+                UPDATE debate_case_counts
+                SET registered = GREATEST(registered - 1, 0)
+                WHERE case_number = old_case;
+            END IF;
+            IF new_case IS NOT NULL THEN
+                INSERT INTO debate_case_counts (case_number, registered)
+                VALUES (new_case, 1)
+                ON CONFLICT (case_number) DO UPDATE SET registered = debate_case_counts.registered + 1;
+            END IF;
+
+            PERFORM notify_registration_counts(jsonb_build_object(
+                'kind', 'debate',
+                'user_id', COALESCE(NEW.id, OLD.id),
+                'old_case', old_case,
+                'new_case', new_case
+            ));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION event_registrations_counts() RETURNS trigger AS $$
+        DECLARE
+            old_event varchar;
+            old_group varchar;
+            new_event varchar;
+            new_group varchar;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_event := OLD.event_id;
+                old_group := OLD.group_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_event := NEW.event_id;
+                new_group := NEW.group_id;
+            END IF;
+            IF old_event IS NOT DISTINCT FROM new_event AND old_group IS NOT DISTINCT FROM new_group THEN
+                RETURN NULL;
+            END IF;
+
+            IF old_event IS NOT NULL THEN
+                UPDATE event_capacity
+                SET taken = GREATEST(taken - 1, 0)
+                WHERE event_id = old_event;
+            END IF;
+            IF new_event IS NOT NULL THEN
+                INSERT INTO event_capacity (event_id, group_id, capacity, taken)
+                VALUES (new_event, new_group, 0, 1)
+                ON CONFLICT (event_id) DO UPDATE
+                SET taken = event_capacity.taken + 1, group_id = EXCLUDED.group_id;
+            END IF;
+
+            PERFORM notify_registration_counts(jsonb_build_object(
+                'kind', 'event',
+                'user_id', COALESCE(NEW.user_id, OLD.user_id),
+                'old_event', old_event,
+                'old_group', old_group,
+                'new_event', new_event,
+                'new_group', new_group
+            ));
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+
+    op.execute(
+        """
+        CREATE TRIGGER trg_users_debate_counts
+        AFTER INSERT OR DELETE OR UPDATE OF debate_reg ON users
+        FOR EACH ROW EXECUTE FUNCTION users_debate_counts()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER trg_event_registrations_counts
+        AFTER INSERT OR DELETE OR UPDATE OF event_id, group_id ON event_registrations
+        FOR EACH ROW EXECUTE FUNCTION event_registrations_counts()
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_event_registrations_counts ON event_registrations")
+    op.execute("DROP TRIGGER IF EXISTS trg_users_debate_counts ON users")
+    op.execute("DROP FUNCTION IF EXISTS event_registrations_counts()")
+    op.execute("DROP FUNCTION IF EXISTS users_debate_counts()")
+    op.execute("DROP FUNCTION IF EXISTS notify_registration_counts(jsonb)")
+    op.execute("DROP SEQUENCE IF EXISTS registration_counts_nid_seq")
+    op.drop_table("debate_case_counts")
@@ -1,5 +1,8 @@
 import asyncio
 import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
@@ -7,7 +10,7 @@ from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
 from aiogram_dialog import setup_dialogs
 from redis.asyncio import Redis
 
-from config.config import load_config
+from config.config import get_config_provider
 from app.bot.handlers.commands import router as commands_router
 from app.bot.middlewares.error_handler import ErrorHandlerMiddleware
 from app.bot.middlewares.config import ConfigMiddleware
@@ -15,6 +18,10 @@ from app.bot.middlewares.logging_context import LoggingContextMiddleware
 from app.infrastructure.database import DatabaseManager, RedisManager
 from app.infrastructure.google_sheets import GoogleSheetsManager
 from app.infrastructure.timetable_media import ensure_timetable_media
+from app.infrastructure.timetable_reload import TimetableReloader
+from app.bot.dialogs.timetable.waitlist import WaitlistPromoter
+from app.bot.dialogs.timetable.counts_feed import RegistrationCountsFeed
+from app.bot.dialogs.timetable.counts_reconciler import CountsReconciler
 
 # Импорт всех диалогов
 from app.bot.dialogs.start import start_dialog
@@ -30,6 +37,19 @@ from app.infrastructure.telegram_logging import start_log_worker
 logger = logging.getLogger(__name__)
 
 
+@contextmanager
+def _timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - started
+
+
+def _format_startup_timings(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage} {seconds:.3f} s" for stage, seconds in timings.items())
+
+
 async def setup_redis_storage(config) -> RedisStorage:
     """Настройка Redis storage для FSM"""
     if config.redis.password:
@@ -62,6 +82,8 @@ async def setup_database_and_redis(config) -> tuple[DatabaseManager, RedisManage
     # Инициализация RedisManager 
     redis_manager = RedisManager(config.redis)
     await redis_manager.init()
+    if config.redis.user_snapshots:
+        db_manager.attach_user_snapshots(redis_manager)
     
     # Инициализация GoogleSheetsManager
     google_sheets_manager = GoogleSheetsManager(
@@ -97,13 +119,22 @@ class DatabaseMiddleware:
         data["db_manager"] = self.db_manager
         data["redis_manager"] = self.redis_manager
         data["google_sheets_manager"] = self.google_sheets_manager
-        return await handler(event, data)
+        if not self.db_manager.config.session_per_update:
+            return await handler(event, data)
+        # Одна сессия и одно подключение из пула на всё обновление (геттеры, хендлеры)
+        async with self.db_manager.unit_of_work():
+            return await handler(event, data)
 
 
 async def main():
     """Основная функция запуска бота"""
+    startup_started = time.perf_counter()
+    startup_timings: Dict[str, float] = {}
+
     logger.info("Loading configuration...")
-    config = load_config()
+    with _timed(startup_timings, "config"):
+        config_provider = get_config_provider()
+        config = config_provider.config
     
     logger.info("Starting bot...")
     
@@ -114,21 +145,40 @@ async def main():
     )
     
     # Настройка Redis storage
-    storage = await setup_redis_storage(config)
+    with _timed(startup_timings, "fsm_storage"):
+        storage = await setup_redis_storage(config)
     
     # Настройка базы данных, Redis и Google Sheets
-    db_manager, redis_manager, google_sheets_manager = await setup_database_and_redis(config)
+    with _timed(startup_timings, "database_redis_sheets"):
+        db_manager, redis_manager, google_sheets_manager = await setup_database_and_redis(config)
+    startup_timings["db_schema_check"] = db_manager.init_timings.get("schema_check", 0.0)
+    
+    # Перезагрузка расписания на лету: миграция регистраций и сброс кешей
+    timetable_reloader = TimetableReloader(db_manager, redis_manager)
+    config_provider.add_listener(timetable_reloader.on_config_reloaded)
+
+    # Автоматическая запись из листа ожидания при освобождении мест
+    waitlist_promoter = WaitlistPromoter(bot, db_manager, redis_manager, config_provider)
+
+    # Изменения регистраций из утилит и ручного SQL приходят через LISTEN/NOTIFY
+    counts_feed = RegistrationCountsFeed(db_manager, redis_manager, config_provider, waitlist_promoter)
+    # Периодическая сверка счётчиков Redis с БД
+    counts_reconciler = CountsReconciler(db_manager, redis_manager, config_provider)
     
     # Создание диспетчера
     dp = Dispatcher(storage=storage)
     
     # Добавление данных в диспетчер
     dp["config"] = config
+    dp["config_provider"] = config_provider
+    dp["timetable_reloader"] = timetable_reloader
+    dp["waitlist_promoter"] = waitlist_promoter
+    dp["counts_reconciler"] = counts_reconciler
     dp["bot"] = bot
     
     # Подключение middleware
     dp.update.middleware(LoggingContextMiddleware())  # Добавляем первым для контекста логов
-    dp.update.middleware(ConfigMiddleware(config))
+    dp.update.middleware(ConfigMiddleware(config_provider))
     dp.update.middleware(DatabaseMiddleware(db_manager, redis_manager, google_sheets_manager))  # Добавляем DB middleware
     dp.update.middleware(ErrorHandlerMiddleware())
     
@@ -154,12 +204,23 @@ async def main():
     setup_dialogs(dp)
 
     # Обеспечиваем наличие актуальных file_id для иллюстраций расписания
-    try:
-        timetable_media = await ensure_timetable_media(bot)
-        dp["config"].timetable_media = timetable_media
-    except Exception as media_exc:  # noqa: BLE001
-        logger.exception("Failed to prepare timetable media", exc_info=media_exc)
+    with _timed(startup_timings, "timetable_media"):
+        try:
+            timetable_media = await ensure_timetable_media(bot)
+            config_provider.config.set_timetable_media(timetable_media)
+        except Exception as media_exc:  # noqa: BLE001
+            logger.exception("Failed to prepare timetable media", exc_info=media_exc)
     
+    # Фоновая проверка изменений конфигурации и расписания (hot reload)
+    config_watch_task = asyncio.create_task(config_provider.watch())
+    waitlist_task = asyncio.create_task(waitlist_promoter.run())
+    # Сброс локального кеша Redis по сообщениям других инстансов
+    cache_invalidation_task = asyncio.create_task(redis_manager.listen_for_invalidations())
+    counts_feed_task = asyncio.create_task(counts_feed.run())
+    reconciler_task = asyncio.create_task(counts_reconciler.run())
+
+    startup_timings["total"] = time.perf_counter() - startup_started
+    logger.info("Startup timings: %s", _format_startup_timings(startup_timings))
     logger.info("Bot started successfully!")
     
     try:
@@ -171,6 +232,13 @@ async def main():
         # Закрытие соединений
         logger.info("Shutting down...")
         
+        for task in (config_watch_task, waitlist_task, cache_invalidation_task, counts_feed_task, reconciler_task):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
         # Останавливаем воркер уведомлений
         if log_worker_task and not log_worker_task.done():
             log_worker_task.cancel()
@@ -40,7 +40,7 @@ registration_dialog = Dialog(
         getter=get_debate_registration_data,
     ),
     Window(
-        Format("<b>Подтверждение регистрации</b>\n\nВы хотите зарегистрироваться на кейс <b>{case_name}</b>?"),
+        Format("<b>Подтверждение регистрации</b>\n\nВы хотите зарегистрироваться на кейс <b>{case_name}</b>?\n\n<i>⏳ Место закреплено за вами на {hold_minutes} мин.</i>"),
         Row(
             Button(
                 Const("✅ Подтвердить"),
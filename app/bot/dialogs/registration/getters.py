@@ -14,8 +14,8 @@ async def get_debate_registration_data(dialog_manager: DialogManager, **kwargs)
     user_id = dialog_manager.event.from_user.id
     user_registration = await db_manager.check_user_already_registered(user_id)
     
-    # Get remaining slots for each case
-    remaining = await redis_manager.get_remaining_slots()
+    # Get remaining slots for each case (seats held on the confirm screen are shown separately)
+    remaining, held = await redis_manager.get_debate_availability()
     
     # Get case names
     case_names = {
@@ -29,7 +29,10 @@ async def get_debate_registration_data(dialog_manager: DialogManager, **kwargs)
     for case_num in (1,2,4):
         name = case_names[case_num]
         remaining_count = remaining[case_num]
-        cases_text.append(f"— <b>{name}</b>\n<i>Осталось мест: {remaining_count}</i>")
+        case_text = f"— <b>{name}</b>\n<i>Осталось мест: {remaining_count}</i>"
+        if held.get(case_num):
+            case_text += f"\n<i>⏳ Ещё {held[case_num]} — ожидают подтверждения</i>"
+        cases_text.append(case_text)
     
     # Format button texts with lock emoji for unavailable cases
     vtb_text = "ВТБ" if remaining[1] > 0 else "🔒 ВТБ"
@@ -78,7 +81,8 @@ async def get_confirmation_data(dialog_manager: DialogManager, **kwargs) -> Dict
     
     return {
         "case_name": case_name,
-        "case_number": case_number
+        "case_number": case_number,
+        "hold_minutes": RedisManager.DEBATE_HOLD_TTL_SECONDS // 60,
     }
 
 
@@ -6,6 +6,7 @@ from aiogram_dialog import DialogManager
 from aiogram_dialog.widgets.kbd import Button
 
 from app.infrastructure.database import DatabaseManager, RedisManager
+from config.config import ConfigProvider
 from .states import RegistrationSG
 from .utils import GENERIC_REGISTRATION_ERROR_MESSAGE
 
@@ -22,12 +23,6 @@ async def on_case_selected(callback: CallbackQuery, button: Button, dialog_manag
     
     user_id = callback.from_user.id
     
-    # Check if there are available slots first - if not, ignore the action
-    if not await redis_manager.can_register_for_case(case_num):
-        # Silently ignore the action for locked cases
-        await callback.answer()
-        return
-    
     # Check if user is already registered
     existing_registration = await db_manager.check_user_already_registered(user_id)
     if existing_registration:
@@ -45,6 +40,20 @@ async def on_case_selected(callback: CallbackQuery, button: Button, dialog_manag
             )
         return
     
+    # Hold a seat while the user is on the confirmation screen
+    previous_case = dialog_manager.dialog_data.get("selected_case")
+    if previous_case and previous_case != case_num:
+        await redis_manager.release_debate_hold(previous_case, user_id)
+    held, _ = await redis_manager.hold_debate_case(case_num, user_id)
+    if held is None:
+        db_counts = await db_manager.get_debate_registrations_count()
+        await redis_manager.sync_with_database(db_counts)
+        held, _ = await redis_manager.hold_debate_case(case_num, user_id)
+    if not held:
+        # Silently ignore the action for locked cases
+        await callback.answer()
+        return
+    
     # Store selected case and move to confirmation
     dialog_manager.dialog_data["selected_case"] = case_num
     await dialog_manager.switch_to(RegistrationSG.confirm)
@@ -62,18 +71,10 @@ async def on_confirm_registration(callback: CallbackQuery, button: Button, dialo
     
     user_id = callback.from_user.id
     
-    # Double-check availability to prevent race conditions
-    if not await redis_manager.can_register_for_case(case_number):
-        await callback.answer(
-            "К сожалению, места на этот кейс закончились!",
-            show_alert=True
-        )
-        await dialog_manager.switch_to(RegistrationSG.main)
-        return
-    
     # Check if user is already registered (double check)
     existing_registration = await db_manager.check_user_already_registered(user_id)
     if existing_registration:
+        await redis_manager.release_debate_hold(case_number, user_id)
         await callback.answer(
             f"Вы уже зарегистрированы на кейс {await redis_manager.get_case_name(existing_registration)}!",
             show_alert=True
@@ -82,15 +83,32 @@ async def on_confirm_registration(callback: CallbackQuery, button: Button, dialo
         return
     
     try:
-        # Update database
-        success = await db_manager.update_user_debate_registration(user_id, case_number)
+        # Atomically turn the hold into a seat (or take a free one if the hold expired)
+        admitted, _ = await redis_manager.admit_debate_case(case_number, user_id)
+        if admitted is None:
+            db_counts = await db_manager.get_debate_registrations_count()
+            await redis_manager.sync_with_database(db_counts)
+            admitted, _ = await redis_manager.admit_debate_case(case_number, user_id)
+        if not admitted:
+            await callback.answer(
+                "К сожалению, места на этот кейс закончились!",
+                show_alert=True
+            )
+            await dialog_manager.switch_to(RegistrationSG.main)
+            return
+        
+        # Update database; return the seat if the write didn't happen
+        try:
+            success = await db_manager.register_user_debate_case(user_id, case_number)
+        except Exception:
+            await redis_manager.release_debate_case(case_number)
+            raise
         if not success:
+            await redis_manager.release_debate_case(case_number)
             await callback.answer(GENERIC_REGISTRATION_ERROR_MESSAGE, show_alert=True)
+            await dialog_manager.switch_to(RegistrationSG.main)
             return
         
-        # Update Redis cache
-        await redis_manager.increment_debate_count(case_number)
-        
         case_name = await redis_manager.get_case_name(case_number)
         await callback.answer(
             f"Вы успешно зарегистрированы на кейс {case_name}!",
@@ -101,10 +119,9 @@ async def on_confirm_registration(callback: CallbackQuery, button: Button, dialo
         
         # Уведомляем админов о новой регистрации
         try:
-            from config.config import load_config
-            config = load_config()
+            config_provider: ConfigProvider = dialog_manager.middleware_data["config_provider"]
             
-            if config.logging.admin_ids:
+            if config_provider.admin_ids:
                 bot = dialog_manager.middleware_data.get("bot")
                 if bot:
                     user_info = callback.from_user
@@ -119,7 +136,7 @@ async def on_confirm_registration(callback: CallbackQuery, button: Button, dialo
                         f"<b>Время:</b> {callback.message.date.strftime('%H:%M:%S')}"
                     )
                     
-                    for admin_id in config.logging.admin_ids:
+                    for admin_id in config_provider.admin_ids:
                         try:
                             await bot.send_message(admin_id, admin_message, parse_mode="HTML")
                         except Exception:
@@ -137,6 +154,10 @@ async def on_confirm_registration(callback: CallbackQuery, button: Button, dialo
 
 async def on_cancel_registration(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
     """Handler for registration cancellation"""
+    case_number = dialog_manager.dialog_data.pop("selected_case", None)
+    if case_number:
+        redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
+        await redis_manager.release_debate_hold(case_number, callback.from_user.id)
     await dialog_manager.switch_to(RegistrationSG.main)
 
 
@@ -164,8 +185,8 @@ async def on_confirm_unregister(callback: CallbackQuery, button: Button, dialog_
     user_id = callback.from_user.id
     
     try:
-        # Check current registration
-        existing_registration = await db_manager.check_user_already_registered(user_id)
+        # Remove registration from database
+        existing_registration = await db_manager.clear_user_debate_registration(user_id)
         if not existing_registration:
             await callback.answer("Вы не зарегистрированы на дебаты", show_alert=True)
             await dialog_manager.switch_to(RegistrationSG.main)
@@ -173,15 +194,8 @@ async def on_confirm_unregister(callback: CallbackQuery, button: Button, dialog_
         
         old_case_name = await redis_manager.get_case_name(existing_registration)
         
-        # Remove registration from database
-        success = await db_manager.update_user_debate_registration(user_id, None)
-        if not success:
-            await callback.answer(GENERIC_REGISTRATION_ERROR_MESSAGE, show_alert=True)
-            return
-        
-        # Sync Redis cache with database
-        db_counts = await db_manager.get_debate_registrations_count()
-        await redis_manager.sync_with_database(db_counts)
+        # Return the seat to the case pool
+        await redis_manager.release_debate_case(existing_registration)
         
         await callback.answer(
             f"Регистрация на кейс {old_case_name} отменена",
@@ -192,10 +206,9 @@ async def on_confirm_unregister(callback: CallbackQuery, button: Button, dialog_
         
         # Notify admins about unregistration
         try:
-            from config.config import load_config
-            config = load_config()
+            config_provider: ConfigProvider = dialog_manager.middleware_data["config_provider"]
             
-            if config.logging.admin_ids:
+            if config_provider.admin_ids:
                 bot = dialog_manager.middleware_data.get("bot")
                 if bot:
                     user_info = callback.from_user
@@ -210,7 +223,7 @@ async def on_confirm_unregister(callback: CallbackQuery, button: Button, dialog_
                         f"<b>Время:</b> {callback.message.date.strftime('%H:%M:%S')}"
                     )
                     
-                    for admin_id in config.logging.admin_ids:
+                    for admin_id in config_provider.admin_ids:
                         try:
                             await bot.send_message(admin_id, admin_message, parse_mode="HTML")
                         except Exception:
@@ -0,0 +1,274 @@
+"""Registration write path shared by parallel groups and VR-lab slots.
+
+By default every attempt goes to Postgres and group counts are recounted
+afterwards. With ``REDIS_SEAT_RESERVATION`` enabled a Lua script reserves the
+seat in Redis first: rejections (full event, already registered) never reach
+the database, and only confirmed reservations are written to Postgres, with
+the reservation rolled back if that write fails.
+
+VR-lab slots are additionally mirrored into per-room Redis bitmaps, so the
+earliest free slot is found with BITPOS and claimed with a single bit-set.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+from app.infrastructure.database.database import EventRegistrationResult, EventRegistrationStatus
+from config.config import Config
+from .group_counts import group_counts_loader
+from .registry import timetable_registry
+from .vr_lab import VR_LAB_GROUP_ID, VrLabLayout, build_slot_event_id, parse_slot_event_id
+
+if TYPE_CHECKING:
+    from .waitlist import WaitlistPromoter
+
+logger = logging.getLogger(__name__)
+
+SEAT_TAKEN_STATUSES = {EventRegistrationStatus.SUCCESS, EventRegistrationStatus.SWITCHED}
+
+
+async def _apply_group_delta(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    group_id: str,
+    deltas: Dict[str, int],
+) -> None:
+    """Adjust cached counts in place; recount from the DB only if the group isn't cached."""
+    if not await redis_manager.apply_event_group_delta(group_id, deltas):
+        await group_counts_loader.get(db_manager, redis_manager, group_id)
+
+
+async def _register_in_database(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    user_id: int,
+    event_id: str,
+    group_id: str,
+    capacity: int,
+) -> EventRegistrationResult:
+    result = await db_manager.register_user_for_event(user_id, event_id, group_id, capacity)
+    if result.status == EventRegistrationStatus.SUCCESS:
+        await _apply_group_delta(db_manager, redis_manager, group_id, {event_id: 1})
+    elif result.status == EventRegistrationStatus.SWITCHED:
+        await _apply_group_delta(
+            db_manager, redis_manager, group_id, {event_id: 1, result.previous_event_id: -1}
+        )
+    elif result.status == EventRegistrationStatus.GROUP_FULL:
+        # Кеш мог показывать свободные места – пересчитываем группу из БД
+        await group_counts_loader.refresh(db_manager, redis_manager, group_id)
+
+    if result.status in SEAT_TAKEN_STATUSES:
+        await redis_manager.set_user_registration(user_id, group_id, event_id)
+    return result
+
+
+async def _reserve_seat(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    user_id: int,
+    event_id: str,
+    group_id: str,
+    capacity: int,
+):
+    status, previous_event_id = await redis_manager.reserve_event_seat(group_id, user_id, event_id, capacity)
+    if status == "MISS":
+        members = await db_manager.get_group_members(group_id)
+        await redis_manager.prime_event_group(group_id, members)
+        status, previous_event_id = await redis_manager.reserve_event_seat(group_id, user_id, event_id, capacity)
+    return status, previous_event_id
+
+
+async def _register_with_reservation(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    user_id: int,
+    event_id: str,
+    group_id: str,
+    capacity: int,
+) -> EventRegistrationResult:
+    reservation, previous_event_id = await _reserve_seat(
+        db_manager, redis_manager, user_id, event_id, group_id, capacity
+    )
+    if reservation == "FULL":
+        return EventRegistrationResult(EventRegistrationStatus.GROUP_FULL)
+    if reservation == "ALREADY":
+        return EventRegistrationResult(EventRegistrationStatus.ALREADY_REGISTERED_THIS)
+    if reservation != "OK":
+        logger.warning("Seat reservation for group %s unavailable (%s), using database only", group_id, reservation)
+        return await _register_in_database(db_manager, redis_manager, user_id, event_id, group_id, capacity)
+
+    try:
+        result = await db_manager.register_user_for_event(user_id, event_id, group_id, capacity)
+    except Exception:
+        await redis_manager.move_event_seat(group_id, user_id, event_id, previous_event_id)
+        raise
+
+    if result.status in SEAT_TAKEN_STATUSES:
+        await redis_manager.set_user_registration(user_id, group_id, event_id)
+    elif result.status in {EventRegistrationStatus.GROUP_FULL, EventRegistrationStatus.ALREADY_REGISTERED_THIS}:
+        # Redis разошёлся с БД – сбрасываем группу, при следующей попытке она загрузится заново
+        logger.warning("Seat cache of group %s diverged from database (%s), resetting", group_id, result.status.value)
+        await redis_manager.invalidate_event_groups([group_id])
+    else:
+        await redis_manager.move_event_seat(group_id, user_id, event_id, previous_event_id)
+    return result
+
+
+async def register_for_event(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    config: Config,
+    user_id: int,
+    event_id: str,
+    group_id: str,
+    capacity: int,
+    waitlist: Optional["WaitlistPromoter"] = None,
+) -> EventRegistrationResult:
+    """Register user for the event, switching from another event of the group if needed."""
+    if config.redis.seat_reservation:
+        result = await _register_with_reservation(db_manager, redis_manager, user_id, event_id, group_id, capacity)
+    else:
+        result = await _register_in_database(db_manager, redis_manager, user_id, event_id, group_id, capacity)
+
+    if group_id == VR_LAB_GROUP_ID:
+        if result.status in SEAT_TAKEN_STATUSES or result.status == EventRegistrationStatus.GROUP_FULL:
+            await mark_vr_slot(redis_manager, config, event_id, True)
+        if result.previous_event_id:
+            await mark_vr_slot(redis_manager, config, result.previous_event_id, False)
+
+    if result.status in SEAT_TAKEN_STATUSES:
+        await redis_manager.leave_waitlist(event_id, user_id)
+        if result.previous_event_id and waitlist:
+            await waitlist.seat_freed(group_id, result.previous_event_id)
+    elif result.status == EventRegistrationStatus.USER_NOT_FOUND:
+        # Строки пользователя нет в БД: /start должен создать её заново, а не довериться кешу
+        await redis_manager.forget_known_user(user_id)
+        if config.redis.user_snapshots:
+            await redis_manager.invalidate_user_snapshot(user_id)
+    return result
+
+
+async def unregister_from_event(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    config: Config,
+    user_id: int,
+    group_id: str,
+    waitlist: Optional["WaitlistPromoter"] = None,
+) -> Optional[str]:
+    """Cancel user's registration in the group; returns the event the seat was freed in."""
+    removed_event_id = await db_manager.unregister_user_from_event(user_id, group_id)
+    if not removed_event_id:
+        return None
+
+    if config.redis.seat_reservation:
+        if not await redis_manager.move_event_seat(group_id, user_id, removed_event_id, ""):
+            await redis_manager.invalidate_event_groups([group_id])
+    else:
+        await _apply_group_delta(db_manager, redis_manager, group_id, {removed_event_id: -1})
+    await redis_manager.set_user_registration(user_id, group_id, None)
+    if group_id == VR_LAB_GROUP_ID:
+        await mark_vr_slot(redis_manager, config, removed_event_id, False)
+    if waitlist:
+        await waitlist.seat_freed(group_id, removed_event_id)
+    return removed_event_id
+
+
+async def mark_vr_slot(redis_manager: RedisManager, config: Config, event_id: str, taken: bool) -> None:
+    layout = timetable_registry.get_vr_lab_layout(config.timetable)
+    parsed = parse_slot_event_id(event_id)
+    slot_index = layout.slot_index(parsed[1]) if parsed else None
+    if parsed and slot_index is not None and parsed[0] in layout.rooms:
+        await redis_manager.set_slot_taken(VR_LAB_GROUP_ID, layout.layout_key, parsed[0], slot_index, taken)
+
+
+async def _prime_vr_slots(db_manager: DatabaseManager, redis_manager: RedisManager, layout: VrLabLayout) -> None:
+    counts = await group_counts_loader.get(db_manager, redis_manager, VR_LAB_GROUP_ID)
+    await redis_manager.prime_slot_bitmaps(
+        VR_LAB_GROUP_ID, layout.layout_key, layout.slots_per_room, layout.taken_slot_indexes(counts)
+    )
+
+
+async def load_vr_slot_occupancy(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    layout: VrLabLayout,
+) -> Dict[str, Tuple[bool, ...]]:
+    """Return room -> taken flags per slot from the bitmaps, priming them from the DB on a miss."""
+    occupancy = await redis_manager.get_slot_occupancy(
+        VR_LAB_GROUP_ID, layout.layout_key, layout.rooms, layout.slots_per_room
+    )
+    if occupancy is None:
+        await _prime_vr_slots(db_manager, redis_manager, layout)
+        occupancy = await redis_manager.get_slot_occupancy(
+            VR_LAB_GROUP_ID, layout.layout_key, layout.rooms, layout.slots_per_room
+        )
+    return occupancy or {room: (False,) * layout.slots_per_room for room in layout.rooms}
+
+
+async def get_user_registrations(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    user_id: Optional[int],
+) -> Dict[str, str]:
+    """Return user's group_id -> event_id mapping, rebuilding the Redis copy on a miss."""
+    if user_id is None:
+        return {}
+
+    registrations, epoch, version = await redis_manager.get_user_registrations(user_id)
+    if registrations is None:
+        registrations = await db_manager.get_user_group_registrations(user_id)
+        await redis_manager.set_user_registrations(user_id, registrations, epoch, version)
+    return registrations
+
+
+async def book_nearest_vr_slot(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    config: Config,
+    user_id: int,
+    waitlist: Optional["WaitlistPromoter"] = None,
+) -> Tuple[EventRegistrationResult, Optional[str]]:
+    """Register user for the earliest free VR-lab slot in any room; returns the result and slot event_id.
+
+    A user who already holds a slot gets ALREADY_REGISTERED_THIS with that slot
+    instead of being switched to the next free one.
+    """
+    current_event_id = (await get_user_registrations(db_manager, redis_manager, user_id)).get(VR_LAB_GROUP_ID)
+    if current_event_id:
+        return EventRegistrationResult(EventRegistrationStatus.ALREADY_REGISTERED_THIS), current_event_id
+
+    layout = timetable_registry.get_vr_lab_layout(config.timetable)
+    primed = False
+    # Каждая неудачная попытка оставляет бит занятым, поэтому цикл конечен
+    for _ in range(len(layout.rooms) * layout.slots_per_room + 1):
+        status, room, slot_index = await redis_manager.claim_free_slot(
+            VR_LAB_GROUP_ID, layout.layout_key, layout.rooms, layout.slots_per_room
+        )
+        if status == "MISS" and not primed:
+            await _prime_vr_slots(db_manager, redis_manager, layout)
+            primed = True
+            continue
+        if status != "OK":
+            return EventRegistrationResult(EventRegistrationStatus.GROUP_FULL), None
+
+        event_id = build_slot_event_id(room, layout.slot_times[slot_index])
+        try:
+            result = await register_for_event(
+                db_manager, redis_manager, config, user_id, event_id, VR_LAB_GROUP_ID, 1, waitlist=waitlist
+            )
+        except Exception:
+            await redis_manager.set_slot_taken(VR_LAB_GROUP_ID, layout.layout_key, room, slot_index, False)
+            raise
+
+        if result.status == EventRegistrationStatus.GROUP_FULL:
+            # Битовая карта отстала от БД – слот действительно занят, пробуем следующий
+            continue
+        if result.status not in SEAT_TAKEN_STATUSES and result.status != EventRegistrationStatus.ALREADY_REGISTERED_THIS:
+            await redis_manager.set_slot_taken(VR_LAB_GROUP_ID, layout.layout_key, room, slot_index, False)
+        return result, event_id
+
+    return EventRegistrationResult(EventRegistrationStatus.GROUP_FULL), None
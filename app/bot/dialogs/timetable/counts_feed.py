@@ -0,0 +1,135 @@
+"""Incremental Redis updates from the registration counters feed.
+
+Triggers on ``users.debate_reg`` and ``event_registrations`` keep counters in
+Postgres and NOTIFY every change. The bot applies its own writes to Redis right
+away and tags them, so only changes made elsewhere (tools, ad-hoc SQL) are
+replayed here: cached counts, per-user registrations and VR-lab bitmaps are
+adjusted in place and freed seats are offered to the waitlist. Every bot instance listens, the
+first one to claim a notification in Redis applies it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+from app.infrastructure.database.database import COUNTS_SOURCE_APPLIED, REGISTRATION_COUNTS_CHANNEL
+from config.config import ConfigProvider
+from .booking import mark_vr_slot
+from .vr_lab import VR_LAB_GROUP_ID
+from .waitlist import WaitlistPromoter
+
+logger = logging.getLogger(__name__)
+
+HEALTHCHECK_INTERVAL_SECONDS = 30.0
+RECONNECT_DELAY_SECONDS = 5.0
+
+
+class RegistrationCountsFeed:
+    """LISTENs for counter changes and mirrors them into Redis."""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        config_provider: ConfigProvider,
+        waitlist: Optional[WaitlistPromoter] = None,
+    ):
+        self.db_manager = db_manager
+        self.redis_manager = redis_manager
+        self.config_provider = config_provider
+        self.waitlist = waitlist
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+
+    async def run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await self.db_manager.listen(REGISTRATION_COUNTS_CHANNEL, self._queue.put_nowait)
+                # Изменения, сделанные без подписки, не восстановить – сбрасываем кеши счётчиков
+                await self._resync()
+                await self._consume(connection)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Registration counts feed lost: %s", exc)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def _consume(self, connection) -> None:
+        while not connection.is_closed():
+            try:
+                payload = await asyncio.wait_for(self._queue.get(), HEALTHCHECK_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                await connection.execute("SELECT 1")
+                continue
+            try:
+                await self._apply(json.loads(payload))
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Failed to apply registration counts change %s", payload, exc_info=exc)
+
+    async def _resync(self) -> None:
+        # Счётчики дебатов не перезаписываем: в Redis могут быть места, ещё не записанные в БД.
+        # Расхождения, накопившиеся без подписки, исправит сверка (CountsReconciler)
+        db_counts = await self.db_manager.get_debate_registrations_count()
+        await self.redis_manager.seed_debate_counts(db_counts)
+        group_ids = [*self.config_provider.config.timetable.events_by_group, VR_LAB_GROUP_ID]
+        await self.redis_manager.invalidate_event_groups(group_ids)
+        await self.redis_manager.bump_registrations_epoch()
+
+    async def _apply(self, change: Dict[str, Any]) -> None:
+        if change.get("source") == COUNTS_SOURCE_APPLIED:
+            return
+        if not await self.redis_manager.claim_counts_notification(change["nid"]):
+            return
+
+        if change["kind"] == "debate":
+            await self._apply_debate(change)
+        elif change["kind"] == "event":
+            await self._apply_event(change)
+
+    async def _apply_debate(self, change: Dict[str, Any]) -> None:
+        deltas: Dict[int, int] = {}
+        if change.get("old_case") is not None:
+            deltas[change["old_case"]] = deltas.get(change["old_case"], 0) - 1
+        if change.get("new_case") is not None:
+            deltas[change["new_case"]] = deltas.get(change["new_case"], 0) + 1
+        await self.redis_manager.apply_debate_count_delta({case: delta for case, delta in deltas.items() if delta})
+        if self.db_manager.user_snapshots is not None:
+            await self.redis_manager.invalidate_user_snapshot(int(change["user_id"]))
+        logger.info("Debate counts of user %s changed outside the bot: %s", change["user_id"], deltas)
+
+    async def _apply_event(self, change: Dict[str, Any]) -> None:
+        user_id = int(change["user_id"])
+        old_event, old_group = change.get("old_event"), change.get("old_group")
+        new_event, new_group = change.get("new_event"), change.get("new_group")
+
+        group_deltas: Dict[str, Dict[str, int]] = {}
+        if old_event:
+            group_deltas.setdefault(old_group, {})[old_event] = -1
+        if new_event:
+            deltas = group_deltas.setdefault(new_group, {})
+            deltas[new_event] = deltas.get(new_event, 0) + 1
+        for group_id, deltas in group_deltas.items():
+            # Группа не в кеше – пересчитается при следующем чтении
+            await self.redis_manager.apply_event_group_delta(group_id, deltas)
+
+        if old_group and old_group != new_group:
+            await self.redis_manager.set_user_registration(user_id, old_group, None)
+        if new_group:
+            await self.redis_manager.set_user_registration(user_id, new_group, new_event)
+
+        config = self.config_provider.config
+        if old_group == VR_LAB_GROUP_ID:
+            await mark_vr_slot(self.redis_manager, config, old_event, False)
+        if new_group == VR_LAB_GROUP_ID:
+            await mark_vr_slot(self.redis_manager, config, new_event, True)
+
+        if old_event and self.waitlist:
+            await self.waitlist.seat_freed(old_group, old_event)
+        logger.info("Registration of user %s changed outside the bot: %s -> %s", user_id, old_event, new_event)
@@ -0,0 +1,125 @@
+"""Periodic verification of Redis registration counters against Postgres.
+
+Every pass counts debate cases and timetable groups with a single aggregate
+query and reads all cached counter hashes in a single pipeline. A key is healed
+only if it drifted in two consecutive passes, so a registration committed
+between the two reads is not mistaken for drift. Heals are conditional: a
+counter that changed after it was read is left for the next pass.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+from config.config import ConfigProvider
+from .registry import timetable_registry
+from .vr_lab import VR_LAB_GROUP_ID
+
+logger = logging.getLogger(__name__)
+
+DEBATE_SCOPE = "debate"
+
+
+def _nonzero(counts: Dict[str, int]) -> Dict[str, int]:
+    return {event_id: count for event_id, count in counts.items() if count}
+
+
+class CountsReconciler:
+    """Finds and heals drift between cached counters and the database."""
+
+    def __init__(self, db_manager: DatabaseManager, redis_manager: RedisManager, config_provider: ConfigProvider):
+        self.db_manager = db_manager
+        self.redis_manager = redis_manager
+        self.config_provider = config_provider
+        self._suspects: Set[str] = set()
+        self.runs = 0
+        self.failures = 0
+        self.drifted_total = 0
+        self.healed_total = 0
+        self.last_drifted = 0
+        self.last_duration = 0.0
+        self.last_run_at: Optional[float] = None
+
+    async def run(self) -> None:
+        while True:
+            interval = self.config_provider.config.redis.reconcile_interval
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile()
+            except Exception as exc:  # noqa: BLE001
+                self.failures += 1
+                logger.warning("Counter reconciliation failed: %s", exc)
+
+    async def reconcile(self) -> int:
+        """Run one pass; returns the number of drifted keys."""
+        started = time.perf_counter()
+        config = self.config_provider.config
+        group_ids = [*config.timetable.events_by_group, VR_LAB_GROUP_ID]
+
+        debate_raw, groups_raw = await self.redis_manager.get_counter_hashes(group_ids)
+        snapshot = await self.db_manager.get_registration_counts_snapshot()
+
+        drifted: Set[str] = set()
+        healed = 0
+
+        if debate_raw:
+            expected = {case: debate_raw.get(str(case), "0") for case in self.redis_manager.LIMITS}
+            actual = {case: snapshot.debate.get(case, 0) for case in self.redis_manager.LIMITS}
+            if any(int(expected[case]) != actual[case] for case in actual):
+                drifted.add(DEBATE_SCOPE)
+                if DEBATE_SCOPE in self._suspects and await self.redis_manager.heal_debate_counts(expected, actual):
+                    healed += 1
+                    logger.warning("Debate counters drifted: redis=%s db=%s", expected, actual)
+
+        for group_id, raw in groups_raw.items():
+            if not raw:
+                continue  # не в кеше – загрузится из БД при чтении
+            cached = _nonzero({k: int(v) for k, v in raw.items() if not k.startswith("__")})
+            actual = _nonzero(snapshot.groups.get(group_id, {}))
+            if cached == actual:
+                continue
+            drifted.add(group_id)
+            if group_id not in self._suspects:
+                continue
+            stored = await self.redis_manager.set_event_group_counts(group_id, actual, raw.get("__version__", "0"))
+            if stored:
+                healed += 1
+                logger.warning("Group %s counters drifted: redis=%s db=%s", group_id, cached, actual)
+                if group_id == VR_LAB_GROUP_ID:
+                    layout = timetable_registry.get_vr_lab_layout(config.timetable)
+                    await self.redis_manager.prime_slot_bitmaps(
+                        VR_LAB_GROUP_ID, layout.layout_key, layout.slots_per_room, layout.taken_slot_indexes(actual)
+                    )
+
+        self._suspects = drifted
+        self.runs += 1
+        self.last_drifted = len(drifted)
+        self.drifted_total += len(drifted)
+        self.healed_total += healed
+        self.last_duration = time.perf_counter() - started
+        self.last_run_at = time.time()
+        logger.info(
+            "Counter reconciliation: %s groups checked, %s drifted, %s healed in %.3f s",
+            len(groups_raw),
+            len(drifted),
+            healed,
+            self.last_duration,
+        )
+        return len(drifted)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_drifted": self.last_drifted,
+            "drifted_total": self.drifted_total,
+            "healed_total": self.healed_total,
+            "last_duration": self.last_duration,
+            "last_run_at": self.last_run_at or 0.0,
+        }
@@ -11,9 +11,11 @@ from .handlers import (
     on_group_event_selected,
     on_register_event,
     on_unregister_event,
+    on_toggle_waitlist,
     on_back_to_day_events,
     on_vr_room_selected,
     on_vr_slot_selected,
+    on_vr_book_nearest,
     on_vr_lab_unregister,
     on_vr_back_to_day,
     on_vr_back_to_rooms,
@@ -117,6 +119,12 @@ timetable_dialog = Dialog(
             width=2,
         ),
         Group(
+            Button(
+                Const("⚡ Ближайший свободный слот"),
+                id="vr_lab_book_nearest",
+                on_click=on_vr_book_nearest,
+                when="show_nearest_button",
+            ),
             Button(
                 Const("Отменить запись"),
                 id="vr_lab_unregister_rooms",
@@ -180,6 +188,12 @@ timetable_dialog = Dialog(
                 on_click=on_unregister_event,
                 when="show_unregister_button",
             ),
+            Button(
+                Format("{waitlist_button_text}"),
+                id="toggle_waitlist",
+                on_click=on_toggle_waitlist,
+                when="show_waitlist_button",
+            ),
         ),
         Button(
             Const("⬅️ Назад"),
@@ -1,5 +1,4 @@
 import logging
-from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from aiogram_dialog import DialogManager
@@ -8,28 +7,22 @@ from aiogram.enums import ContentType
 
 from app.infrastructure.database import DatabaseManager, RedisManager
 from config.config import Config
+from .booking import get_user_registrations, load_vr_slot_occupancy
+from .group_counts import group_counts_loader
 from .vr_lab import (
     VR_LAB_GROUP_ID,
-    VR_LAB_ROOMS,
-    VR_LAB_SLOT_TIMES,
-    TOTAL_SLOTS_PER_ROOM,
-    build_slot_event_id,
-    count_room_taken_slots,
     is_vr_lab_event,
     parse_slot_event_id,
-    ensure_room,
 )
+from .registry import LEGACY_DIALOG_DATA_KEYS, timetable_registry
+from .schedule_cache import schedule_render_cache
 from .utils import (
-    ScheduleItem,
-    build_day_schedule,
-    distribute_capacity,
+    format_day_label,
     format_event_summary,
-    serialize_event,
 )
 
 logger = logging.getLogger(__name__)
 
-TOTAL_PARALLEL_CAPACITY = 115
 COACH_FORM_KEY = "coach_form"
 COACH_EXISTING_NOTE = (
     "\n✅ <b>Мы получили твою запись!</b> Время твоей сессии будет назначено после завершения конференции. "
@@ -49,14 +42,14 @@ async def get_coach_intro_data(dialog_manager: DialogManager, **kwargs):
         db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
         user_id = dialog_manager.dialog_data.get("coach_user_id")
         if user_id is not None:
-            existing_entry = await db_manager.get_last_coach_session_request(user_id)
+            has_request = await db_manager.has_coach_session_request(user_id)
         else:
-            existing_entry = None
+            has_request = False
     except Exception as exc:  # noqa: BLE001
         logger.exception("Failed to prepare coach intro data", exc_info=exc)
-        existing_entry = None
+        has_request = False
 
-    if existing_entry:
+    if has_request:
         return {"coach_intro_text": f"{base_text}\n\n{COACH_EXISTING_NOTE}"}
 
     return {"coach_intro_text": base_text}
@@ -71,7 +64,7 @@ async def get_days_data(dialog_manager: DialogManager, **kwargs):
         days_data = [
             {
                 "day": day,
-                "day_name": _format_day_label(config.start_date, day),
+                "day_name": format_day_label(config.start_date, day),
             }
             for day in days_with_events
         ]
@@ -88,6 +81,7 @@ async def get_day_events_data(dialog_manager: DialogManager, **kwargs):
     try:
         config: Config = kwargs["config"]
         db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
+        redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
         event_obj = dialog_manager.event
         if event_obj and getattr(event_obj, "from_user", None):
             user_id = event_obj.from_user.id
@@ -96,94 +90,40 @@ async def get_day_events_data(dialog_manager: DialogManager, **kwargs):
         dialog_manager.dialog_data["current_user_id"] = user_id
         selected_day = dialog_manager.dialog_data.get("selected_day", 0)
 
-        day_events = config.get_day_events(selected_day)
-        schedule_items, raw_group_map = build_day_schedule(day_events)
-
-        serialized_events = {event.event_id: serialize_event(event) for event in day_events}
-        event_map: Dict[str, Dict[str, Any]] = serialized_events
-        event_to_group: Dict[str, Optional[str]] = {}
-        group_capacities: Dict[str, Dict[str, int]] = {}
-        group_map: Dict[str, List[Dict[str, Any]]] = {}
-        user_group_registrations: Dict[str, str] = {}
-
-        for event_id, payload in serialized_events.items():
-            group_id = payload["group_id"] if payload.get("registration_required") else None
-            event_to_group[event_id] = group_id
-
-        for group_id, events in raw_group_map.items():
-            group_capacities[group_id] = distribute_capacity(TOTAL_PARALLEL_CAPACITY, events)
-            group_map[group_id] = [serialized_events[event.event_id] for event in events]
-            if user_id is not None:
-                registration = await db_manager.get_user_event_registration(user_id, group_id)
-                if registration:
-                    user_group_registrations[group_id] = registration.event_id
+        day_view = timetable_registry.get_day(config.timetable, selected_day)
+        # Записи пользователя берутся из кэша в Redis, БД читается только при промахе
+        registrations = await get_user_registrations(db_manager, redis_manager, user_id)
+        vr_event_id = registrations.get(VR_LAB_GROUP_ID)
+        user_group_registrations: Dict[str, str] = {
+            group_id: registrations[group_id] for group_id in day_view.group_map if group_id in registrations
+        }
 
         vr_lab_booking: Optional[Tuple[str, str]] = None
-        if user_id is not None:
-            vr_registration = await db_manager.get_user_event_registration(user_id, VR_LAB_GROUP_ID)
-            if vr_registration:
-                parsed_slot = parse_slot_event_id(vr_registration.event_id)
-                if parsed_slot:
-                    vr_lab_booking = parsed_slot
-
-        dialog_manager.dialog_data["event_map"] = event_map
-        dialog_manager.dialog_data["event_to_group"] = event_to_group
-        dialog_manager.dialog_data["group_map"] = group_map
-        dialog_manager.dialog_data["group_capacities"] = group_capacities
+        if vr_event_id:
+            vr_lab_booking = parse_slot_event_id(vr_event_id)
+
+        # В dialog_data храним только ссылки, сами мероприятия берутся из реестра
+        for legacy_key in LEGACY_DIALOG_DATA_KEYS:
+            dialog_manager.dialog_data.pop(legacy_key, None)
+        dialog_manager.dialog_data["timetable_version"] = config.timetable.version
         dialog_manager.dialog_data["user_group_registrations"] = user_group_registrations
 
-        schedule_text = _compose_schedule_text(
-            config.start_date,
-            selected_day,
-            schedule_items,
-            event_map,
-            group_map,
-            user_group_registrations,
-            vr_lab_booking,
-        )
+        # Общий шаблон дня рендерится один раз на версию расписания, поверх него – записи пользователя
+        template = await schedule_render_cache.get(config, selected_day, redis_manager)
+        schedule_text = template.render(user_group_registrations, vr_lab_booking)
 
+        # Свободные места по всем параллельным блокам дня – одним запросом к Redis
+        group_counts = await group_counts_loader.get_many(db_manager, redis_manager, day_view.group_map)
         events_payload = [
-            {
-                "id": item.item_id,
-                "label": item.label,
-            }
-            for item in schedule_items
+            _with_group_availability(config, item, group_counts, user_group_registrations)
+            for item in template.labels
         ]
 
         logger.info("Loaded %s schedule items for day %s", len(events_payload), selected_day)
-        day_key = str(selected_day)
         day_media_id: Optional[MediaAttachment] = None
-        timetable_media = config.timetable_media
-        if timetable_media:
-            file_id = timetable_media.get(day_key)
-            if file_id is None:
-                fallback_key: Optional[str]
-                try:
-                    fallback_key = f"{int(day_key)}.png"
-                except ValueError:
-                    fallback_key = None
-
-                if fallback_key == "0.png":
-                    fallback_key = "1.png"
-
-                if fallback_key:
-                    file_id = timetable_media.get(fallback_key)
-
-            if file_id is None:
-                ordered_filenames = sorted(
-                    name
-                    for name in timetable_media.keys()
-                    if name.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))
-                )
-                try:
-                    index = int(day_key)
-                except (ValueError, TypeError):
-                    index = None
-                if index is not None and 0 <= index < len(ordered_filenames):
-                    file_id = timetable_media.get(ordered_filenames[index])
-
-            if file_id:
-                day_media_id = MediaAttachment(ContentType.PHOTO, file_id=MediaId(file_id))
+        file_id = config.timetable.get_day_media(selected_day)
+        if file_id:
+            day_media_id = MediaAttachment(ContentType.PHOTO, file_id=MediaId(file_id))
 
         return {
             "schedule_text": schedule_text,
@@ -205,34 +145,24 @@ async def get_vr_lab_rooms_data(dialog_manager: DialogManager, **kwargs):
     db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
     redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
 
-    event_payload = dialog_manager.dialog_data.get("vr_lab_event_payload")
+    event_payload = _get_vr_lab_event(dialog_manager, config)
     if not event_payload:
-        selected_event_id = dialog_manager.dialog_data.get("selected_event_id")
-        fallback_event = dialog_manager.dialog_data.get("event_map", {}).get(selected_event_id or "")
-        if fallback_event and is_vr_lab_event(fallback_event):
-            event_payload = fallback_event
-        else:
-            return {
-                "vr_lab_header": "VR-lab не найдена",
-                "vr_rooms": [],
-                "show_unregister_button": False,
-            }
+        return {
+            "vr_lab_header": "VR-lab не найдена",
+            "vr_rooms": [],
+            "show_unregister_button": False,
+            "show_nearest_button": False,
+        }
 
+    layout = timetable_registry.get_vr_lab_layout(config.timetable)
     user_id = dialog_manager.dialog_data.get("current_user_id")
-    counts = await redis_manager.get_event_group_counts(VR_LAB_GROUP_ID)
-    if counts is None:
-        counts = await db_manager.get_event_counts_for_group(VR_LAB_GROUP_ID)
-        await redis_manager.set_event_group_counts(VR_LAB_GROUP_ID, counts)
+    occupancy = await load_vr_slot_occupancy(db_manager, redis_manager, layout)
+    user_event_id = (await get_user_registrations(db_manager, redis_manager, user_id)).get(VR_LAB_GROUP_ID)
 
-    registration_event_id = dialog_manager.dialog_data.get("vr_lab_registration_event_id")
+    registration_event_id = user_event_id or dialog_manager.dialog_data.get("vr_lab_registration_event_id")
     registration_room = None
     registration_slot = None
 
-    if user_id is not None:
-        registration = await db_manager.get_user_event_registration(user_id, VR_LAB_GROUP_ID)
-        if registration:
-            registration_event_id = registration.event_id
-
     if registration_event_id:
         parsed = parse_slot_event_id(registration_event_id)
         if parsed:
@@ -244,18 +174,20 @@ async def get_vr_lab_rooms_data(dialog_manager: DialogManager, **kwargs):
 
     rooms_payload: List[Dict[str, Any]] = []
     availability_lines: List[str] = []
-    for room in VR_LAB_ROOMS:
-        taken = count_room_taken_slots(room, counts)
-        remaining = max(0, TOTAL_SLOTS_PER_ROOM - taken)
+    total_slots = layout.slots_per_room
+    any_free = False
+    for room in layout.rooms:
+        remaining = occupancy[room].count(False)
+        any_free = any_free or remaining > 0
         prefix = ""
         if room == registration_room:
             prefix = "✅ "
-            status_line = f" | Твой слот · Свободно: {remaining}/{TOTAL_SLOTS_PER_ROOM}"
+            status_line = f" | Твой слот · Свободно: {remaining}/{total_slots}"
         elif remaining == 0:
             prefix = "🔒 "
             status_line = f" | Свободных слотов нет"
         else:
-            status_line = f" | Свободно: {remaining}/{TOTAL_SLOTS_PER_ROOM}"
+            status_line = f" | Свободно: {remaining}/{total_slots}"
 
         rooms_payload.append(
             {
@@ -264,10 +196,10 @@ async def get_vr_lab_rooms_data(dialog_manager: DialogManager, **kwargs):
             }
         )
         availability_lines.append(
-            f"• Ауд. {room}: {remaining}/{TOTAL_SLOTS_PER_ROOM} свободно"
+            f"• Ауд. {room}: {remaining}/{total_slots} свободно"
         )
 
-    day_label = _format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
+    day_label = format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
 
     header_lines = [
         f"<b>{day_label}</b>",
@@ -277,7 +209,9 @@ async def get_vr_lab_rooms_data(dialog_manager: DialogManager, **kwargs):
         header_lines.append(f"{event_payload['location']}")
 
     header_lines.append("")
-    header_lines.append("Выбери аудиторию VR-lab. В каждой аудитории слоты по 15 минут на одного участника.")
+    header_lines.append(
+        f"Выбери аудиторию VR-lab. В каждой аудитории слоты по {layout.slot_minutes} минут на одного участника."
+    )
     header_lines.append("")
     header_lines.append("<b>Доступность:</b>")
     header_lines.extend(availability_lines)
@@ -292,6 +226,7 @@ async def get_vr_lab_rooms_data(dialog_manager: DialogManager, **kwargs):
         "vr_lab_header": "\n".join(header_lines),
         "vr_rooms": rooms_payload,
         "show_unregister_button": bool(registration_event_id),
+        "show_nearest_button": any_free and not registration_event_id,
     }
 
 
@@ -300,34 +235,23 @@ async def get_vr_lab_slots_data(dialog_manager: DialogManager, **kwargs):
     db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
     redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
 
-    event_payload = dialog_manager.dialog_data.get("vr_lab_event_payload")
+    event_payload = _get_vr_lab_event(dialog_manager, config)
     if not event_payload:
-        selected_event_id = dialog_manager.dialog_data.get("selected_event_id")
-        fallback_event = dialog_manager.dialog_data.get("event_map", {}).get(selected_event_id or "")
-        if fallback_event and is_vr_lab_event(fallback_event):
-            event_payload = fallback_event
-        else:
-            return {
-                "vr_lab_slots_header": "VR-lab не найдена",
-                "vr_slots": [],
-                "show_unregister_button": False,
-            }
+        return {
+            "vr_lab_slots_header": "VR-lab не найдена",
+            "vr_slots": [],
+            "show_unregister_button": False,
+        }
 
+    layout = timetable_registry.get_vr_lab_layout(config.timetable)
     user_id = dialog_manager.dialog_data.get("current_user_id")
-    counts = await redis_manager.get_event_group_counts(VR_LAB_GROUP_ID)
-    if counts is None:
-        counts = await db_manager.get_event_counts_for_group(VR_LAB_GROUP_ID)
-        await redis_manager.set_event_group_counts(VR_LAB_GROUP_ID, counts)
+    occupancy = await load_vr_slot_occupancy(db_manager, redis_manager, layout)
+    user_event_id = (await get_user_registrations(db_manager, redis_manager, user_id)).get(VR_LAB_GROUP_ID)
 
-    registration_event_id = dialog_manager.dialog_data.get("vr_lab_registration_event_id")
+    registration_event_id = user_event_id or dialog_manager.dialog_data.get("vr_lab_registration_event_id")
     registration_room = None
     registration_slot = None
 
-    if user_id is not None:
-        registration = await db_manager.get_user_event_registration(user_id, VR_LAB_GROUP_ID)
-        if registration:
-            registration_event_id = registration.event_id
-
     if registration_event_id:
         parsed = parse_slot_event_id(registration_event_id)
         if parsed:
@@ -339,26 +263,32 @@ async def get_vr_lab_slots_data(dialog_manager: DialogManager, **kwargs):
         if registration_room:
             selected_room = registration_room
         else:
-            selected_room = VR_LAB_ROOMS[0]
+            selected_room = layout.rooms[0]
         dialog_manager.dialog_data["vr_lab_selected_room"] = selected_room
 
     try:
-        ensure_room(selected_room)
+        layout.ensure_room(selected_room)
     except ValueError:
-        selected_room = VR_LAB_ROOMS[0]
+        selected_room = layout.rooms[0]
         dialog_manager.dialog_data["vr_lab_selected_room"] = selected_room
 
+    room_event_ids = list(layout.iter_room_slot_event_ids(selected_room))
+    room_taken = occupancy[selected_room]
+    waitlists = await redis_manager.get_waitlists_state(
+        [event_id for event_id, taken in zip(room_event_ids, room_taken) if taken], user_id
+    )
+
     slots_payload: List[Dict[str, Any]] = []
-    for slot_time in VR_LAB_SLOT_TIMES:
-        event_id = build_slot_event_id(selected_room, slot_time)
-        taken = counts.get(event_id, 0)
-        remaining = max(0, 1 - taken)
+    for slot_time, event_id, taken in zip(layout.slot_times, room_event_ids, room_taken):
         is_current = registration_event_id == event_id
-        locked = taken >= 1 and not is_current
+        locked = taken and not is_current
 
         if is_current:
             prefix = "✅ "
             status_line = " Вы записаны"
+        elif locked and waitlists.get(event_id, (None, 0))[0]:
+            prefix = "⏳ "
+            status_line = f" В листе ожидания ({waitlists[event_id][0]})"
         elif locked:
             prefix = "🔒 "
             status_line = " Слот занят"
@@ -373,7 +303,7 @@ async def get_vr_lab_slots_data(dialog_manager: DialogManager, **kwargs):
             }
         )
 
-    day_label = _format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
+    day_label = format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
     room_line = f"Аудитория {selected_room}"
 
     header_lines = [
@@ -381,7 +311,8 @@ async def get_vr_lab_slots_data(dialog_manager: DialogManager, **kwargs):
         f"{event_payload['title']}",
         room_line,
         "",
-        "Выбери подходящий слот (15 минут). Каждый слот доступен только одному участнику.",
+        f"Выбери подходящий слот ({layout.slot_minutes} минут). Каждый слот доступен только одному участнику.",
+        "Нажми на занятый слот, чтобы встать в лист ожидания.",
     ]
 
     if registration_room and registration_slot:
@@ -407,30 +338,32 @@ async def get_group_events_data(dialog_manager: DialogManager, **kwargs):
     if not group_id:
         return {"group_header": "Группа мероприятий не найдена", "group_events": []}
 
-    group_map: Dict[str, List[Dict[str, Any]]] = dialog_manager.dialog_data.get("group_map", {})
-    events = group_map.get(group_id)
+    events = timetable_registry.get_group_events(config.timetable, group_id)
 
     if not events:
         return {"group_header": "В выбранной группе нет мероприятий", "group_events": []}
 
-    capacities = dialog_manager.dialog_data.get("group_capacities", {}).get(group_id, {})
+    capacities = timetable_registry.get_group_capacities(config.timetable, group_id)
     user_group_registrations: Dict[str, str] = dialog_manager.dialog_data.get("user_group_registrations", {})
     current_event_id = user_group_registrations.get(group_id)
 
-    counts = await redis_manager.get_event_group_counts(group_id)
-    if counts is None:
-        counts = await db_manager.get_event_counts_for_group(group_id)
-        await redis_manager.set_event_group_counts(group_id, counts)
-
     user_id = dialog_manager.dialog_data.get("current_user_id")
-    if current_event_id is None and user_id is not None:
-        registration = await db_manager.get_user_event_registration(user_id, group_id)
-        if registration:
-            current_event_id = registration.event_id
+    if current_event_id is None:
+        counts, current_event_id = await _load_group_state(db_manager, redis_manager, user_id, group_id)
+        if current_event_id:
             user_group_registrations[group_id] = current_event_id
             dialog_manager.dialog_data["user_group_registrations"] = user_group_registrations
+    else:
+        counts, _ = await _load_group_state(db_manager, redis_manager, None, group_id)
 
     sorted_events = sorted(events, key=lambda e: e.get("short_title") or e.get("title", ""))
+    full_event_ids = [
+        event["event_id"]
+        for event in sorted_events
+        if counts.get(event["event_id"], 0) >= capacities.get(event["event_id"], 0)
+    ]
+    waitlists = await redis_manager.get_waitlists_state(full_event_ids, user_id)
+
     events_payload = []
     availability_lines: List[str] = []
     for event in sorted_events:
@@ -449,8 +382,16 @@ async def get_group_events_data(dialog_manager: DialogManager, **kwargs):
         elif locked:
             prefix = "🔒 "
             info_line = "Недоступно: отмените текущую регистрацию"
+        elif event_id in waitlists:
+            position, waitlist_size = waitlists[event_id]
+            if position:
+                prefix = "⏳ "
+                info_line = f" | В листе ожидания: {position}/{waitlist_size}"
+            else:
+                prefix = "🔒 "
+                info_line = f" | Мест нет · В листе ожидания: {waitlist_size}"
         else:
-            prefix = "🔒 " if remaining <= 0 else ""
+            prefix = ""
             info_line = f" | Осталось мест: {remaining}/{capacity}"
 
         label = f"{prefix}{display_name}\n{info_line}"
@@ -466,7 +407,7 @@ async def get_group_events_data(dialog_manager: DialogManager, **kwargs):
         )
 
     primary_event = sorted_events[0]
-    day_label = _format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
+    day_label = format_day_label(config.start_date, dialog_manager.dialog_data.get("selected_day", 0))
     titles_block = "\n".join(availability_lines)
     group_title = primary_event.get("group_title") or "Параллельные мероприятия"
     group_header = (
@@ -493,17 +434,7 @@ async def get_event_detail_data(dialog_manager: DialogManager, **kwargs):
     if not event_id:
         return {"event_detail": "Мероприятие не выбрано"}
 
-    event_map: Dict[str, Dict[str, Any]] = dialog_manager.dialog_data.get("event_map", {})
-    event = event_map.get(event_id)
-
-    if not event:
-        # Rebuild cache if missing (possible after invalidation)
-        selected_day = dialog_manager.dialog_data.get("selected_day", 0)
-        day_events = config.get_day_events(selected_day)
-        for item in day_events:
-            event_map[item.event_id] = serialize_event(item)
-        dialog_manager.dialog_data["event_map"] = event_map
-        event = event_map.get(event_id)
+    event = timetable_registry.get_event(config.timetable, event_id)
 
     if not event:
         logger.warning("Event %s not found in timetable cache", event_id)
@@ -524,13 +455,13 @@ async def get_event_detail_data(dialog_manager: DialogManager, **kwargs):
     register_button_text = "Зарегистрироваться"
     show_register_button = bool(event.get("registration_required"))
     show_unregister_button = False
+    show_waitlist_button = False
+    waitlist_button_text = ""
 
     if event.get("registration_required") and group_id:
-        capacities = dialog_manager.dialog_data.get("group_capacities", {}).get(group_id, {})
-        counts = await redis_manager.get_event_group_counts(group_id)
-        if counts is None:
-            counts = await db_manager.get_event_counts_for_group(group_id)
-            await redis_manager.set_event_group_counts(group_id, counts)
+        capacities = timetable_registry.get_group_capacities(config.timetable, group_id)
+        user_id = dialog_manager.event.from_user.id
+        counts, current_event_id = await _load_group_state(db_manager, redis_manager, user_id, group_id)
 
         capacity = capacities.get(event_id, 0)
         taken = counts.get(event_id, 0)
@@ -539,17 +470,14 @@ async def get_event_detail_data(dialog_manager: DialogManager, **kwargs):
         detail_lines.append("")
         detail_lines.append(f"Осталось мест: {remaining}/{capacity}")
 
-        user_id = dialog_manager.event.from_user.id
-        current_registration = await db_manager.get_user_event_registration(user_id, group_id)
-
-        if current_registration and current_registration.event_id == event_id:
+        if current_event_id == event_id:
             show_register_button = False
             show_unregister_button = True
             detail_lines.append("")
             detail_lines.append("📝 Вы зарегистрированы на это мероприятие.")
-        elif current_registration:
+        elif current_event_id:
             show_unregister_button = True
-            other_event = event_map.get(current_registration.event_id)
+            other_event = timetable_registry.get_event(config.timetable, current_event_id)
             if other_event:
                 detail_lines.append("")
                 detail_lines.append(
@@ -561,6 +489,28 @@ async def get_event_detail_data(dialog_manager: DialogManager, **kwargs):
 
         if remaining <= 0 and show_register_button:
             register_button_text = "🔒 Регистрация закрыта"
+            position, waitlist_size = (await redis_manager.get_waitlists_state([event_id], user_id))[event_id]
+            detail_lines.append("")
+            if position:
+                show_waitlist_button = True
+                if current_event_id:
+                    # Лист ожидания не переносит существующую запись в группе
+                    detail_lines.append(
+                        f"⏳ Вы в листе ожидания: позиция {position} из {waitlist_size}. "
+                        "У вас уже есть запись в этом блоке, поэтому при освобождении места "
+                        "мы только пришлём уведомление."
+                    )
+                else:
+                    detail_lines.append(
+                        f"⏳ Вы в листе ожидания: позиция {position} из {waitlist_size}. "
+                        "Когда место освободится, мы запишем вас автоматически."
+                    )
+                waitlist_button_text = "Покинуть лист ожидания"
+            else:
+                detail_lines.append(f"В листе ожидания: {waitlist_size}")
+                if not current_event_id:
+                    show_waitlist_button = True
+                    waitlist_button_text = "⏳ Встать в лист ожидания"
 
     event_detail = "\n".join(detail_lines)
 
@@ -569,76 +519,49 @@ async def get_event_detail_data(dialog_manager: DialogManager, **kwargs):
         "register_button_text": register_button_text,
         "show_register_button": show_register_button,
         "show_unregister_button": show_unregister_button,
+        "show_waitlist_button": show_waitlist_button,
+        "waitlist_button_text": waitlist_button_text,
     }
 
 
-def _format_day_label(start_date: datetime, day_offset: int) -> str:
-    target_date = start_date + timedelta(days=day_offset)
-    weekday_names = {
-        0: "Понедельник",
-        1: "Вторник",
-        2: "Среда",
-        3: "Четверг",
-        4: "Пятница",
-        5: "Суббота",
-        6: "Воскресенье",
-    }
-    weekday = weekday_names.get(target_date.weekday(), target_date.strftime("%A"))
-    return target_date.strftime("%d.%m (") + weekday + ")"
-
-
-def _compose_schedule_text(
-    start_date: datetime,
-    day: int,
-    schedule_items: List[ScheduleItem],
-    event_map: Dict[str, Dict[str, Any]],
-    group_map: Dict[str, List[Dict[str, Any]]],
+def _with_group_availability(
+    config: Config,
+    item: Dict[str, str],
+    group_counts: Dict[str, Dict[str, int]],
     user_group_registrations: Dict[str, str],
-    vr_lab_booking: Optional[Tuple[str, str]],
-) -> str:
-    header = f"<b>Расписание – {_format_day_label(start_date, day)}</b>\n"
-    lines: List[str] = [header, ""]
-
-    for item in schedule_items:
-        if item.type == "simple":
-            event_id = item.item_id.split(":", 1)[1]
-            event = event_map.get(event_id)
-            if not event:
-                continue
-            if is_vr_lab_event(event):
-                if vr_lab_booking:
-                    room, slot = vr_lab_booking
-                    location = f" <i>— Твой слот: ауд. {room}, {slot}</i>"
-                elif event.get("location"):
-                    location = f" ({event.get('location', '')})"
-                else:
-                    location = ""
-            else:
-                location = f" ({event.get('location', '')})" if event.get("location") else ""
-            lines.append(
-                f"{event['start_time']} – {event['end_time']} · <b>{event['title']}</b>{location}"
-            )
-        else:
-            group_id = item.group_id
-            events = group_map.get(group_id, [])
-            if not events:
-                continue
-            registered_event_id = user_group_registrations.get(group_id)
-            if registered_event_id and registered_event_id in event_map:
-                selected_event = event_map[registered_event_id]
-                location = f" ({selected_event.get('location', '')})" if selected_event.get("location") else ""
-                lines.append(
-                    f"{selected_event['start_time']} – {selected_event['end_time']} · <b>{selected_event['title']}</b>{location}"
-                )
-            else:
-                titles = "\n• ".join(event.get("title", "") for event in events)
-                group_title = events[0].get("group_title") or "Параллельные мероприятия"
-                lines.append(
-                    f"{events[0]['start_time']} – {events[0]['end_time']} · <b>{group_title}</b>:\n• {titles}"
-                )
-        lines.append("")
-
-    return "\n".join(lines).strip()
+) -> Dict[str, str]:
+    if not item["id"].startswith("group:"):
+        return item
+
+    group_id = item["id"].split(":", 1)[1]
+    if group_id in user_group_registrations:
+        return {"id": item["id"], "label": f"✅ {item['label']}"}
+
+    counts = group_counts.get(group_id, {})
+    capacities = timetable_registry.get_group_capacities(config.timetable, group_id)
+    remaining = sum(max(0, capacity - counts.get(event_id, 0)) for event_id, capacity in capacities.items())
+    suffix = f"мест: {remaining}" if remaining > 0 else "🔒 мест нет"
+    return {"id": item["id"], "label": f"{item['label']} · {suffix}"}
+
+
+async def _load_group_state(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    user_id: Optional[int],
+    group_id: str,
+) -> Tuple[Dict[str, int], Optional[str]]:
+    """Return group counts and user's event in the group; with warm caches no SQL is issued."""
+    counts = await group_counts_loader.get(db_manager, redis_manager, group_id)
+    registrations = await get_user_registrations(db_manager, redis_manager, user_id)
+    return counts, registrations.get(group_id)
+
+
+def _get_vr_lab_event(dialog_manager: DialogManager, config: Config) -> Optional[Dict[str, Any]]:
+    event_id = dialog_manager.dialog_data.get("vr_lab_event_id") or dialog_manager.dialog_data.get("selected_event_id")
+    event_payload = timetable_registry.get_event(config.timetable, event_id)
+    if event_payload and is_vr_lab_event(event_payload):
+        return event_payload
+    return None
 
 
 async def get_coach_summary_data(dialog_manager: DialogManager, **kwargs):
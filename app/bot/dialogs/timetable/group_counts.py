@@ -0,0 +1,138 @@
+"""Single-flight loading of cached parallel group counts.
+
+On a cache miss only one task per group and process recounts registrations
+in Postgres; concurrent viewers await the same future. Across bot instances a
+short Redis lock elects the loader while the others poll for its result.
+Counts are recounted in the background ahead of expiry, and readers keep
+getting the cached, slightly stale value meanwhile.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Set
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+
+logger = logging.getLogger(__name__)
+
+LOCK_WAIT_SECONDS = 2.0
+LOCK_POLL_INTERVAL_SECONDS = 0.05
+
+
+class GroupCountsLoader:
+    """Coordinates recounts of ``timetable:group:*:counts`` hashes."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    async def get(self, db_manager: DatabaseManager, redis_manager: RedisManager, group_id: str) -> Dict[str, int]:
+        """Return event_id -> registrations for the group; cold misses are loaded once."""
+        counts, version, refreshed_at = await redis_manager.get_event_group_state(group_id)
+        return await self._resolve(db_manager, redis_manager, group_id, counts, version, refreshed_at)
+
+    async def refresh(self, db_manager: DatabaseManager, redis_manager: RedisManager, group_id: str) -> Dict[str, int]:
+        """Recount the group now, e.g. after the DB rejected a seat the cached counts showed as free."""
+        _, version, refreshed_at = await redis_manager.get_event_group_state(group_id)
+        return await self._load(db_manager, redis_manager, group_id, version, refreshed_at)
+
+    async def get_many(
+        self,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        group_ids: Iterable[str],
+    ) -> Dict[str, Dict[str, int]]:
+        """Counts of several groups: one pipelined Redis read, misses are recounted concurrently."""
+        states = await redis_manager.get_many_group_states(group_ids)
+        group_order = list(states)
+        resolved = await asyncio.gather(
+            *(self._resolve(db_manager, redis_manager, group_id, *states[group_id]) for group_id in group_order)
+        )
+        return dict(zip(group_order, resolved))
+
+    async def _resolve(
+        self,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        group_id: str,
+        counts: Optional[Dict[str, int]],
+        version: str,
+        refreshed_at: float,
+    ) -> Dict[str, int]:
+        if counts is None:
+            return await self._load(db_manager, redis_manager, group_id, version, refreshed_at)
+
+        refresh_due = time.time() - refreshed_at >= redis_manager.EVENT_REFRESH_AFTER_SECONDS
+        if refresh_due and group_id not in self._inflight:
+            task = asyncio.create_task(self._load(db_manager, redis_manager, group_id, version, refreshed_at))
+            self._background.add(task)
+            task.add_done_callback(self._on_background_done)
+        return counts
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning("Background recount of group counts failed: %s", task.exception())
+
+    async def _load(
+        self,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        group_id: str,
+        version: str,
+        refreshed_at: float,
+    ) -> Dict[str, int]:
+        inflight = self._inflight.get(group_id)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                self._recount(db_manager, redis_manager, group_id, version, refreshed_at)
+            )
+            self._inflight[group_id] = inflight
+            inflight.add_done_callback(lambda _: self._inflight.pop(group_id, None))
+        # shield: a cancelled viewer must not cancel the recount other viewers are waiting for
+        return await asyncio.shield(inflight)
+
+    async def _recount(
+        self,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        group_id: str,
+        version: str,
+        refreshed_at: float,
+    ) -> Dict[str, int]:
+        token = await redis_manager.acquire_event_group_lock(group_id)
+        if token is None:
+            counts = await self._wait_for_peer(redis_manager, group_id, version, refreshed_at)
+            if counts is not None:
+                return counts
+            logger.info("Recount lock of group %s is stale, loading counts without it", group_id)
+
+        try:
+            counts = await db_manager.get_event_counts_for_group(group_id)
+            await redis_manager.set_event_group_counts(group_id, counts, version)
+            return counts
+        finally:
+            if token is not None:
+                await redis_manager.release_event_group_lock(group_id, token)
+
+    async def _wait_for_peer(
+        self,
+        redis_manager: RedisManager,
+        group_id: str,
+        version: str,
+        refreshed_at: float,
+    ) -> Optional[Dict[str, int]]:
+        """Another instance holds the lock: wait until it publishes newer counts."""
+        deadline = time.monotonic() + LOCK_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(LOCK_POLL_INTERVAL_SECONDS)
+            counts, current_version, current_refreshed_at = await redis_manager.get_event_group_state(group_id)
+            if counts is not None and (current_version != version or current_refreshed_at > refreshed_at):
+                return counts
+        return None
+
+
+group_counts_loader = GroupCountsLoader()
@@ -11,11 +11,14 @@ from app.infrastructure.database.database import (
 )
 from app.infrastructure.database.redis_manager import RedisManager
 from app.infrastructure.google_sheets import GoogleSheetsManager
+from config.config import Config
+from .booking import book_nearest_vr_slot, register_for_event, unregister_from_event
+from .registry import timetable_registry
 from .states import TimetableSG
 from .vr_lab import (
     VR_LAB_GROUP_ID,
     is_vr_lab_event,
-    ensure_room,
+    parse_slot_event_id,
 )
 
 logger = logging.getLogger(__name__)
@@ -49,16 +52,15 @@ async def on_schedule_item_selected(callback: CallbackQuery, widget, dialog_mana
             event_id = item_id.split(":", 1)[1]
             dialog_manager.dialog_data["selected_event_id"] = event_id
 
-            event_groups = dialog_manager.dialog_data.get("event_to_group", {})
-            group_id: Optional[str] = event_groups.get(event_id)
+            config: Config = dialog_manager.middleware_data["config"]
+            group_id: Optional[str] = timetable_registry.get_event_group(config.timetable, event_id)
             if group_id:
                 dialog_manager.dialog_data["selected_group_id"] = group_id
 
-            event_map = dialog_manager.dialog_data.get("event_map", {})
-            event_payload = event_map.get(event_id)
+            event_payload = timetable_registry.get_event(config.timetable, event_id)
             if event_payload and is_vr_lab_event(event_payload):
                 dialog_manager.dialog_data["selected_group_id"] = VR_LAB_GROUP_ID
-                dialog_manager.dialog_data["vr_lab_event_payload"] = event_payload
+                dialog_manager.dialog_data["vr_lab_event_id"] = event_id
                 dialog_manager.dialog_data.pop("vr_lab_selected_room", None)
                 await dialog_manager.switch_to(TimetableSG.vr_lab_rooms)
                 return
@@ -104,7 +106,8 @@ async def on_register_event(callback: CallbackQuery, widget, dialog_manager: Dia
         logger.error("Missing event or group id for registration")
         return
 
-    capacities = dialog_manager.dialog_data.get("group_capacities", {}).get(group_id, {})
+    config: Config = dialog_manager.middleware_data["config"]
+    capacities = timetable_registry.get_group_capacities(config.timetable, group_id)
     capacity = capacities.get(event_id)
     if capacity is None:
         await callback.answer("Лимит мероприятия не найден", show_alert=True)
@@ -112,19 +115,25 @@ async def on_register_event(callback: CallbackQuery, widget, dialog_manager: Dia
         return
 
     try:
-        status = await db_manager.register_user_for_event(user_id, event_id, group_id, capacity)
+        result = await register_for_event(
+            db_manager,
+            redis_manager,
+            config,
+            user_id,
+            event_id,
+            group_id,
+            capacity,
+            waitlist=dialog_manager.middleware_data.get("waitlist_promoter"),
+        )
+        status = result.status
 
         if status in {EventRegistrationStatus.SUCCESS, EventRegistrationStatus.SWITCHED}:
-            counts = await db_manager.get_event_counts_for_group(group_id)
-            await redis_manager.set_event_group_counts(group_id, counts)
             message = "Вы зарегистрированы на мероприятие" if status == EventRegistrationStatus.SUCCESS else "Регистрация обновлена"
             await callback.answer(message, show_alert=False)
             await dialog_manager.switch_to(TimetableSG.event_detail)
         elif status == EventRegistrationStatus.ALREADY_REGISTERED_THIS:
             await callback.answer("Вы уже зарегистрированы на это мероприятие", show_alert=False)
         elif status == EventRegistrationStatus.GROUP_FULL:
-            counts = await db_manager.get_event_counts_for_group(group_id)
-            await redis_manager.set_event_group_counts(group_id, counts)
             await callback.answer("Свободных мест не осталось", show_alert=True)
             await dialog_manager.switch_to(TimetableSG.event_detail)
         elif status == EventRegistrationStatus.USER_NOT_FOUND:
@@ -149,10 +158,16 @@ async def on_unregister_event(callback: CallbackQuery, widget, dialog_manager: D
         return
 
     try:
-        success = await db_manager.unregister_user_from_event(user_id, group_id)
+        config: Config = dialog_manager.middleware_data["config"]
+        success = await unregister_from_event(
+            db_manager,
+            redis_manager,
+            config,
+            user_id,
+            group_id,
+            waitlist=dialog_manager.middleware_data.get("waitlist_promoter"),
+        )
         if success:
-            counts = await db_manager.get_event_counts_for_group(group_id)
-            await redis_manager.set_event_group_counts(group_id, counts)
             await callback.answer("Регистрация отменена", show_alert=False)
             await dialog_manager.switch_to(TimetableSG.event_detail)
         else:
@@ -162,11 +177,59 @@ async def on_unregister_event(callback: CallbackQuery, widget, dialog_manager: D
         await callback.answer("Ошибка при отмене регистрации", show_alert=True)
 
 
+async def _toggle_waitlist(
+    db_manager: DatabaseManager,
+    redis_manager: RedisManager,
+    event_id: str,
+    group_id: Optional[str],
+    user_id: int,
+) -> str:
+    if await redis_manager.leave_waitlist(event_id, user_id):
+        return "Вы покинули лист ожидания"
+
+    # Лист ожидания не переносит существующую запись: с ней встать в очередь нельзя
+    if group_id and await db_manager.get_user_event_registration(user_id, group_id) is not None:
+        return (
+            "Вы уже записаны на другой вариант в этом блоке. "
+            "Чтобы встать в лист ожидания, сначала отмените текущую запись."
+        )
+
+    position = await redis_manager.join_waitlist(event_id, user_id)
+    return (
+        f"Мест нет – вы в листе ожидания (позиция {position}). "
+        "Как только место освободится, мы запишем вас автоматически и пришлём уведомление."
+    )
+
+
+async def on_toggle_waitlist(callback: CallbackQuery, widget, dialog_manager: DialogManager):
+    """Join or leave the waitlist of the selected full event."""
+    db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
+    redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
+    event_id = dialog_manager.dialog_data.get("selected_event_id")
+    if not event_id:
+        await callback.answer("Не удалось определить мероприятие", show_alert=True)
+        return
+
+    try:
+        message = await _toggle_waitlist(
+            db_manager,
+            redis_manager,
+            event_id,
+            dialog_manager.dialog_data.get("selected_group_id"),
+            callback.from_user.id,
+        )
+        await callback.answer(message, show_alert=True)
+        await dialog_manager.switch_to(TimetableSG.event_detail)
+    except Exception as exc:
+        logger.exception("Failed to toggle waitlist", exc_info=exc)
+        await callback.answer("Ошибка листа ожидания", show_alert=True)
+
+
 async def on_back_to_day_events(callback: CallbackQuery, widget, dialog_manager: DialogManager):
     """Return from event detail back to the appropriate window."""
     selected_event_id = dialog_manager.dialog_data.get("selected_event_id")
-    event_map = dialog_manager.dialog_data.get("event_map", {})
-    event = event_map.get(selected_event_id)
+    config: Config = dialog_manager.middleware_data["config"]
+    event = timetable_registry.get_event(config.timetable, selected_event_id)
     group_id = dialog_manager.dialog_data.get("selected_group_id")
 
     dialog_manager.dialog_data.pop("selected_event_id", None)
@@ -186,8 +249,9 @@ async def on_vr_room_selected(callback: CallbackQuery, widget, dialog_manager: D
         return
 
     room = item_id.split(":", 1)[1]
+    config: Config = dialog_manager.middleware_data["config"]
     try:
-        ensure_room(room)
+        timetable_registry.get_vr_lab_layout(config.timetable).ensure_room(room)
     except ValueError:
         await callback.answer("Неизвестная аудитория", show_alert=True)
         return
@@ -206,11 +270,20 @@ async def on_vr_slot_selected(callback: CallbackQuery, widget, dialog_manager: D
 
     user_id = callback.from_user.id
     event_id = item_id
-    status = await db_manager.register_user_for_event(user_id, event_id, VR_LAB_GROUP_ID, capacity=1)
+    config: Config = dialog_manager.middleware_data["config"]
+    result = await register_for_event(
+        db_manager,
+        redis_manager,
+        config,
+        user_id,
+        event_id,
+        VR_LAB_GROUP_ID,
+        capacity=1,
+        waitlist=dialog_manager.middleware_data.get("waitlist_promoter"),
+    )
+    status = result.status
 
     if status in {EventRegistrationStatus.SUCCESS, EventRegistrationStatus.SWITCHED}:
-        counts = await db_manager.get_event_counts_for_group(VR_LAB_GROUP_ID)
-        await redis_manager.set_event_group_counts(VR_LAB_GROUP_ID, counts)
         dialog_manager.dialog_data["vr_lab_registration_event_id"] = event_id
         message = "Вы записались на слот" if status == EventRegistrationStatus.SUCCESS else "Запись обновлена"
         await callback.answer(message, show_alert=False)
@@ -223,9 +296,9 @@ async def on_vr_slot_selected(callback: CallbackQuery, widget, dialog_manager: D
         return
 
     if status == EventRegistrationStatus.GROUP_FULL:
-        counts = await db_manager.get_event_counts_for_group(VR_LAB_GROUP_ID)
-        await redis_manager.set_event_group_counts(VR_LAB_GROUP_ID, counts)
-        await callback.answer("Этот слот уже занят", show_alert=True)
+        # Повторное нажатие на занятый слот ставит в лист ожидания или убирает из него
+        message = await _toggle_waitlist(db_manager, redis_manager, event_id, VR_LAB_GROUP_ID, user_id)
+        await callback.answer(message, show_alert=True)
         await dialog_manager.switch_to(TimetableSG.vr_lab_slots)
         return
 
@@ -236,18 +309,72 @@ async def on_vr_slot_selected(callback: CallbackQuery, widget, dialog_manager: D
     await callback.answer("Не удалось оформить запись", show_alert=True)
 
 
+async def on_vr_book_nearest(callback: CallbackQuery, widget, dialog_manager: DialogManager):
+    """Book the earliest free slot in any VR-lab room with one tap."""
+    db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
+    redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
+    config: Config = dialog_manager.middleware_data["config"]
+
+    try:
+        result, event_id = await book_nearest_vr_slot(
+            db_manager,
+            redis_manager,
+            config,
+            callback.from_user.id,
+            waitlist=dialog_manager.middleware_data.get("waitlist_promoter"),
+        )
+    except Exception as exc:
+        logger.exception("Failed to book nearest VR-lab slot", exc_info=exc)
+        await callback.answer("Не удалось оформить запись", show_alert=True)
+        return
+
+    if result.status in {EventRegistrationStatus.SUCCESS, EventRegistrationStatus.SWITCHED} and event_id:
+        room, slot_time = parse_slot_event_id(event_id)
+        dialog_manager.dialog_data["vr_lab_registration_event_id"] = event_id
+        dialog_manager.dialog_data["vr_lab_selected_room"] = room
+        await callback.answer(f"Вы записаны: ауд. {room}, {slot_time}", show_alert=True)
+        await dialog_manager.switch_to(TimetableSG.vr_lab_slots)
+        return
+
+    if result.status == EventRegistrationStatus.ALREADY_REGISTERED_THIS and event_id:
+        # Повторное нажатие или старое сообщение: существующую запись не меняем
+        room, slot_time = parse_slot_event_id(event_id)
+        dialog_manager.dialog_data["vr_lab_registration_event_id"] = event_id
+        dialog_manager.dialog_data["vr_lab_selected_room"] = room
+        await callback.answer(f"Вы уже записаны: ауд. {room}, {slot_time}", show_alert=True)
+        await dialog_manager.switch_to(TimetableSG.vr_lab_slots)
+        return
+
+    if result.status == EventRegistrationStatus.GROUP_FULL:
+        await callback.answer("Свободных слотов не осталось", show_alert=True)
+        await dialog_manager.switch_to(TimetableSG.vr_lab_rooms)
+        return
+
+    if result.status == EventRegistrationStatus.USER_NOT_FOUND:
+        await callback.answer("Сначала начните диалог с ботом через /start", show_alert=True)
+        return
+
+    await callback.answer("Не удалось оформить запись", show_alert=True)
+
+
 async def on_vr_lab_unregister(callback: CallbackQuery, widget, dialog_manager: DialogManager):
     db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
     redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
 
     user_id = callback.from_user.id
-    success = await db_manager.unregister_user_from_event(user_id, VR_LAB_GROUP_ID)
+    config: Config = dialog_manager.middleware_data["config"]
+    success = await unregister_from_event(
+        db_manager,
+        redis_manager,
+        config,
+        user_id,
+        VR_LAB_GROUP_ID,
+        waitlist=dialog_manager.middleware_data.get("waitlist_promoter"),
+    )
     if not success:
         await callback.answer("У вас нет активной записи", show_alert=False)
         return
 
-    counts = await db_manager.get_event_counts_for_group(VR_LAB_GROUP_ID)
-    await redis_manager.set_event_group_counts(VR_LAB_GROUP_ID, counts)
     dialog_manager.dialog_data.pop("vr_lab_registration_event_id", None)
 
     context = dialog_manager.current_context()
@@ -264,7 +391,7 @@ async def on_vr_back_to_day(callback: CallbackQuery, widget, dialog_manager: Dia
     dialog_manager.dialog_data.pop("selected_event_id", None)
     dialog_manager.dialog_data.pop("selected_group_id", None)
     dialog_manager.dialog_data.pop("vr_lab_selected_room", None)
-    dialog_manager.dialog_data.pop("vr_lab_event_payload", None)
+    dialog_manager.dialog_data.pop("vr_lab_event_id", None)
     await dialog_manager.switch_to(TimetableSG.day_events)
     await callback.answer()
 
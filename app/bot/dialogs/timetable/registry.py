@@ -0,0 +1,136 @@
+"""Shared in-process registry of serialized timetable payloads.
+
+Dialog data only keeps small references (selected day, group and event ids,
+timetable version); everything derived from timetable.json is resolved here,
+once per timetable version, instead of being copied into every user's FSM.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from config.config import TimetableIndex
+from .utils import ScheduleItem, build_day_schedule, distribute_capacity, serialize_event
+from .vr_lab import VrLabLayout, build_vr_lab_layout, is_vr_lab_event
+
+TOTAL_PARALLEL_CAPACITY = 115
+
+# Keys that older versions of the dialog stored in dialog_data
+LEGACY_DIALOG_DATA_KEYS = (
+    "event_map",
+    "event_to_group",
+    "group_map",
+    "group_capacities",
+    "vr_lab_event_payload",
+)
+
+EventPayload = Dict[str, Any]
+
+
+@dataclass(frozen=True)
+class DayView:
+    """Pre-rendered structure of one conference day. Payloads are read-only."""
+
+    day: int
+    schedule_items: Tuple[ScheduleItem, ...]
+    event_map: Mapping[str, EventPayload]
+    group_map: Mapping[str, Tuple[EventPayload, ...]]
+
+
+class TimetableRegistry:
+    """Lazily builds and caches payloads for the current timetable version."""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._events: Dict[str, EventPayload] = {}
+        self._days: Dict[int, DayView] = {}
+        self._group_events: Dict[str, Tuple[EventPayload, ...]] = {}
+        self._group_capacities: Dict[str, Dict[str, int]] = {}
+        self._vr_lab_layout: Optional[VrLabLayout] = None
+
+    def _sync(self, index: TimetableIndex) -> None:
+        if index.version != self._version:
+            self._version = index.version
+            self._events = {}
+            self._days = {}
+            self._group_events = {}
+            self._group_capacities = {}
+            self._vr_lab_layout = None
+
+    def get_event(self, index: TimetableIndex, event_id: Optional[str]) -> Optional[EventPayload]:
+        if not event_id:
+            return None
+        self._sync(index)
+        payload = self._events.get(event_id)
+        if payload is None:
+            event = index.get_event(event_id)
+            if event is None:
+                return None
+            payload = serialize_event(event)
+            self._events[event_id] = payload
+        return payload
+
+    def get_event_group(self, index: TimetableIndex, event_id: Optional[str]) -> Optional[str]:
+        payload = self.get_event(index, event_id)
+        if payload and payload.get("registration_required"):
+            return payload.get("group_id")
+        return None
+
+    def get_group_events(self, index: TimetableIndex, group_id: Optional[str]) -> Tuple[EventPayload, ...]:
+        if not group_id:
+            return ()
+        self._sync(index)
+        events = self._group_events.get(group_id)
+        if events is None:
+            events = tuple(
+                self.get_event(index, event.event_id) for event in index.get_group_events(group_id)
+            )
+            self._group_events[group_id] = events
+        return events
+
+    def get_group_capacities(self, index: TimetableIndex, group_id: Optional[str]) -> Dict[str, int]:
+        if not group_id:
+            return {}
+        self._sync(index)
+        capacities = self._group_capacities.get(group_id)
+        if capacities is None:
+            capacities = distribute_capacity(TOTAL_PARALLEL_CAPACITY, list(index.get_group_events(group_id)))
+            self._group_capacities[group_id] = capacities
+        return capacities
+
+    def get_vr_lab_layout(self, index: TimetableIndex) -> VrLabLayout:
+        """Room × slot grid of the VR lab as configured in the timetable."""
+        self._sync(index)
+        if self._vr_lab_layout is None:
+            vr_event = next(
+                (
+                    self.get_event(index, event.event_id)
+                    for event in index.events
+                    if is_vr_lab_event({"title": event.title})
+                ),
+                None,
+            )
+            self._vr_lab_layout = build_vr_lab_layout(vr_event)
+        return self._vr_lab_layout
+
+    def get_day(self, index: TimetableIndex, day: int) -> DayView:
+        self._sync(index)
+        view = self._days.get(day)
+        if view is None:
+            day_events = index.get_day_events(day)
+            schedule_items, raw_group_map = build_day_schedule(list(day_events))
+            view = DayView(
+                day=day,
+                schedule_items=tuple(schedule_items),
+                event_map={event.event_id: self.get_event(index, event.event_id) for event in day_events},
+                group_map={
+                    group_id: tuple(self.get_event(index, event.event_id) for event in events)
+                    for group_id, events in raw_group_map.items()
+                },
+            )
+            self._days[day] = view
+        return view
+
+
+timetable_registry = TimetableRegistry()
@@ -0,0 +1,157 @@
+"""Cache of rendered day schedules with a cheap per-user overlay.
+
+The day text and keyboard labels are identical for every user except for the
+lines of parallel groups the user registered for and the VR-lab line. Those
+lines become "slots" in a pre-rendered template keyed by (timetable version,
+day); rendering a screen is then a list copy plus a few substitutions.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.infrastructure.database import RedisManager
+from config.config import Config
+from .registry import DayView, timetable_registry
+from .utils import format_day_label
+from .vr_lab import is_vr_lab_event
+
+logger = logging.getLogger(__name__)
+
+
+def _event_line(event: Dict[str, Any], location: str) -> str:
+    return f"{event['start_time']} – {event['end_time']} · <b>{event['title']}</b>{location}"
+
+
+def _location_suffix(event: Dict[str, Any]) -> str:
+    return f" ({event.get('location', '')})" if event.get("location") else ""
+
+
+@dataclass
+class ScheduleTemplate:
+    """Pre-rendered day schedule. ``lines`` holds defaults for every slot."""
+
+    lines: List[str]
+    labels: List[Dict[str, str]]
+    # line index -> (group_id, {registered event_id -> line})
+    group_slots: Dict[int, Tuple[str, Dict[str, str]]] = field(default_factory=dict)
+    # line index -> line prefix used when the user has a VR-lab booking
+    vr_slots: Dict[int, str] = field(default_factory=dict)
+
+    def render(
+        self,
+        user_group_registrations: Dict[str, str],
+        vr_lab_booking: Optional[Tuple[str, str]],
+    ) -> str:
+        lines = self.lines
+        if user_group_registrations or vr_lab_booking:
+            lines = list(lines)
+            for index, (group_id, registered_lines) in self.group_slots.items():
+                registered_line = registered_lines.get(user_group_registrations.get(group_id, ""))
+                if registered_line:
+                    lines[index] = registered_line
+            if vr_lab_booking:
+                room, slot = vr_lab_booking
+                for index, prefix in self.vr_slots.items():
+                    lines[index] = f"{prefix} <i>— Твой слот: ауд. {room}, {slot}</i>"
+        return "\n".join(lines).strip()
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "lines": self.lines,
+                "labels": self.labels,
+                "group_slots": {str(index): list(slot) for index, slot in self.group_slots.items()},
+                "vr_slots": {str(index): prefix for index, prefix in self.vr_slots.items()},
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "ScheduleTemplate":
+        data = json.loads(raw)
+        return cls(
+            lines=data["lines"],
+            labels=data["labels"],
+            group_slots={int(index): (slot[0], slot[1]) for index, slot in data["group_slots"].items()},
+            vr_slots={int(index): prefix for index, prefix in data["vr_slots"].items()},
+        )
+
+
+def build_schedule_template(config: Config, day: int, day_view: DayView) -> ScheduleTemplate:
+    header = f"<b>Расписание – {format_day_label(config.start_date, day)}</b>\n"
+    template = ScheduleTemplate(
+        lines=[header, ""],
+        labels=[{"id": item.item_id, "label": item.label} for item in day_view.schedule_items],
+    )
+
+    for item in day_view.schedule_items:
+        if item.type == "simple":
+            event_id = item.item_id.split(":", 1)[1]
+            event = day_view.event_map.get(event_id)
+            if not event:
+                continue
+            if is_vr_lab_event(event):
+                template.vr_slots[len(template.lines)] = _event_line(event, "")
+            template.lines.append(_event_line(event, _location_suffix(event)))
+        else:
+            group_id = item.group_id
+            events = day_view.group_map.get(group_id, ())
+            if not events:
+                continue
+            registered_lines = {
+                event["event_id"]: _event_line(event, _location_suffix(event)) for event in events
+            }
+            template.group_slots[len(template.lines)] = (group_id, registered_lines)
+            titles = "\n• ".join(event.get("title", "") for event in events)
+            group_title = events[0].get("group_title") or "Параллельные мероприятия"
+            template.lines.append(
+                f"{events[0]['start_time']} – {events[0]['end_time']} · <b>{group_title}</b>:\n• {titles}"
+            )
+        template.lines.append("")
+
+    return template
+
+
+class ScheduleRenderCache:
+    """In-process cache of day templates, optionally shared across instances via Redis."""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._templates: Dict[int, ScheduleTemplate] = {}
+
+    async def get(self, config: Config, day: int, redis_manager: Optional[RedisManager] = None) -> ScheduleTemplate:
+        version = config.timetable.version
+        if version != self._version:
+            self._version = version
+            self._templates = {}
+
+        template = self._templates.get(day)
+        if template is not None:
+            return template
+
+        shared = redis_manager is not None and config.redis.share_schedule_cache
+        if shared:
+            try:
+                raw = await redis_manager.get_schedule_template(version, day)
+                if raw:
+                    template = ScheduleTemplate.from_json(raw)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Failed to read shared schedule template: %s", exc)
+
+        if template is None:
+            template = build_schedule_template(config, day, timetable_registry.get_day(config.timetable, day))
+            if shared:
+                try:
+                    await redis_manager.set_schedule_template(version, day, template.to_json())
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("Failed to share schedule template: %s", exc)
+
+        self._templates[day] = template
+        return template
+
+
+schedule_render_cache = ScheduleRenderCache()
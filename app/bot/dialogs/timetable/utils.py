@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
 from config.config import Event
@@ -29,6 +30,23 @@ def generate_group_id(event: Event) -> Optional[str]:
     return event.group_id
 
 
+WEEKDAY_NAMES = {
+    0: "Понедельник",
+    1: "Вторник",
+    2: "Среда",
+    3: "Четверг",
+    4: "Пятница",
+    5: "Суббота",
+    6: "Воскресенье",
+}
+
+
+def format_day_label(start_date: datetime, day_offset: int) -> str:
+    target_date = start_date + timedelta(days=day_offset)
+    weekday = WEEKDAY_NAMES.get(target_date.weekday(), target_date.strftime("%A"))
+    return target_date.strftime("%d.%m (") + weekday + ")"
+
+
 def format_event_time_range(start_time: str, end_time: str) -> str:
     """Format a time range for display."""
     return f"{start_time} – {end_time}"
@@ -135,4 +153,6 @@ def serialize_event(event: Event) -> Dict[str, Any]:
         "capacity_override": event.capacity_override,
         "alias": event.alias,
         "short_title": event.short_title,
+        "slot_rooms": list(event.slot_rooms) if event.slot_rooms else None,
+        "slot_minutes": event.slot_minutes,
     }
\ No newline at end of file
@@ -2,8 +2,9 @@
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Dict, Iterable, Mapping, Optional, Tuple
 
 VR_LAB_GROUP_ID = "vr_lab:20251024"
 VR_LAB_ROOMS: Tuple[str, ...] = ("2206", "2212", "2213", "2215")
@@ -17,7 +18,80 @@ VR_LAB_SLOT_TIMES: Tuple[str, ...] = tuple(
     for index in range(_VR_SLOT_COUNT)
 )
 
-TOTAL_SLOTS_PER_ROOM = len(VR_LAB_SLOT_TIMES)
+
+@dataclass(frozen=True)
+class VrLabLayout:
+    """Room × slot grid of the VR lab; every cell holds exactly one participant."""
+
+    rooms: Tuple[str, ...]
+    slot_times: Tuple[str, ...]
+    slot_minutes: int = _VR_SLOT_INTERVAL_MINUTES
+
+    @property
+    def slots_per_room(self) -> int:
+        return len(self.slot_times)
+
+    @property
+    def layout_key(self) -> str:
+        """Fingerprint of the grid; cached bitmaps built for another grid are discarded."""
+        return f"{','.join(self.rooms)}|{','.join(self.slot_times)}"
+
+    def slot_index(self, slot_time: str) -> Optional[int]:
+        try:
+            return self.slot_times.index(slot_time)
+        except ValueError:
+            return None
+
+    def iter_room_slot_event_ids(self, room: str) -> Iterable[str]:
+        """Yield all slot identifiers for the given room."""
+        for slot_time in self.slot_times:
+            yield build_slot_event_id(room, slot_time)
+
+    def taken_slot_indexes(self, counts: Mapping[str, int]) -> Dict[str, Tuple[int, ...]]:
+        """Return room -> indexes of occupied slots based on counts mapping."""
+        return {
+            room: tuple(
+                index
+                for index, event_id in enumerate(self.iter_room_slot_event_ids(room))
+                if counts.get(event_id, 0) > 0
+            )
+            for room in self.rooms
+        }
+
+    def ensure_room(self, room: str) -> str:
+        if room not in self.rooms:
+            raise ValueError(f"Unknown VR lab room: {room}")
+        return room
+
+
+DEFAULT_VR_LAB_LAYOUT = VrLabLayout(rooms=VR_LAB_ROOMS, slot_times=VR_LAB_SLOT_TIMES)
+
+
+def build_vr_lab_layout(event_payload: Optional[Mapping[str, object]]) -> VrLabLayout:
+    """Build the slot grid from the timetable entry, falling back to the built-in defaults.
+
+    Rooms come from ``slot_rooms``; slots of ``slot_minutes`` fill the event's
+    start–end interval.
+    """
+    if not event_payload:
+        return DEFAULT_VR_LAB_LAYOUT
+
+    rooms = tuple(event_payload.get("slot_rooms") or ()) or VR_LAB_ROOMS
+    slot_minutes = int(event_payload.get("slot_minutes") or _VR_SLOT_INTERVAL_MINUTES)
+    try:
+        start = datetime.strptime(str(event_payload["start_time"]), "%H:%M")
+        end = datetime.strptime(str(event_payload["end_time"]), "%H:%M")
+    except (KeyError, ValueError):
+        return VrLabLayout(rooms=rooms, slot_times=VR_LAB_SLOT_TIMES, slot_minutes=slot_minutes)
+
+    slot_count = int((end - start).total_seconds() // 60 // slot_minutes)
+    if slot_count <= 0:
+        return VrLabLayout(rooms=rooms, slot_times=VR_LAB_SLOT_TIMES, slot_minutes=slot_minutes)
+
+    slot_times = tuple(
+        (start + timedelta(minutes=slot_minutes * index)).strftime("%H:%M") for index in range(slot_count)
+    )
+    return VrLabLayout(rooms=rooms, slot_times=slot_times, slot_minutes=slot_minutes)
 
 
 def is_vr_lab_event(event_payload: Dict[str, object]) -> bool:
@@ -47,20 +121,3 @@ def parse_slot_event_id(event_id: str) -> Optional[Tuple[str, str]]:
     else:
         slot_time = raw_slot
     return room, slot_time
-
-
-def iter_room_slot_event_ids(room: str) -> Iterable[str]:
-    """Yield all slot identifiers for the given room."""
-    for slot_time in VR_LAB_SLOT_TIMES:
-        yield build_slot_event_id(room, slot_time)
-
-
-def count_room_taken_slots(room: str, counts: Dict[str, int]) -> int:
-    """Return how many slots are occupied for a room based on counts mapping."""
-    return sum(counts.get(event_id, 0) for event_id in iter_room_slot_event_ids(room))
-
-
-def ensure_room(room: str) -> str:
-    if room not in VR_LAB_ROOMS:
-        raise ValueError(f"Unknown VR lab room: {room}")
-    return room
@@ -0,0 +1,200 @@
+"""Waitlist promotion for full parallel events and VR-lab slots.
+
+Users join a per-event FIFO waitlist in Redis instead of polling the group
+screen. Whenever a seat is freed (unregister or switch to another event of the
+group) the event is marked pending in Redis; a background task takes pending
+events, parks the first waitlisted user, registers them through the regular
+booking path and notifies them. Pending marks and parked users live in Redis,
+so a restart loses neither: on startup and then periodically the promoter
+returns users parked by a dead instance and rescans every non-empty waitlist.
+Users already registered for another event of the group are not moved, they
+are only told that a seat is available.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+from app.infrastructure.database.database import EventRegistrationStatus
+from config.config import ConfigProvider
+from .booking import SEAT_TAKEN_STATUSES, register_for_event
+from .group_counts import group_counts_loader
+from .registry import timetable_registry
+from .vr_lab import VR_LAB_GROUP_ID, parse_slot_event_id
+
+logger = logging.getLogger(__name__)
+
+# Статусы, при которых пользователя нельзя записать сейчас, но место в очереди нужно сохранить
+RETRY_LATER_STATUSES = {EventRegistrationStatus.GROUP_FULL, EventRegistrationStatus.ERROR}
+SWEEP_INTERVAL_SECONDS = 60.0
+# Пользователь «припаркован» дольше этого – обработавший его инстанс упал, возвращаем в очередь
+PARKED_STALE_SECONDS = 120.0
+
+
+class WaitlistPromoter:
+    """Consumes "seat freed" signals and promotes waitlisted users one by one."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        db_manager: DatabaseManager,
+        redis_manager: RedisManager,
+        config_provider: ConfigProvider,
+    ):
+        self.bot = bot
+        self.db_manager = db_manager
+        self.redis_manager = redis_manager
+        self.config_provider = config_provider
+        self._wakeup = asyncio.Event()
+
+    async def seat_freed(self, group_id: str, event_id: str) -> None:
+        await self.redis_manager.mark_waitlist_pending(group_id, event_id)
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        next_sweep = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_sweep:
+                    await self._sweep()
+                    next_sweep = time.monotonic() + SWEEP_INTERVAL_SECONDS
+                await self._drain()
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Waitlist promotion pass failed", exc_info=exc)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), SWEEP_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _sweep(self) -> None:
+        """Recover parked users and mark every non-empty waitlist pending; full events are skipped cheaply."""
+        requeued = await self.redis_manager.requeue_stale_parked(PARKED_STALE_SECONDS)
+        if requeued:
+            logger.warning("Returned %s stale parked users to waitlists", requeued)
+        for event_id in await self.redis_manager.get_waitlisted_events():
+            group_id = self._get_group(event_id)
+            if group_id:
+                await self.redis_manager.mark_waitlist_pending(group_id, event_id)
+
+    async def _drain(self) -> None:
+        while True:
+            pending = await self.redis_manager.take_pending_waitlist()
+            if pending is None:
+                return
+            group_id, event_id = pending
+            try:
+                await self._promote(group_id, event_id)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Failed to promote waitlist of event %s", event_id, exc_info=exc)
+                # Повторим на следующем проходе
+                await self.redis_manager.mark_waitlist_pending(group_id, event_id)
+                return
+
+    def _get_group(self, event_id: str) -> Optional[str]:
+        if parse_slot_event_id(event_id):
+            return VR_LAB_GROUP_ID
+        return timetable_registry.get_event_group(self.config_provider.config.timetable, event_id)
+
+    def _get_capacity(self, group_id: str, event_id: str) -> Optional[int]:
+        if group_id == VR_LAB_GROUP_ID:
+            return 1
+        capacities = timetable_registry.get_group_capacities(self.config_provider.config.timetable, group_id)
+        return capacities.get(event_id)
+
+    async def _has_free_seat(self, group_id: str, event_id: str, capacity: int) -> bool:
+        counts = await group_counts_loader.get(self.db_manager, self.redis_manager, group_id)
+        return counts.get(event_id, 0) < capacity
+
+    async def _promote(self, group_id: str, event_id: str) -> None:
+        capacity = self._get_capacity(group_id, event_id)
+        if capacity is None:
+            logger.info("Event %s is no longer in the timetable, waitlist is not promoted", event_id)
+            return
+
+        while await self._has_free_seat(group_id, event_id, capacity):
+            entry = await self.redis_manager.park_waitlist_head(event_id)
+            if entry is None:
+                return
+
+            user_id, joined_at = entry
+            try:
+                requeue = await self._offer_seat(user_id, group_id, event_id, capacity)
+            except Exception:
+                await self.redis_manager.unpark_waitlist_entry(event_id, user_id, joined_at, requeue=True)
+                raise
+            await self.redis_manager.unpark_waitlist_entry(event_id, user_id, joined_at, requeue=requeue)
+            if requeue:
+                return
+
+    async def _offer_seat(self, user_id: int, group_id: str, event_id: str, capacity: int) -> bool:
+        """Register the parked user; returns True if they should keep their place in the waitlist."""
+        current = await self.db_manager.get_user_event_registration(user_id, group_id)
+        if current is not None:
+            # Лист ожидания не переносит существующую запись: только сообщаем о свободном месте
+            if current.event_id != event_id:
+                await self._notify_seat_available(user_id, group_id, event_id)
+            logger.info("Waitlisted user %s already registered in group %s, not moved", user_id, group_id)
+            return False
+
+        result = await register_for_event(
+            self.db_manager,
+            self.redis_manager,
+            self.config_provider.config,
+            user_id,
+            event_id,
+            group_id,
+            capacity,
+            waitlist=self,
+        )
+        if result.status in SEAT_TAKEN_STATUSES:
+            logger.info("User %s promoted from waitlist to event %s", user_id, event_id)
+            await self._notify(user_id, group_id, event_id)
+            return False
+        if result.status in RETRY_LATER_STATUSES:
+            return True
+        logger.info("Skipping waitlisted user %s for event %s: %s", user_id, event_id, result.status.value)
+        return False
+
+    async def _notify_seat_available(self, user_id: int, group_id: str, event_id: str) -> None:
+        if group_id == VR_LAB_GROUP_ID:
+            room, slot = parse_slot_event_id(event_id) or ("?", "?")
+            text = (
+                f"Освободился слот VR-lab: ауд. {room}, {slot}. "
+                "У вас уже есть запись в VR-lab, поэтому мы её не меняли."
+            )
+        else:
+            event = timetable_registry.get_event(self.config_provider.config.timetable, event_id) or {}
+            text = (
+                f"Освободилось место на <b>{event.get('title', 'мероприятие')}</b>"
+                f" ({event.get('start_time', '')} – {event.get('end_time', '')}). "
+                "Вы уже записаны на другой вариант в этом блоке, поэтому мы не меняли запись."
+            )
+        text += "\n\nПоменять запись можно в разделе «Расписание»."
+        await self._send(user_id, text)
+
+    async def _notify(self, user_id: int, group_id: str, event_id: str) -> None:
+        if group_id == VR_LAB_GROUP_ID:
+            room, slot = parse_slot_event_id(event_id) or ("?", "?")
+            text = f"🎉 Освободился слот VR-lab! Вы записаны: ауд. {room}, {slot}."
+        else:
+            event = timetable_registry.get_event(self.config_provider.config.timetable, event_id) or {}
+            text = (
+                f"🎉 Освободилось место! Вы зарегистрированы на <b>{event.get('title', 'мероприятие')}</b>"
+                f" ({event.get('start_time', '')} – {event.get('end_time', '')})."
+            )
+        text += "\n\nОтменить запись можно в разделе «Расписание»."
+
+        await self._send(user_id, text)
+
+    async def _send(self, user_id: int, text: str) -> None:
+        try:
+            await self.bot.send_message(user_id, text)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to notify user %s about waitlist: %s", user_id, exc)
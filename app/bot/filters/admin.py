@@ -0,0 +1,19 @@
+from typing import Iterable
+
+from aiogram.filters import BaseFilter
+from aiogram.types import Message
+
+from config.config import ConfigProvider
+
+
+class IsAdmin(BaseFilter):
+    """Пропускает сообщения только от администраторов из ADMIN_IDS"""
+
+    def __init__(self, extra_ids: Iterable[int] = ()):
+        self.extra_ids = frozenset(extra_ids)
+
+    async def __call__(self, message: Message, config_provider: ConfigProvider) -> bool:
+        user = message.from_user
+        if user is None:
+            return False
+        return config_provider.is_admin(user.id) or user.id in self.extra_ids
@@ -14,25 +14,55 @@ from aiogram import Router
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message
 from aiogram_dialog import DialogManager, StartMode
+import hashlib
+import html
 import logging
+from datetime import datetime
+from typing import Optional
 
+from app.bot.filters.admin import IsAdmin
 from app.bot.states.start import StartSG
-from app.infrastructure.database import DatabaseManager
-from app.bot.dialogs.timetable.vr_lab import (
-    VR_LAB_ROOMS,
-    VR_LAB_SLOT_TIMES,
-    build_slot_event_id,
-)
+from app.infrastructure.database import DatabaseManager, RedisManager
+from app.infrastructure.timetable_reload import TimetableReloader
+from config.config import Config, ConfigProvider
+from app.bot.dialogs.timetable.counts_reconciler import CountsReconciler
+from app.bot.dialogs.timetable.registry import timetable_registry
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# Организаторы, которым дополнительно разрешена выгрузка дебатов в Google Таблицы
+SHEETS_SYNC_EXTRA_ADMIN_IDS = (1497469650, 860487502, 474503734)
+
+ADMIN_COMMANDS = (
+    "test_error",
+    "test_warning",
+    "test_critical",
+    "test_exception",
+    "debate_stats",
+    "reset_user_registration",
+    "sync_debate_cache",
+    "detailed_stats",
+    "user_info",
+    "sync_debates_google",
+    "sync_reg_google",
+    "reload_timetable",
+    "cache_stats",
+    "reconcile_stats",
+)
+
+
+def _profile_fingerprint(username: Optional[str], visible_name: str) -> str:
+    """Short digest of the stored profile fields; a changed profile is written to the DB again."""
+    return hashlib.blake2b(f"{username or ''}\x00{visible_name}".encode("utf-8"), digest_size=8).hexdigest()
+
 
 @router.message(CommandStart())
 async def start_command(message: Message, dialog_manager: DialogManager):
     """Обработчик команды /start"""
-    # Получаем менеджер базы данных из middleware
+    # Получаем менеджеры базы данных и Redis из middleware
     db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
+    redis_manager: RedisManager = dialog_manager.middleware_data["redis_manager"]
     
     user = message.from_user
     user_id = user.id
@@ -50,15 +80,17 @@ async def start_command(message: Message, dialog_manager: DialogManager):
     else:
         visible_name = f"User {user_id}"
     
-    # Проверяем, существует ли пользователь в базе
-    existing_user = await db_manager.get_user(user_id)
-    
-    if not existing_user:
-        # Создаем нового пользователя
-        await db_manager.create_user(user_id, username, visible_name)
-        logger.info(f"Created new user: {user_id} ({visible_name})")
-    else:
+    # Пользователь с тем же профилем уже в базе – обходимся одним запросом к Redis
+    fingerprint = _profile_fingerprint(username, visible_name)
+    if await redis_manager.is_known_user(user_id, fingerprint):
         logger.info(f"Existing user started bot: {user_id} ({visible_name})")
+    else:
+        created = await db_manager.upsert_user(user_id, username, visible_name)
+        await redis_manager.remember_known_user(user_id, fingerprint)
+        if created:
+            logger.info(f"Created new user: {user_id} ({visible_name})")
+        else:
+            logger.info(f"Existing user started bot: {user_id} ({visible_name})")
     
     #await dialog_manager.start(StartSG.welcome, mode=StartMode.RESET_STACK)
     from app.bot.states.main_menu import MainMenuSG
@@ -73,12 +105,9 @@ async def menu_command(message: Message, dialog_manager: DialogManager):
 
 
 @router.message(Command("help"))
-async def help_command(message: Message):
+async def help_command(message: Message, config_provider: ConfigProvider):
     """Обработчик команды /help"""
-    from config.config import load_config
-    config = load_config()
-    
-    is_admin = message.from_user.id in config.logging.admin_ids
+    is_admin = config_provider.is_admin(message.from_user.id)
     
     help_text = (
         "🤖 <b>Бот конференции Менеджмент Будущего 2025</b>\n\n"
@@ -102,7 +131,10 @@ async def help_command(message: Message):
             "/reset_user_registration <user_id> - Сбросить регистрацию пользователя\n"
             "/sync_debate_cache - Синхронизировать кеш с БД\n"
             "/sync_debates_google - Синхронизировать данные с Google Таблицами\n\n"
-            "/sync_reg_google - Экспорт регистраций по мероприятиям в Google\n\n"
+            "/sync_reg_google - Экспорт регистраций по мероприятиям в Google\n"
+            "/reload_timetable - Перечитать расписание без перезапуска бота\n"
+            "/cache_stats - Статистика локального кеша Redis\n"
+            "/reconcile_stats - Сверка счётчиков Redis с БД\n\n"
             "<b>🧪 Команды для тестирования:</b>\n"
             "/test_error - Тестовая ошибка\n"
             "/test_warning - Тестовые предупреждения\n"
@@ -113,32 +145,16 @@ async def help_command(message: Message):
     await message.answer(help_text, parse_mode="HTML")
 
 
-@router.message(Command("test_error"))
+@router.message(Command("test_error"), IsAdmin())
 async def test_error_command(message: Message):
     """Команда для тестирования ERROR уведомлений админам"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     logger.error(f"Тестовая ошибка от админа {message.from_user.id}")
     await message.answer("✅ ERROR уведомление отправлено")
 
 
-@router.message(Command("test_warning"))
+@router.message(Command("test_warning"), IsAdmin())
 async def test_warning_command(message: Message):
     """Команда для тестирования WARNING уведомлений админам"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Генерируем 6 WARNING для тестирования порога
     for i in range(6):
         logger.warning(f"Тестовое предупреждение #{i+1} от админа {message.from_user.id}")
@@ -146,48 +162,24 @@ async def test_warning_command(message: Message):
     await message.answer("✅ 6 WARNING отправлено (должно вызвать уведомление)")
 
 
-@router.message(Command("test_critical"))
+@router.message(Command("test_critical"), IsAdmin())
 async def test_critical_command(message: Message):
     """Команда для тестирования CRITICAL уведомлений админам"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     logger.critical(f"Тестовая критическая ошибка от админа {message.from_user.id}")
     await message.answer("✅ CRITICAL уведомление отправлено")
 
 
-@router.message(Command("test_exception"))
+@router.message(Command("test_exception"), IsAdmin())
 async def test_exception_command(message: Message):
     """Команда для тестирования обработки исключений"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     await message.answer("🧪 Генерирую исключение для тестирования...")
     # Это исключение будет поймано middleware и отправлено админам
     raise RuntimeError(f"Тестовое исключение от админа {message.from_user.id}")
 
 
-@router.message(Command("debate_stats"))
+@router.message(Command("debate_stats"), IsAdmin())
 async def debate_stats_command(message: Message, dialog_manager: DialogManager):
     """Команда для просмотра статистики регистрации на дебаты"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем менеджеры из middleware
     db_manager = dialog_manager.middleware_data["db_manager"]
     redis_manager = dialog_manager.middleware_data["redis_manager"]
@@ -232,17 +224,9 @@ async def debate_stats_command(message: Message, dialog_manager: DialogManager):
         await message.answer("❌ Ошибка при получении статистики")
 
 
-@router.message(Command("reset_user_registration"))
+@router.message(Command("reset_user_registration"), IsAdmin())
 async def reset_user_registration_command(message: Message, dialog_manager: DialogManager):
     """Команда для сброса регистрации конкретного пользователя"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем user_id из команды
     command_parts = message.text.split()
     if len(command_parts) != 2:
@@ -276,12 +260,13 @@ async def reset_user_registration_command(message: Message, dialog_manager: Dial
         old_case = user.debate_reg
         case_name = await redis_manager.get_case_name(old_case)
         
-        # Сбрасываем регистрацию в БД
-        await db_manager.update_user_debate_registration(target_user_id, None)
-        
-        # Синхронизируем Redis с БД
-        db_counts = await db_manager.get_debate_registrations_count()
-        await redis_manager.sync_with_database(db_counts)
+        # Сбрасываем регистрацию в БД и возвращаем место в пул кейса
+        cleared_case = await db_manager.clear_user_debate_registration(target_user_id)
+        if not cleared_case:
+            # Регистрацию успели снять между проверкой и сбросом
+            await message.answer(f"ℹ️ Пользователь {target_user_id} не зарегистрирован на дебаты")
+            return
+        await redis_manager.release_debate_case(cleared_case)
         
         await message.answer(
             f"✅ Регистрация пользователя {target_user_id} на кейс {case_name} сброшена",
@@ -295,17 +280,9 @@ async def reset_user_registration_command(message: Message, dialog_manager: Dial
         await message.answer("❌ Ошибка при сбросе регистрации")
 
 
-@router.message(Command("sync_debate_cache"))
+@router.message(Command("sync_debate_cache"), IsAdmin())
 async def sync_debate_cache_command(message: Message, dialog_manager: DialogManager):
     """Команда для принудительной синхронизации Redis кеша с БД"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем менеджеры из middleware
     db_manager = dialog_manager.middleware_data["db_manager"]
     redis_manager = dialog_manager.middleware_data["redis_manager"]
@@ -328,17 +305,9 @@ async def sync_debate_cache_command(message: Message, dialog_manager: DialogMana
         await message.answer("❌ Ошибка при синхронизации кеша")
 
 
-@router.message(Command("detailed_stats"))
+@router.message(Command("detailed_stats"), IsAdmin())
 async def detailed_stats_command(message: Message, dialog_manager: DialogManager):
     """Команда для получения детальной статистики"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем менеджеры из middleware
     db_manager = dialog_manager.middleware_data["db_manager"]
     redis_manager = dialog_manager.middleware_data["redis_manager"]
@@ -410,17 +379,9 @@ async def detailed_stats_command(message: Message, dialog_manager: DialogManager
         await message.answer("❌ Ошибка при получении детальной статистики")
 
 
-@router.message(Command("user_info"))
+@router.message(Command("user_info"), IsAdmin())
 async def user_info_command(message: Message, dialog_manager: DialogManager):
     """Команда для получения информации о конкретном пользователе"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-    
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем user_id из команды
     command_parts = message.text.split()
     if len(command_parts) != 2:
@@ -466,19 +427,9 @@ async def user_info_command(message: Message, dialog_manager: DialogManager):
         await message.answer("❌ Ошибка при получении информации о пользователе")
 
 
-@router.message(Command("sync_debates_google"))
+@router.message(Command("sync_debates_google"), IsAdmin(extra_ids=SHEETS_SYNC_EXTRA_ADMIN_IDS))
 async def sync_debates_google_command(message: Message, dialog_manager: DialogManager):
     """Команда для синхронизации данных с Google Таблицами"""
-    # Проверяем права доступа (только для админов)
-    from config.config import load_config
-    config = load_config()
-
-    additional_admins = [1497469650,860487502,474503734]
-    
-    if message.from_user.id not in config.logging.admin_ids and message.from_user.id not in additional_admins:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-    
     # Получаем менеджеры из middleware
     db_manager = dialog_manager.middleware_data["db_manager"]
     redis_manager = dialog_manager.middleware_data["redis_manager"]
@@ -527,16 +478,9 @@ async def sync_debates_google_command(message: Message, dialog_manager: DialogMa
         )
 
 
-@router.message(Command("sync_reg_google"))
-async def sync_reg_google_command(message: Message, dialog_manager: DialogManager):
+@router.message(Command("sync_reg_google"), IsAdmin())
+async def sync_reg_google_command(message: Message, dialog_manager: DialogManager, config: Config):
     """Экспорт регистраций по мероприятиям в Google Sheets (только для админов)."""
-    from config.config import load_config
-
-    config = load_config()
-    if message.from_user.id not in config.logging.admin_ids:
-        await message.answer("❌ У вас нет прав для выполнения этой команды")
-        return
-
     db_manager: DatabaseManager = dialog_manager.middleware_data["db_manager"]
     google_sheets_manager = dialog_manager.middleware_data["google_sheets_manager"]
 
@@ -560,9 +504,9 @@ async def sync_reg_google_command(message: Message, dialog_manager: DialogManage
             header = f"{event.start_date} {event.start_time} · {event.title}"
             event_columns.append((event.event_id, header))
 
-        for room in VR_LAB_ROOMS:
-            for slot in VR_LAB_SLOT_TIMES:
-                event_id = build_slot_event_id(room, slot)
+        vr_lab_layout = timetable_registry.get_vr_lab_layout(config.timetable)
+        for room in vr_lab_layout.rooms:
+            for slot, event_id in zip(vr_lab_layout.slot_times, vr_lab_layout.iter_room_slot_event_ids(room)):
                 if event_id in seen_event_ids:
                     continue
                 seen_event_ids.add(event_id)
@@ -622,3 +566,112 @@ async def sync_reg_google_command(message: Message, dialog_manager: DialogManage
             f"Подробности в логах: {str(exc)[:120]}...",
             parse_mode="HTML",
         )
+
+
+@router.message(Command("reload_timetable"), IsAdmin())
+async def reload_timetable_command(
+    message: Message,
+    config_provider: ConfigProvider,
+    timetable_reloader: TimetableReloader,
+):
+    """Перечитать timetable.json и применить изменения без перезапуска бота"""
+    status_message = await message.answer("🔄 Перечитываю расписание...")
+
+    try:
+        await config_provider.refresh(force=True)
+        diff = timetable_reloader.last_diff
+
+        if diff is None or diff.is_empty:
+            await status_message.edit_text(
+                f"✅ Расписание актуально (версия {config_provider.config.timetable.version})",
+                parse_mode="HTML",
+            )
+            return
+
+        lines = [
+            "⚠️ <b>Расписание обновлено, регистрации не перенесены</b>"
+            if diff.migration_error
+            else "✅ <b>Расписание обновлено</b>",
+            f"Версия: {diff.old_version} → {diff.new_version}",
+            "",
+            f"➕ Добавлено: {len(diff.added)}",
+            f"➖ Удалено: {len(diff.removed)}",
+            f"🔁 Переименовано: {len(diff.rekeyed)}",
+            f"📝 Перенесено регистраций: {diff.migrated_registrations}",
+            f"🧹 Сброшено кешей групп: {len(diff.affected_groups)}",
+        ]
+        if diff.removed:
+            lines.append("")
+            lines.append("Удалённые event_id: " + ", ".join(diff.removed))
+        if diff.rekeyed:
+            lines.append("")
+            lines.append("Новые ключи:")
+            lines.extend(f"• {old_id} → {new_id}" for old_id, new_id in diff.rekeyed.items())
+        if diff.dropped_registrations:
+            lines.append("")
+            lines.append(
+                f"🗑 Удалено конфликтующих регистраций: {len(diff.dropped_registrations)} "
+                "(у пользователя уже есть место в новой группе)"
+            )
+            lines.extend(f"• {row.user_id}: {row.event_id}" for row in diff.dropped_registrations)
+        if diff.migration_error:
+            lines.append("")
+            lines.append(
+                "❌ Ошибка переноса регистраций, они остались под старыми event_id: "
+                f"{html.escape(diff.migration_error[:200])}"
+            )
+
+        await status_message.edit_text("\n".join(lines), parse_mode="HTML")
+        logger.info("Admin %s reloaded timetable: %s", message.from_user.id, diff)
+
+    except Exception as exc:
+        logger.error("Error reloading timetable: %s", exc)
+        await status_message.edit_text(
+            "❌ <b>Не удалось перечитать расписание</b>\n\n"
+            f"Подробности в логах: {str(exc)[:120]}...",
+            parse_mode="HTML",
+        )
+
+
+@router.message(Command("cache_stats"), IsAdmin())
+async def cache_stats_command(message: Message, dialog_manager: DialogManager):
+    """Статистика локального кеша поверх Redis"""
+    redis_manager = dialog_manager.middleware_data["redis_manager"]
+    stats = redis_manager.get_local_cache_stats()
+    if stats is None:
+        await message.answer("ℹ️ Локальный кеш выключен (REDIS_LOCAL_CACHE=false)")
+        return
+
+    await message.answer(
+        "📦 <b>Локальный кеш Redis</b>\n\n"
+        f"Записей: {stats['size']}/{stats['max_size']}\n"
+        f"Попадания: {stats['hits']} · Промахи: {stats['misses']}\n"
+        f"Доля попаданий: {stats['hit_ratio']:.1%}\n"
+        f"Вытеснено по LRU: {stats['evictions']} · Сброшено по событиям: {stats['invalidations']}",
+        parse_mode="HTML",
+    )
+
+
+@router.message(Command("reconcile_stats"), IsAdmin())
+async def reconcile_stats_command(message: Message, counts_reconciler: CountsReconciler):
+    """Метрики сверки счётчиков Redis с БД"""
+    stats = counts_reconciler.stats()
+    if not stats["runs"]:
+        await message.answer("ℹ️ Сверка счётчиков ещё не выполнялась (REDIS_RECONCILE_INTERVAL)")
+        return
+
+    last_run = datetime.fromtimestamp(stats["last_run_at"]).strftime("%H:%M:%S")
+    await message.answer(
+        "🔁 <b>Сверка счётчиков Redis с БД</b>\n\n"
+        f"Проходов: {stats['runs']} · Ошибок: {stats['failures']}\n"
+        f"Последний проход: {last_run}, {stats['last_duration'] * 1000:.0f} мс\n"
+        f"Расхождений в последнем проходе: {stats['last_drifted']}\n"
+        f"Всего расхождений: {stats['drifted_total']} · Исправлено: {stats['healed_total']}",
+        parse_mode="HTML",
+    )
+
+
+@router.message(Command(*ADMIN_COMMANDS))
+async def admin_command_forbidden(message: Message):
+    """Ответ на административные команды от пользователей без прав"""
+    await message.answer("❌ У вас нет прав для выполнения этой команды")
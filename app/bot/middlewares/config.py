@@ -2,12 +2,14 @@ from typing import Callable, Dict, Any, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
+from config.config import ConfigProvider
+
 
 class ConfigMiddleware(BaseMiddleware):
     """Middleware для передачи конфигурации в данные обработчиков"""
     
-    def __init__(self, config):
-        self.config = config
+    def __init__(self, provider: ConfigProvider):
+        self.provider = provider
     
     async def __call__(
         self,
@@ -15,5 +17,7 @@ class ConfigMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        data["config"] = self.config
+        # Один снимок конфигурации на весь апдейт, без обращения к диску
+        data["config"] = self.provider.config
+        data["config_provider"] = self.provider
         return await handler(event, data)
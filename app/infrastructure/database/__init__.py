@@ -1,6 +1,6 @@
 """Database infrastructure module"""
-from .models import Base, User, EventRegistration
-from .database import DatabaseManager
+from .models import Base, User, EventRegistration, EventCapacity, DebateCaseCount
+from .database import DatabaseManager, RegistrationCountsSnapshot, UserRow, UserSnapshot
 from .redis_manager import RedisManager
 
-__all__ = ["Base", "User", "EventRegistration", "DatabaseManager", "RedisManager"]
\ No newline at end of file
+__all__ = ["Base", "User", "EventRegistration", "EventCapacity", "DebateCaseCount", "DatabaseManager", "RegistrationCountsSnapshot", "UserRow", "UserSnapshot", "RedisManager"]
\ No newline at end of file
@@ -1,18 +1,36 @@
 """Database manager for SQLAlchemy operations"""
 
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from enum import Enum
-from typing import Optional, Dict, Any, List, Set, Iterable
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional, Dict, Any, List, Set, Iterable, Tuple
+from uuid import uuid4
 
-from sqlalchemy import select, func, delete
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncpg
+from sqlalchemy import String, and_, bindparam, case, cast, exists, select, func, delete, literal, literal_column, or_, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from config.config import DatabaseConfig
-from .models import Base, EventRegistration, User, CoachSessionRequest
+from .migrations import ensure_schema_version
+from .models import DebateCaseCount, EventCapacity, EventRegistration, User, CoachSessionRequest
+
+if TYPE_CHECKING:
+    from .redis_manager import RedisManager
 
 logger = logging.getLogger(__name__)
 
+# Канал NOTIFY, в который триггеры пишут изменения счётчиков регистраций
+REGISTRATION_COUNTS_CHANNEL = "registration_counts"
+# Источник изменений, которые записывающий код уже применил к Redis сам
+COUNTS_SOURCE_APPLIED = "applied"
+
 
 class EventRegistrationStatus(Enum):
     SUCCESS = "success"
@@ -23,6 +41,158 @@ class EventRegistrationStatus(Enum):
     ERROR = "error"
 
 
+@dataclass(frozen=True, slots=True)
+class UserRow:
+    """Read-only user fields returned by hot lookups instead of an ORM entity."""
+
+    id: int
+    username: Optional[str]
+    visible_name: str
+    debate_reg: Optional[int]
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Facts about a user that hot paths check without loading the row."""
+
+    exists: bool
+    debate_reg: Optional[int]
+    has_coach_request: bool
+
+    def to_fields(self) -> Dict[str, str]:
+        return {
+            "exists": "1" if self.exists else "0",
+            "debate_reg": "" if self.debate_reg is None else str(self.debate_reg),
+            "coach": "1" if self.has_coach_request else "0",
+        }
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, str]) -> "UserSnapshot":
+        debate_reg = fields.get("debate_reg")
+        return cls(fields.get("exists") == "1", int(debate_reg) if debate_reg else None, fields.get("coach") == "1")
+
+
+@dataclass(frozen=True, slots=True)
+class EventRegistrationRow:
+    user_id: int
+    event_id: str
+    group_id: str
+    registered_at: Optional[datetime]
+
+
+@dataclass(frozen=True, slots=True)
+class CoachSessionRequestRow:
+    id: int
+    user_id: Optional[int]
+    created_at: Optional[datetime]
+
+
+# Core statements of hot reads, built once: no ORM entity loading or identity map on these paths
+_users = User.__table__
+_event_registrations = EventRegistration.__table__
+_coach_session_requests = CoachSessionRequest.__table__
+
+SELECT_USER = select(
+    _users.c.id, _users.c.username, _users.c.visible_name, _users.c.debate_reg
+).where(_users.c.id == bindparam("user_id"))
+
+_insert_user = pg_insert(_users).values(
+    id=bindparam("user_id"),
+    username=bindparam("username"),
+    visible_name=bindparam("visible_name"),
+)
+# Профиль перезаписывается только при изменении; xmax = 0 у только что вставленной строки
+UPSERT_USER = _insert_user.on_conflict_do_update(
+    index_elements=[_users.c.id],
+    set_={"username": _insert_user.excluded.username, "visible_name": _insert_user.excluded.visible_name},
+    where=or_(
+        _users.c.username.is_distinct_from(_insert_user.excluded.username),
+        _users.c.visible_name.is_distinct_from(_insert_user.excluded.visible_name),
+    ),
+).returning(literal_column("xmax = 0").label("created"))
+
+SELECT_USER_DEBATE_REG = select(_users.c.debate_reg).where(_users.c.id == bindparam("user_id"))
+
+SELECT_USER_EVENT_REGISTRATION = select(
+    _event_registrations.c.user_id,
+    _event_registrations.c.event_id,
+    _event_registrations.c.group_id,
+    _event_registrations.c.registered_at,
+).where(
+    _event_registrations.c.user_id == bindparam("user_id"),
+    _event_registrations.c.group_id == bindparam("group_id"),
+)
+
+SELECT_LAST_COACH_SESSION_REQUEST = (
+    select(_coach_session_requests.c.id, _coach_session_requests.c.user_id, _coach_session_requests.c.created_at)
+    .where(_coach_session_requests.c.user_id == bindparam("user_id"))
+    .order_by(_coach_session_requests.c.created_at.desc())
+    .limit(1)
+)
+
+# Одним запросом: есть ли пользователь, его кейс дебатов и была ли заявка на коуч-сессию
+SELECT_USER_SNAPSHOT = select(
+    exists().where(_users.c.id == bindparam("user_id")).label("user_exists"),
+    select(_users.c.debate_reg).where(_users.c.id == bindparam("user_id")).scalar_subquery().label("debate_reg"),
+    exists().where(_coach_session_requests.c.user_id == bindparam("user_id")).label("has_coach_request"),
+)
+
+
+@dataclass
+class RegistrationCountsSnapshot:
+    """Registrations counted from the source tables at one point in time."""
+
+    debate: Dict[int, int] = field(default_factory=dict)  # case_number -> registered
+    groups: Dict[str, Dict[str, int]] = field(default_factory=dict)  # group_id -> event_id -> taken
+
+
+@dataclass
+class EventRegistrationResult:
+    """Outcome of a registration attempt; previous_event_id is set for SWITCHED."""
+
+    status: EventRegistrationStatus
+    previous_event_id: Optional[str] = None
+
+
+class UnitOfWork:
+    """One lazily opened connection and session shared by everything handling an update.
+
+    Calls are serialized by a lock, since a session can't run statements
+    concurrently. Write methods still commit where they did before, releasing
+    row locks right away; the connection stays checked out until the update ends.
+    """
+
+    def __init__(self, manager: "DatabaseManager"):
+        self.manager = manager
+        self.lock = asyncio.Lock()
+        self.closed = False
+        self._connection: Optional[AsyncConnection] = None
+        self._session: Optional[AsyncSession] = None
+
+    async def get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._connection = await self.manager.engine.connect()
+            self._session = AsyncSession(bind=self._connection, expire_on_commit=False)
+        return self._session
+
+    async def close(self, commit: bool) -> None:
+        async with self.lock:
+            self.closed = True
+            if self._session is None:
+                return
+            try:
+                if commit:
+                    await self._session.commit()
+                else:
+                    await self._session.rollback()
+            finally:
+                await self._session.close()
+                await self._connection.close()
+
+
+_current_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar("db_unit_of_work", default=None)
+
+
 class DatabaseManager:
     """Manages database connections and operations"""
     
@@ -30,42 +200,194 @@ class DatabaseManager:
         self.config = config
         self.engine = None
         self.sessionmaker = None
+        self.user_snapshots: Optional["RedisManager"] = None
+        self.init_timings: Dict[str, float] = {}
         
     async def init(self):
-        """Initialize database connection"""
+        """Initialize database connection and check the schema is at the migration head"""
+        started = time.perf_counter()
         database_url = (
             f"postgresql+asyncpg://{self.config.user}:{self.config.password}"
             f"@{self.config.host}:{self.config.port}/{self.config.database}"
         )
         
-        self.engine = create_async_engine(database_url, echo=False)
+        self.engine = create_async_engine(database_url, echo=False, **self._engine_options())
         self.sessionmaker = async_sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
         
-        # Create tables if they don't exist
-        async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
-            
-        logger.info("Database initialized successfully")
+        # Схемой владеют миграции Alembic: только сверяем ревизию, без рефлексии таблиц
+        await ensure_schema_version(self.engine, self.config.auto_migrate)
+        schema_checked = time.perf_counter()
+
+        await self._warm_up_pool()
+        finished = time.perf_counter()
+        self.init_timings = {
+            "schema_check": schema_checked - started,
+            "pool_warmup": finished - schema_checked,
+            "total": finished - started,
+        }
+        logger.info(
+            "Database initialized in %.3f s (schema check %.3f s, pool warm-up %.3f s)",
+            self.init_timings["total"],
+            self.init_timings["schema_check"],
+            self.init_timings["pool_warmup"],
+        )
+
+    def _engine_options(self) -> Dict[str, Any]:
+        if self.config.pgbouncer:
+            # pgbouncer в режиме transaction отдаёт каждой транзакции любое серверное соединение:
+            # кеш подготовленных запросов выключен, имена запросов уникальны, пул держит сам pgbouncer
+            return {
+                "poolclass": NullPool,
+                "connect_args": {
+                    "statement_cache_size": 0,
+                    "prepared_statement_cache_size": 0,
+                    "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+                },
+            }
+        return {
+            "pool_size": self.config.pool_size,
+            "max_overflow": self.config.max_overflow,
+            "pool_timeout": self.config.pool_timeout,
+            "pool_recycle": self.config.pool_recycle,
+            "pool_pre_ping": self.config.pool_pre_ping,
+            "connect_args": {"statement_cache_size": self.config.statement_cache_size},
+        }
+
+    async def _warm_up_pool(self) -> None:
+        """Open pool connections up front so the first burst of updates doesn't pay for connects."""
+        if self.config.pgbouncer:
+            return
+        count = min(self.config.pool_warmup, self.config.pool_size)
+        if count <= 0:
+            return
+        connections = await asyncio.gather(*(self.engine.connect() for _ in range(count)))
+        for connection in connections:
+            await connection.close()
+        logger.info("Database pool warmed up with %s connections", count)
         
     async def close(self):
         """Close database connection"""
         if self.engine:
             await self.engine.dispose()
             logger.info("Database connection closed")
+
+    @asynccontextmanager
+    async def unit_of_work(self) -> AsyncIterator[None]:
+        """Share one session between all DatabaseManager calls made in this context.
+
+        Committed when the block exits normally and rolled back on error. Tasks
+        spawned inside that outlive the block fall back to their own sessions.
+        """
+        unit = UnitOfWork(self)
+        token = _current_unit_of_work.set(unit)
+        try:
+            yield
+        except BaseException:
+            await unit.close(commit=False)
+            raise
+        else:
+            await unit.close(commit=True)
+        finally:
+            _current_unit_of_work.reset(token)
+
+    @asynccontextmanager
+    async def _session_scope(self) -> AsyncIterator[AsyncSession]:
+        """Session of the current unit of work, or a short-lived one outside of it."""
+        unit = _current_unit_of_work.get()
+        if unit is None or unit.manager is not self:
+            async with self.sessionmaker() as session:
+                yield session
+            return
+
+        async with unit.lock:
+            if unit.closed:
+                async with self.sessionmaker() as session:
+                    yield session
+                return
+            session = await unit.get_session()
+            try:
+                yield session
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                # Объекты не переживают вызов: следующий запрос прочитает свежие строки, а не карту идентичности
+                session.expunge_all()
+
+    @staticmethod
+    @asynccontextmanager
+    async def _transaction(session: AsyncSession) -> AsyncIterator[None]:
+        """Commit on success, roll back on error; also joins a transaction already begun by reads."""
+        try:
+            yield
+        except BaseException:
+            await session.rollback()
+            raise
+        await session.commit()
+
+    async def listen(self, channel: str, callback: Callable[[str], None]) -> asyncpg.Connection:
+        """Open a dedicated connection outside the pool and LISTEN on the channel.
+
+        The callback gets the raw payload; the caller owns (and closes) the connection.
+        LISTEN needs a session-level connection, so behind pgbouncer it goes to
+        POSTGRES_DIRECT_HOST/PORT.
+        """
+        connection = await asyncpg.connect(
+            host=self.config.direct_host or self.config.host,
+            port=self.config.direct_port or self.config.port,
+            user=self.config.user,
+            password=self.config.password,
+            database=self.config.database,
+        )
+
+        def _on_notification(_connection, _pid, _channel, payload: str) -> None:
+            callback(payload)
+
+        await connection.add_listener(channel, _on_notification)
+        return connection
+
+    def attach_user_snapshots(self, redis_manager: "RedisManager") -> None:
+        """Cache user snapshots in Redis; every writer of the snapshot fields must go through this manager."""
+        self.user_snapshots = redis_manager
+
+    async def get_user_snapshot(self, user_id: int) -> UserSnapshot:
+        """Existence, debate case and coach request flag of the user; served from Redis when attached."""
+        version = ""
+        if self.user_snapshots is not None:
+            cached, version = await self.user_snapshots.get_user_snapshot(user_id)
+            if cached is not None:
+                return UserSnapshot.from_fields(cached)
+
+        async with self._session_scope() as session:
+            snapshot = UserSnapshot(*(await session.execute(SELECT_USER_SNAPSHOT, {"user_id": user_id})).one())
+        if self.user_snapshots is not None:
+            await self.user_snapshots.set_user_snapshot(user_id, snapshot.to_fields(), version)
+        return snapshot
+
+    async def _invalidate_user_snapshot(self, user_id: Optional[int]) -> None:
+        if self.user_snapshots is None or user_id is None:
+            return
+        try:
+            await self.user_snapshots.invalidate_user_snapshot(user_id)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("Failed to invalidate snapshot of user %s: %s", user_id, exc)
+
+    @staticmethod
+    async def _mark_counts_applied(session: AsyncSession) -> None:
+        """Tag the transaction so the counts feed skips changes the caller applies to Redis itself."""
+        await session.execute(select(func.set_config("app.counts_source", COUNTS_SOURCE_APPLIED, True)))
     
-    async def get_user(self, user_id: int) -> Optional[User]:
+    async def get_user(self, user_id: int) -> Optional[UserRow]:
         """Get user by telegram user_id"""
-        async with self.sessionmaker() as session:
-            result = await session.execute(
-                select(User).where(User.id == user_id)
-            )
-            return result.scalar_one_or_none()
+        async with self._session_scope() as session:
+            row = (await session.execute(SELECT_USER, {"user_id": user_id})).first()
+            return UserRow(*row) if row else None
     
     async def create_user(self, user_id: int, username: Optional[str], visible_name: str) -> User:
         """Create new user"""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             user = User(
                 id=user_id,
                 username=username,
@@ -76,12 +398,44 @@ class DatabaseManager:
             await session.commit()
             await session.refresh(user)
             logger.info(f"Created new user: {user}")
-            return user
+        await self._invalidate_user_snapshot(user_id)
+        return user
     
-    async def update_user_debate_registration(self, user_id: int, case_number: Optional[int]) -> bool:
-        """Update user's debate registration (case_number can be None to unregister)"""
-        async with self.sessionmaker() as session:
+    async def upsert_user(self, user_id: int, username: Optional[str], visible_name: str) -> Optional[bool]:
+        """Create the user or refresh changed profile fields in one statement.
+
+        Returns True if the user was created, False if the profile was updated
+        and None if nothing changed.
+        """
+        async with self._session_scope() as session:
             try:
+                result = await session.execute(
+                    UPSERT_USER, {"user_id": user_id, "username": username, "visible_name": visible_name}
+                )
+                created = result.scalar_one_or_none()
+                await session.commit()
+            except Exception as exc:
+                logger.error("Error upserting user %s: %s", user_id, exc)
+                await session.rollback()
+                raise
+        if created:
+            await self._invalidate_user_snapshot(user_id)
+        return created
+
+    async def update_user_debate_registration(
+        self,
+        user_id: int,
+        case_number: Optional[int],
+        counts_applied: bool = False,
+    ) -> bool:
+        """Update user's debate registration (case_number can be None to unregister).
+
+        ``counts_applied`` tells the counts feed that the caller updates Redis itself.
+        """
+        async with self._session_scope() as session:
+            try:
+                if counts_applied:
+                    await self._mark_counts_applied(session)
                 result = await session.execute(
                     select(User).where(User.id == user_id)
                 )
@@ -92,6 +446,7 @@ class DatabaseManager:
                     
                 user.debate_reg = case_number
                 await session.commit()
+                await self._invalidate_user_snapshot(user_id)
                 
                 if case_number is None:
                     logger.info(f"Unregistered user {user_id} from debate")
@@ -103,13 +458,56 @@ class DatabaseManager:
                 await session.rollback()
                 return False
     
+    async def register_user_debate_case(self, user_id: int, case_number: int) -> bool:
+        """Set debate case only if the user has none yet (single conditional UPDATE)."""
+        async with self._session_scope() as session:
+            try:
+                await self._mark_counts_applied(session)
+                result = await session.execute(
+                    update(User)
+                    .where(User.id == user_id, User.debate_reg.is_(None))
+                    .values(debate_reg=case_number)
+                )
+                await session.commit()
+                registered = (result.rowcount or 0) == 1
+                if registered:
+                    await self._invalidate_user_snapshot(user_id)
+                    logger.info(f"Updated user {user_id} debate registration to case {case_number}")
+                return registered
+            except Exception as e:
+                logger.error(f"Error registering user {user_id} for debate case {case_number}: {e}")
+                await session.rollback()
+                raise
+
+    async def clear_user_debate_registration(self, user_id: int) -> Optional[int]:
+        """Remove user's debate registration; returns the case the user was registered for.
+
+        None means the user had no case; database errors are raised.
+        """
+        async with self._session_scope() as session:
+            try:
+                async with self._transaction(session):
+                    await self._mark_counts_applied(session)
+                    result = await session.execute(
+                        select(User).where(User.id == user_id).with_for_update()
+                    )
+                    user = result.scalar_one_or_none()
+                    if not user or user.debate_reg is None:
+                        return None
+                    old_case = user.debate_reg
+                    user.debate_reg = None
+                await self._invalidate_user_snapshot(user_id)
+                logger.info(f"Unregistered user {user_id} from debate case {old_case}")
+                return old_case
+            except Exception as e:
+                logger.error(f"Error unregistering user {user_id} from debate: {e}")
+                raise
+
     async def get_debate_registrations_count(self) -> Dict[int, int]:
-        """Get count of registrations for each debate case"""
-        async with self.sessionmaker() as session:
+        """Get count of registrations for each debate case (trigger-maintained counters)"""
+        async with self._session_scope() as session:
             result = await session.execute(
-                select(User.debate_reg, func.count(User.id))
-                .where(User.debate_reg.isnot(None))
-                .group_by(User.debate_reg)
+                select(DebateCaseCount.case_number, DebateCaseCount.registered)
             )
             
             counts = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}  # Initialize all cases with 0
@@ -119,14 +517,48 @@ class DatabaseManager:
             logger.debug(f"Current debate registrations: {counts}")
             return counts
     
+    async def get_registration_counts_snapshot(self) -> RegistrationCountsSnapshot:
+        """Count debate and event registrations of every case and group in one aggregate query."""
+        debate_counts = (
+            select(
+                literal("debate").label("kind"),
+                cast(User.debate_reg, String).label("scope"),
+                literal("").label("event_id"),
+                func.count(User.id).label("registered"),
+            )
+            .where(User.debate_reg.isnot(None))
+            .group_by(User.debate_reg)
+        )
+        event_counts = (
+            select(
+                literal("event"),
+                EventRegistration.group_id,
+                EventRegistration.event_id,
+                func.count(EventRegistration.id),
+            )
+            .group_by(EventRegistration.group_id, EventRegistration.event_id)
+        )
+
+        snapshot = RegistrationCountsSnapshot()
+        async with self._session_scope() as session:
+            result = await session.execute(union_all(debate_counts, event_counts))
+            for kind, scope, event_id, registered in result.fetchall():
+                if kind == "debate":
+                    snapshot.debate[int(scope)] = registered
+                else:
+                    snapshot.groups.setdefault(scope, {})[event_id] = registered
+        return snapshot
+
     async def check_user_already_registered(self, user_id: int) -> Optional[int]:
         """Check if user is already registered for a debate case"""
-        user = await self.get_user(user_id)
-        return user.debate_reg if user else None
+        if self.user_snapshots is not None:
+            return (await self.get_user_snapshot(user_id)).debate_reg
+        async with self._session_scope() as session:
+            return (await session.execute(SELECT_USER_DEBATE_REG, {"user_id": user_id})).scalar_one_or_none()
     
     async def get_users_by_debate_case(self, case_number: int) -> List[User]:
         """Get all users registered for a specific debate case"""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(User)
                 .where(User.debate_reg == case_number)
@@ -136,7 +568,7 @@ class DatabaseManager:
     
     async def get_total_users_count(self) -> int:
         """Get total number of users in the database"""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(func.count(User.id))
             )
@@ -144,7 +576,7 @@ class DatabaseManager:
     
     async def get_registered_users_count(self) -> int:
         """Get number of users registered for any debate case"""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(func.count(User.id))
                 .where(User.debate_reg.isnot(None))
@@ -153,7 +585,7 @@ class DatabaseManager:
     
     async def get_all_users_for_export(self) -> List[Dict[str, Any]]:
         """Get all users data for export to Google Sheets"""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(User).order_by(User.id)
             )
@@ -178,14 +610,22 @@ class DatabaseManager:
         event_id: str,
         group_id: str,
         capacity: int,
-    ) -> EventRegistrationStatus:
-        async with self.sessionmaker() as session:
+    ) -> EventRegistrationResult:
+        # С кешем снимков существование пользователя проверяется до транзакции, без SQL
+        check_user = self.user_snapshots is None
+        if not check_user and not (await self.get_user_snapshot(user_id)).exists:
+            logger.warning("Attempt to register missing user %s", user_id)
+            return EventRegistrationResult(EventRegistrationStatus.USER_NOT_FOUND)
+        async with self._session_scope() as session:
             try:
-                async with session.begin():
-                    return await self._register_user_for_event(session, user_id, event_id, group_id, capacity)
+                async with self._transaction(session):
+                    await self._mark_counts_applied(session)
+                    return await self._register_user_for_event(
+                        session, user_id, event_id, group_id, capacity, check_user
+                    )
             except Exception as exc:
                 logger.error("Error registering user %s for event %s: %s", user_id, event_id, exc)
-                return EventRegistrationStatus.ERROR
+                return EventRegistrationResult(EventRegistrationStatus.ERROR)
 
     async def _register_user_for_event(
         self,
@@ -194,11 +634,11 @@ class DatabaseManager:
         event_id: str,
         group_id: str,
         capacity: int,
-    ) -> EventRegistrationStatus:
-        user = await session.get(User, user_id)
-        if not user:
+        check_user: bool = True,
+    ) -> EventRegistrationResult:
+        if check_user and not await session.get(User, user_id):
             logger.warning("Attempt to register missing user %s", user_id)
-            return EventRegistrationStatus.USER_NOT_FOUND
+            return EventRegistrationResult(EventRegistrationStatus.USER_NOT_FOUND)
 
         existing_registration_result = await session.execute(
             select(EventRegistration)
@@ -210,27 +650,18 @@ class DatabaseManager:
         )
         existing_registration = existing_registration_result.scalar_one_or_none()
 
-        count_stmt = (
-            select(EventRegistration.id)
-            .where(EventRegistration.event_id == event_id)
-            .with_for_update()
-        )
-        current_count = len((await session.execute(count_stmt)).scalars().all())
-
-        if existing_registration:
-            if existing_registration.event_id == event_id:
-                return EventRegistrationStatus.ALREADY_REGISTERED_THIS
+        if existing_registration and existing_registration.event_id == event_id:
+            return EventRegistrationResult(EventRegistrationStatus.ALREADY_REGISTERED_THIS)
 
-            if current_count >= capacity:
-                return EventRegistrationStatus.GROUP_FULL
+        if not await self._take_event_seat(session, event_id, group_id, capacity):
+            return EventRegistrationResult(EventRegistrationStatus.GROUP_FULL)
 
+        if existing_registration:
+            previous_event_id = existing_registration.event_id
             existing_registration.event_id = event_id
             existing_registration.registered_at = datetime.now(timezone.utc)
             await session.flush()
-            return EventRegistrationStatus.SWITCHED
-
-        if current_count >= capacity:
-            return EventRegistrationStatus.GROUP_FULL
+            return EventRegistrationResult(EventRegistrationStatus.SWITCHED, previous_event_id)
 
         registration = EventRegistration(
             user_id=user_id,
@@ -240,12 +671,45 @@ class DatabaseManager:
         )
         session.add(registration)
         await session.flush()
-        return EventRegistrationStatus.SUCCESS
+        return EventRegistrationResult(EventRegistrationStatus.SUCCESS)
 
-    async def unregister_user_from_event(self, user_id: int, group_id: str) -> bool:
-        async with self.sessionmaker() as session:
+    async def _take_event_seat(
+        self,
+        session: AsyncSession,
+        event_id: str,
+        group_id: str,
+        capacity: int,
+    ) -> bool:
+        """Lock the event's counter row and check for a free seat.
+
+        Only the counter row is locked, no registrations are read. The seat itself
+        is counted by the event_registrations trigger when the row is written.
+        """
+        if capacity <= 0:
+            return False
+
+        stmt = pg_insert(EventCapacity).values(
+            event_id=event_id,
+            group_id=group_id,
+            capacity=capacity,
+            taken=0,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[EventCapacity.event_id],
+            set_={
+                "capacity": stmt.excluded.capacity,
+                "group_id": stmt.excluded.group_id,
+            },
+        ).returning(EventCapacity.taken)
+        result = await session.execute(stmt)
+        return result.scalar_one() < capacity
+
+    async def unregister_user_from_event(self, user_id: int, group_id: str) -> Optional[str]:
+        """Delete user's registration in the group; returns the removed event_id or None."""
+        async with self._session_scope() as session:
             try:
-                async with session.begin():
+                async with self._transaction(session):
+                    await self._mark_counts_applied(session)
                     result = await session.execute(
                         select(EventRegistration)
                         .where(
@@ -256,40 +720,54 @@ class DatabaseManager:
                     )
                     registration = result.scalar_one_or_none()
                     if not registration:
-                        return False
+                        return None
 
                     await session.delete(registration)
                     await session.flush()
-                    return True
+                    return registration.event_id
             except Exception as exc:
                 logger.error("Error unregistering user %s from group %s: %s", user_id, group_id, exc)
-                return False
+                return None
 
     async def get_event_counts_for_group(self, group_id: str) -> Dict[str, int]:
-        async with self.sessionmaker() as session:
+        """Registrations per event of the group from the trigger-maintained counters."""
+        async with self._session_scope() as session:
             result = await session.execute(
-                select(EventRegistration.event_id, func.count(EventRegistration.id))
-                .where(EventRegistration.group_id == group_id)
-                .group_by(EventRegistration.event_id)
+                select(EventCapacity.event_id, EventCapacity.taken)
+                .where(EventCapacity.group_id == group_id, EventCapacity.taken > 0)
             )
             counts = {event_id: count for event_id, count in result.fetchall()}
             logger.debug("Group %s counts: %s", group_id, counts)
             return counts
 
-    async def get_user_event_registration(self, user_id: int, group_id: str) -> Optional[EventRegistration]:
-        async with self.sessionmaker() as session:
+    async def get_group_members(self, group_id: str) -> Dict[int, str]:
+        """Return user_id -> event_id for every registration in the group."""
+        async with self._session_scope() as session:
             result = await session.execute(
-                select(EventRegistration)
-                .where(
-                    EventRegistration.user_id == user_id,
-                    EventRegistration.group_id == group_id,
-                )
+                select(EventRegistration.user_id, EventRegistration.event_id)
+                .where(EventRegistration.group_id == group_id)
             )
-            return result.scalar_one_or_none()
+            return {int(user_id): event_id for user_id, event_id in result.fetchall()}
+
+    async def get_user_event_registration(self, user_id: int, group_id: str) -> Optional[EventRegistrationRow]:
+        async with self._session_scope() as session:
+            row = (
+                await session.execute(SELECT_USER_EVENT_REGISTRATION, {"user_id": user_id, "group_id": group_id})
+            ).first()
+            return EventRegistrationRow(*row) if row else None
+
+    async def get_user_group_registrations(self, user_id: int) -> Dict[str, str]:
+        """Return user's group_id -> event_id mapping across all groups in one query."""
+        async with self._session_scope() as session:
+            result = await session.execute(
+                select(EventRegistration.group_id, EventRegistration.event_id)
+                .where(EventRegistration.user_id == user_id)
+            )
+            return {group_id: event_id for group_id, event_id in result.fetchall()}
 
     async def get_event_registrations_for_export(self) -> List[Dict[str, Any]]:
         """Collect event registrations with user info for offline export preparation."""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(
                     EventRegistration.user_id,
@@ -323,7 +801,7 @@ class DatabaseManager:
 
     async def get_all_event_registrations_map(self) -> Dict[int, Set[str]]:
         """Return mapping of user_id to registered event IDs."""
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             result = await session.execute(
                 select(EventRegistration.user_id, EventRegistration.event_id)
             )
@@ -340,7 +818,7 @@ class DatabaseManager:
         if not event_ids_list:
             return 0
 
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             try:
                 stmt = delete(EventRegistration).where(EventRegistration.event_id.in_(event_ids_list))
                 result = await session.execute(stmt)
@@ -361,12 +839,17 @@ class DatabaseManager:
             logger.warning("Attempted to delete registrations for empty group id")
             return 0
 
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             try:
-                stmt = delete(EventRegistration).where(EventRegistration.group_id == clean_group_id)
+                stmt = (
+                    delete(EventRegistration)
+                    .where(EventRegistration.group_id == clean_group_id)
+                    .returning(EventRegistration.event_id)
+                )
                 result = await session.execute(stmt)
+                deleted_event_ids = result.scalars().all()
                 await session.commit()
-                deleted_count = result.rowcount or 0
+                deleted_count = len(deleted_event_ids)
                 logger.info("Deleted %s registrations for group %s", deleted_count, clean_group_id)
                 return deleted_count
             except Exception as exc:
@@ -374,6 +857,86 @@ class DatabaseManager:
                 await session.rollback()
                 raise
 
+    async def rekey_event_registrations(
+        self,
+        event_mapping: Dict[str, str],
+        group_mapping: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, List[EventRegistrationRow]]:
+        """Move registrations from old to new event identifiers in one transaction.
+
+        ``event_mapping`` maps old event_id to new event_id, ``group_mapping``
+        maps old event_id to a new group_id for events that moved to another slot.
+        A registration whose target would break the ``(user_id, group_id)`` or
+        ``(user_id, event_id)`` constraint is deleted instead of moved: the user
+        keeps the seat already held in the target group. Returns the number of
+        moved rows and the deleted ones.
+        """
+        if not event_mapping:
+            return 0, []
+        old_event_ids = list(event_mapping)
+        if set(event_mapping.values()) & set(old_event_ids):
+            raise ValueError(f"Re-key targets overlap source event ids: {event_mapping}")
+
+        def targets(table):
+            target_event = case(event_mapping, value=table.c.event_id)
+            if not group_mapping:
+                return target_event, table.c.group_id
+            return target_event, case(group_mapping, value=table.c.event_id, else_=table.c.group_id)
+
+        target_event, target_group = targets(_event_registrations)
+        other = _event_registrations.alias("other")
+        _, other_target_group = targets(other)
+        # Место в целевой группе или событии уже занято другой записью пользователя, сейчас
+        # или после переноса (из двух переносимых в одну группу остаётся более ранняя)
+        conflict = exists().where(
+            other.c.user_id == _event_registrations.c.user_id,
+            other.c.id != _event_registrations.c.id,
+            or_(
+                other.c.group_id == target_group,
+                other.c.event_id == target_event,
+                and_(
+                    other.c.event_id.in_(old_event_ids),
+                    other.c.id < _event_registrations.c.id,
+                    other_target_group == target_group,
+                ),
+            ),
+        )
+
+        async with self._session_scope() as session:
+            try:
+                # Кеши перестраивает TimetableReloader, построчные уведомления ему не нужны
+                await self._mark_counts_applied(session)
+                dropped_result = await session.execute(
+                    delete(_event_registrations)
+                    .where(_event_registrations.c.event_id.in_(old_event_ids), conflict)
+                    .returning(
+                        _event_registrations.c.user_id,
+                        _event_registrations.c.event_id,
+                        _event_registrations.c.group_id,
+                        _event_registrations.c.registered_at,
+                    )
+                )
+                dropped = [EventRegistrationRow(*row) for row in dropped_result.all()]
+                result = await session.execute(
+                    update(_event_registrations)
+                    .where(_event_registrations.c.event_id.in_(old_event_ids))
+                    .values(event_id=target_event, group_id=target_group)
+                )
+                await session.commit()
+                migrated = result.rowcount or 0
+                logger.info("Re-keyed %s registrations for %s events", migrated, len(event_mapping))
+                if dropped:
+                    logger.warning(
+                        "Dropped %s conflicting registrations while re-keying: %s",
+                        len(dropped),
+                        ", ".join(f"{row.user_id}:{row.event_id}" for row in dropped),
+                    )
+                return migrated, dropped
+            except Exception as exc:
+                logger.error("Failed to re-key registrations %s: %s", event_mapping, exc)
+                await session.rollback()
+                raise
+
     async def create_coach_session_request(
         self,
         user_id: Optional[int],
@@ -387,7 +950,7 @@ class DatabaseManager:
     ) -> CoachSessionRequest:
         """Persist new coach session application."""
 
-        async with self.sessionmaker() as session:
+        async with self._session_scope() as session:
             try:
                 entry = CoachSessionRequest(
                     user_id=user_id,
@@ -403,23 +966,25 @@ class DatabaseManager:
                 await session.commit()
                 await session.refresh(entry)
                 logger.info("Coach session request stored: id=%s", entry.id)
-                return entry
             except Exception as exc:
                 await session.rollback()
                 logger.error("Failed to store coach session request: %s", exc)
                 raise
+        await self._invalidate_user_snapshot(user_id)
+        return entry
 
-    async def get_last_coach_session_request(self, user_id: int) -> Optional[CoachSessionRequest]:
+    async def has_coach_session_request(self, user_id: int) -> bool:
+        """True if the user has submitted a coach session request."""
+        if self.user_snapshots is not None:
+            return (await self.get_user_snapshot(user_id)).has_coach_request
+        return await self.get_last_coach_session_request(user_id) is not None
+
+    async def get_last_coach_session_request(self, user_id: int) -> Optional[CoachSessionRequestRow]:
         """Fetch the most recent coach session request for the user, if it exists."""
 
-        async with self.sessionmaker() as session:
-            result = await session.execute(
-                select(CoachSessionRequest)
-                .where(CoachSessionRequest.user_id == user_id)
-                .order_by(CoachSessionRequest.created_at.desc())
-                .limit(1)
-            )
-            entry = result.scalar_one_or_none()
+        async with self._session_scope() as session:
+            row = (await session.execute(SELECT_LAST_COACH_SESSION_REQUEST, {"user_id": user_id})).first()
+            entry = CoachSessionRequestRow(*row) if row else None
             if entry:
                 logger.debug("Found existing coach session request id=%s for user %s", entry.id, user_id)
             return entry
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Schema version check against the Alembic migration head.
+
+Tables are created and changed only by the migrations in ``alembic/``. On
+startup the revision stamped in ``alembic_version`` is compared with the head
+of the migration scripts in a single query; a database that is behind the code
+either fails the start or is upgraded in place (``POSTGRES_AUTO_MIGRATE``).
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import Set
+
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
+from sqlalchemy import Connection, text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+
+class SchemaVersionError(RuntimeError):
+    """The database schema doesn't match the migrations shipped with the code."""
+
+
+def _alembic_config(connection: Connection = None) -> AlembicConfig:
+    config = AlembicConfig(str(PROJECT_ROOT / "alembic.ini"))
+    # Абсолютный путь: утилиты запускаются не только из корня проекта
+    config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def migration_heads() -> Set[str]:
+    """Head revisions of the migration scripts (read from disk, no database access)."""
+    return set(ScriptDirectory.from_config(_alembic_config()).get_heads())
+
+
+async def current_revisions(engine: AsyncEngine) -> Set[str]:
+    """Revisions stamped in the database; empty if it was never migrated."""
+    async with engine.connect() as connection:
+        try:
+            result = await connection.execute(text("SELECT version_num FROM alembic_version"))
+        except ProgrammingError:
+            return set()
+        return set(result.scalars())
+
+
+def _upgrade(connection: Connection) -> None:
+    command.upgrade(_alembic_config(connection), "head")
+
+
+async def ensure_schema_version(engine: AsyncEngine, auto_migrate: bool) -> None:
+    """Compare the database revision with the migration head; upgrade or raise SchemaVersionError."""
+    heads, current = await asyncio.gather(asyncio.to_thread(migration_heads), current_revisions(engine))
+    if current == heads:
+        logger.debug("Database schema is at head %s", ", ".join(sorted(heads)))
+        return
+
+    current_label = ", ".join(sorted(current)) or "empty"
+    heads_label = ", ".join(sorted(heads))
+    if not auto_migrate:
+        raise SchemaVersionError(
+            f"Database schema is at {current_label}, the code expects {heads_label}: "
+            f"run `alembic upgrade head` or set POSTGRES_AUTO_MIGRATE=true"
+        )
+
+    logger.warning("Upgrading database schema from %s to %s", current_label, heads_label)
+    async with engine.begin() as connection:
+        await connection.run_sync(_upgrade)
+    logger.info("Database schema upgraded to %s", heads_label)
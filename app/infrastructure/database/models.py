@@ -52,6 +52,35 @@ class EventRegistration(Base):
         )
 
 
+class EventCapacity(Base):
+    """Seat counter of a timetable event, maintained by a trigger on event_registrations."""
+
+    __tablename__ = 'event_capacity'
+
+    event_id = Column(String(32), primary_key=True)
+    group_id = Column(String(32), nullable=False, index=True)
+    capacity = Column(Integer, nullable=False, default=0)  # last known limit from timetable
+    taken = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (
+            f"<EventCapacity(event_id='{self.event_id}', group_id='{self.group_id}', "
+            f"taken={self.taken}/{self.capacity})>"
+        )
+
+
+class DebateCaseCount(Base):
+    """Registrations per debate case, maintained by a trigger on users.debate_reg."""
+
+    __tablename__ = 'debate_case_counts'
+
+    case_number = Column(Integer, primary_key=True)
+    registered = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DebateCaseCount(case_number={self.case_number}, registered={self.registered})>"
+
+
 class CoachSessionRequest(Base):
     """Stored coach session application."""
 
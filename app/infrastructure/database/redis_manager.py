@@ -1,36 +1,376 @@
 """Redis manager for caching debate registration limits"""
 
+import asyncio
 import logging
 import json
-from typing import Dict, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 import redis.asyncio as redis
 from config.config import RedisConfig
+from .local_cache import MISSING, LocalCache
 
 logger = logging.getLogger(__name__)
 
+# KEYS: counts hash, members hash; ARGV: user_id, event_id, capacity, ttl
+# Returns {status, detail}: MISS – cache is not primed, ALREADY, FULL (detail=taken),
+# OK (detail=previous event_id of the user in this group or "")
+RESERVE_SEAT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('HEXISTS', KEYS[2], '__primed__') == 0 then
+    return {'MISS', ''}
+end
+local current = redis.call('HGET', KEYS[2], ARGV[1])
+if current == ARGV[2] then
+    return {'ALREADY', ''}
+end
+local taken = tonumber(redis.call('HGET', KEYS[1], ARGV[2]) or '0')
+if taken >= tonumber(ARGV[3]) then
+    return {'FULL', tostring(taken)}
+end
+redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+if current then
+    redis.call('HINCRBY', KEYS[1], current, -1)
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+redis.call('HINCRBY', KEYS[1], '__version__', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return {'OK', current or ''}
+"""
+
+# KEYS: debate counts hash, then one holds zset per case (in DEBATE_POOLS order)
+# ARGV: op, case, user_id, hold ttl, pool count, then for each pool: limit, number of cases, cases
+# Ops: "hold" – reserve a seat for the user for ttl seconds, "unhold" – drop the user's hold,
+# "admit" – register (consumes the user's hold, otherwise needs a free seat), "release" – return
+# a registered seat, "peek" – only report. Holds are counted against the pool limit.
+# Returns {status, case, remaining, held, ...}: status 1 done, 0 pool full / nothing to do,
+# -1 counts are not loaded.
+DEBATE_CASE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {-1}
+end
+local op, target, user = ARGV[1], ARGV[2], ARGV[3]
+local now = tonumber(redis.call('TIME')[1])
+local expires = now + tonumber(ARGV[4])
+local pools, index, key_index = {}, 6, 2
+for _ = 1, tonumber(ARGV[5]) do
+    local pool = {limit = tonumber(ARGV[index]), cases = {}, keys = {}}
+    local size = tonumber(ARGV[index + 1])
+    for i = 1, size do
+        pool.cases[i] = ARGV[index + 1 + i]
+        pool.keys[i] = KEYS[key_index]
+        redis.call('ZREMRANGEBYSCORE', KEYS[key_index], '-inf', now)
+        key_index = key_index + 1
+    end
+    index = index + 2 + size
+    pools[#pools + 1] = pool
+end
+
+local function registered(case)
+    return tonumber(redis.call('HGET', KEYS[1], case) or '0')
+end
+
+local function taken(pool)
+    local total = 0
+    for i, case in ipairs(pool.cases) do
+        total = total + registered(case) + redis.call('ZCARD', pool.keys[i])
+    end
+    return total
+end
+
+local status = 0
+for _, pool in ipairs(pools) do
+    for i, case in ipairs(pool.cases) do
+        if case == target then
+            local holds = pool.keys[i]
+            local has_hold = redis.call('ZSCORE', holds, user)
+            if op == 'hold' then
+                if has_hold or taken(pool) < pool.limit then
+                    redis.call('ZADD', holds, expires, user)
+                    redis.call('EXPIRE', holds, ARGV[4])
+                    status = 1
+                end
+            elseif op == 'unhold' then
+                status = redis.call('ZREM', holds, user)
+            elseif op == 'admit' then
+                if has_hold or taken(pool) < pool.limit then
+                    redis.call('ZREM', holds, user)
+                    redis.call('HINCRBY', KEYS[1], target, 1)
+                    status = 1
+                end
+            elseif op == 'release' then
+                if registered(target) > 0 then
+                    redis.call('HINCRBY', KEYS[1], target, -1)
+                    status = 1
+                end
+            end
+        end
+    end
+end
+
+local result = {status}
+for _, pool in ipairs(pools) do
+    local remaining = math.max(0, pool.limit - taken(pool))
+    local held = 0
+    for i = 1, #pool.cases do
+        held = held + redis.call('ZCARD', pool.keys[i])
+    end
+    for _, case in ipairs(pool.cases) do
+        result[#result + 1] = tonumber(case)
+        result[#result + 1] = remaining
+        result[#result + 1] = held
+    end
+end
+return result
+"""
+
+# KEYS: counts hash, members hash; ARGV: ttl, then event_id/delta pairs
+# Applies deltas only if counts are cached (returns 1), otherwise the caller recounts (returns 0).
+# The members snapshot of the reservation mode is dropped: counts changed outside of it.
+APPLY_COUNTS_DELTA_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('HINCRBY', KEYS[1], '__version__', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# KEYS: debate counts hash; ARGV: case/delta pairs
+# Applies deltas only if counts are loaded (returns 1); a missing hash is loaded from the DB on demand.
+APPLY_DEBATE_DELTA_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    local value = redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    if value < 0 then
+        redis.call('HSET', KEYS[1], ARGV[i], 0)
+    end
+end
+return 1
+"""
+
+# KEYS: debate counts hash; ARGV: case, expected count, new count triples
+# Overwrites the counts only if none of them changed since they were read; returns 1 if stored.
+HEAL_DEBATE_COUNTS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 3 do
+    if (redis.call('HGET', KEYS[1], ARGV[i]) or '0') ~= ARGV[i + 1] then
+        return 0
+    end
+end
+for i = 1, #ARGV, 3 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+end
+return 1
+"""
+
+# KEYS: counts hash, members hash; ARGV: user_id, from_event_id, to_event_id ("" means none)
+# Moves the user's seat only if the cache still holds from_event_id; returns 1 if moved
+MOVE_SEAT_LUA = """
+if redis.call('HEXISTS', KEYS[2], '__primed__') == 0 or redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local current = redis.call('HGET', KEYS[2], ARGV[1]) or ''
+if current ~= ARGV[2] then
+    return 0
+end
+if ARGV[2] ~= '' then
+    redis.call('HINCRBY', KEYS[1], ARGV[2], -1)
+end
+if ARGV[3] ~= '' then
+    redis.call('HINCRBY', KEYS[1], ARGV[3], 1)
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+else
+    redis.call('HDEL', KEYS[2], ARGV[1])
+end
+redis.call('HINCRBY', KEYS[1], '__version__', 1)
+return 1
+"""
+
+# KEYS: counts hash, members hash; ARGV: expected version ("" – the key must be absent), ttl,
+# refreshed_at, then event_id/count pairs. Every in-place change bumps __version__, so a recount
+# that raced with a registration is not written over it (only __refreshed_at__ is moved).
+# Returns 1 if the counts were stored.
+SET_COUNTS_LUA = """
+local exists = redis.call('EXISTS', KEYS[1]) == 1
+local version = ''
+if exists then
+    version = redis.call('HGET', KEYS[1], '__version__') or '0'
+end
+if version ~= ARGV[1] then
+    if exists then
+        redis.call('HSET', KEYS[1], '__refreshed_at__', ARGV[3])
+    end
+    return 0
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('HSET', KEYS[1], '__version__', (tonumber(version) or 0) + 1, '__refreshed_at__', ARGV[3])
+for i = 4, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: user registrations hash; ARGV: expected version, ttl, then field/value pairs (epoch included).
+# Every write-through change bumps __version__, so registrations read from the DB before a
+# registration was committed are not stored over it. Returns 1 if the registrations were stored.
+SET_USER_REGISTRATIONS_LUA = """
+local version = redis.call('HGET', KEYS[1], '__version__') or '0'
+if version ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], '__version__', version)
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: user snapshot hash; ARGV: expected version, ttl, then field/value pairs.
+# Invalidation bumps __version__ and drops the fields, so a snapshot read from the DB before
+# a write is not stored over it. Returns 1 if the snapshot was stored.
+SET_USER_SNAPSHOT_LUA = """
+if (redis.call('HGET', KEYS[1], '__version__') or '0') ~= ARGV[1] then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: user snapshot hash; ARGV: ttl, then the snapshot fields to drop
+INVALIDATE_USER_SNAPSHOT_LUA = """
+redis.call('HINCRBY', KEYS[1], '__version__', 1)
+redis.call('HDEL', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+# KEYS: waitlist zset, parked hash; ARGV: event_id, parked_at.
+# Moves the first waitlisted user into the parked hash, so a crash before the registration
+# is written can't drop them. Returns {user_id, joined_at} or false for an empty waitlist.
+PARK_WAITLIST_HEAD_LUA = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+redis.call('HSET', KEYS[2], ARGV[1] .. '\t' .. popped[1], popped[2] .. '|' .. ARGV[2])
+return popped
+"""
+
+# KEYS: waitlist zset, parked hash; ARGV: event_id, user_id, joined_at, requeue (1/0).
+# Releases a parked user, putting them back at their original place if requeue is set.
+UNPARK_WAITLIST_ENTRY_LUA = """
+if redis.call('HDEL', KEYS[2], ARGV[1] .. '\t' .. ARGV[2]) == 1 and ARGV[4] == '1' then
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: lock key; ARGV: token. Deletes the lock only if it is still ours.
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: slots meta hash, then one bitmap per room (bit i = slot i taken); ARGV: layout key, slots per room
+# Claims the earliest free slot over all rooms (ties go to the first room) with a single bit-set.
+# Returns {status, room_index, slot_index}: MISS – bitmaps are not primed for this layout, FULL, OK
+CLAIM_SLOT_LUA = """
+if redis.call('HGET', KEYS[1], 'layout') ~= ARGV[1] then
+    return {'MISS', -1, -1}
+end
+local slots = tonumber(ARGV[2])
+local best_room, best_slot = -1, slots
+for i = 2, #KEYS do
+    local pos = redis.call('BITPOS', KEYS[i], 0)
+    if pos >= 0 and pos < best_slot then
+        best_room = i - 2
+        best_slot = pos
+    end
+end
+if best_room < 0 then
+    return {'FULL', -1, -1}
+end
+redis.call('SETBIT', KEYS[best_room + 2], best_slot, 1)
+return {'OK', best_room, best_slot}
+"""
+
+# KEYS: slots meta hash, room bitmap; ARGV: layout key, slot index, bit value
+# Updates the bit only while bitmaps are primed for this layout; returns 1 if applied
+SET_SLOT_LUA = """
+if redis.call('HGET', KEYS[1], 'layout') ~= ARGV[1] then
+    return 0
+end
+redis.call('SETBIT', KEYS[2], ARGV[2], ARGV[3])
+return 1
+"""
+
 
 class RedisManager:
     """Manages Redis connections and debate registration cache"""
     
     # Redis keys
     DEBATE_COUNTS_KEY = "debate:registrations:counts"
+    DEBATE_AVAILABILITY_CACHE_KEY = "debate:registrations:availability"
     DEBATE_LIMITS_KEY = "debate:registrations:limits"
+    DEBATE_HOLDS_PREFIX = "debate:holds"
+    DEBATE_HOLD_TTL_SECONDS = 120
     EVENT_GROUP_PREFIX = "timetable:group"
     EVENT_GROUP_SUFFIX = "counts"
+    EVENT_GROUP_MEMBERS_SUFFIX = "members"
+    EVENT_GROUP_SLOTS_SUFFIX = "slots"
+    EVENT_GROUP_LOCK_SUFFIX = "lock"
     EVENT_TTL_SECONDS = 60 * 60 * 3  # 3 hours
+    EVENT_REFRESH_AFTER_SECONDS = EVENT_TTL_SECONDS - 60 * 30  # recount 30 minutes before expiry
+    EVENT_LOCK_TTL_MS = 5000
+    USER_REGISTRATIONS_PREFIX = "timetable:user"
+    USER_REGISTRATIONS_EPOCH_KEY = "timetable:registrations:epoch"
+    USER_REGISTRATIONS_EPOCH_FIELD = "__epoch__"
+    WAITLIST_PREFIX = "timetable:waitlist"
+    WAITLIST_PENDING_KEY = "timetable:waitlist-pending"
+    WAITLIST_PARKED_KEY = "timetable:waitlist-parked"
+    SCHEDULE_RENDER_PREFIX = "timetable:render"
+    SCHEDULE_RENDER_TTL_SECONDS = 60 * 60 * 24  # 1 day
+    CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+    KNOWN_USER_PREFIX = "users:known"
+    KNOWN_USER_TTL_SECONDS = 60 * 60 * 24 * 7  # 1 week
+    USER_SNAPSHOT_PREFIX = "users:snapshot"
+    USER_SNAPSHOT_FIELDS = ("exists", "debate_reg", "coach")
+    USER_SNAPSHOT_TTL_SECONDS = 60 * 60 * 24  # 1 day
+    COUNTS_FEED_PREFIX = "counts:feed"
+    COUNTS_FEED_TTL_SECONDS = 60 * 60
     
-    # Debate case limits
-    LIMITS = {
-        1: 32,  # ВТБ
-        2: 41,  # Алабуга + Б1 <= 41 (cases 2 and 3)
-        3: 41,  # Алабуга + Б1 <= 41 (cases 2 and 3) 
-        4: 42,  # Северсталь + Альфа <= 42 (cases 4 and 5)
-        5: 42,  # Северсталь + Альфа <= 42 (cases 4 and 5)
-    }
+    # Debate pools: cases of one pool share a single limit
+    DEBATE_POOLS: Tuple[Tuple[Tuple[int, ...], int], ...] = (
+        ((1,), 32),  # ВТБ
+        ((2, 3), 41),  # Алабуга + Б1 <= 41
+        ((4, 5), 42),  # Северсталь + Альфа <= 42
+    )
+
+    # Debate case limits (limit of the pool the case belongs to)
+    LIMITS = {case: limit for cases, limit in DEBATE_POOLS for case in cases}
     
     def __init__(self, config: RedisConfig):
         self.config = config
         self.redis = None
+        self.local_cache: Optional[LocalCache] = (
+            LocalCache(config.local_cache_size, config.local_cache_ttl) if config.local_cache else None
+        )
         
     async def init(self):
         """Initialize Redis connection"""
@@ -41,6 +381,22 @@ class RedisManager:
             decode_responses=True
         )
         
+        self._reserve_seat_script = self.redis.register_script(RESERVE_SEAT_LUA)
+        self._move_seat_script = self.redis.register_script(MOVE_SEAT_LUA)
+        self._apply_counts_delta_script = self.redis.register_script(APPLY_COUNTS_DELTA_LUA)
+        self._debate_case_script = self.redis.register_script(DEBATE_CASE_LUA)
+        self._set_counts_script = self.redis.register_script(SET_COUNTS_LUA)
+        self._release_lock_script = self.redis.register_script(RELEASE_LOCK_LUA)
+        self._claim_slot_script = self.redis.register_script(CLAIM_SLOT_LUA)
+        self._set_slot_script = self.redis.register_script(SET_SLOT_LUA)
+        self._apply_debate_delta_script = self.redis.register_script(APPLY_DEBATE_DELTA_LUA)
+        self._heal_debate_counts_script = self.redis.register_script(HEAL_DEBATE_COUNTS_LUA)
+        self._set_user_snapshot_script = self.redis.register_script(SET_USER_SNAPSHOT_LUA)
+        self._set_user_registrations_script = self.redis.register_script(SET_USER_REGISTRATIONS_LUA)
+        self._invalidate_user_snapshot_script = self.redis.register_script(INVALIDATE_USER_SNAPSHOT_LUA)
+        self._park_waitlist_head_script = self.redis.register_script(PARK_WAITLIST_HEAD_LUA)
+        self._unpark_waitlist_entry_script = self.redis.register_script(UNPARK_WAITLIST_ENTRY_LUA)
+
         # Test connection
         await self.redis.ping()
         
@@ -51,6 +407,52 @@ class RedisManager:
         
         logger.info("Redis initialized successfully")
         
+    # --- In-process read cache ---------------------------------------------------------
+
+    async def _cached(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Serve a read from the local cache; the Redis key name is the cache key."""
+        if self.local_cache is None:
+            return await loader()
+        value = self.local_cache.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.local_cache.generation
+        value = await loader()
+        self.local_cache.set(key, value, generation)
+        return value
+
+    async def _publish_invalidation(self, *keys: str):
+        """Evict keys locally and tell other bot instances to do the same."""
+        if self.local_cache is None or not keys:
+            return
+        self.local_cache.invalidate(keys)
+        await self.redis.publish(self.CACHE_INVALIDATION_CHANNEL, " ".join(keys))
+
+    async def listen_for_invalidations(self):
+        """Evict local entries on invalidations published by any instance (runs until cancelled)."""
+        if self.local_cache is None:
+            return
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.CACHE_INVALIDATION_CHANNEL)
+                # Сообщения, пропущенные до подписки, не восстановить – начинаем с чистого кеша
+                self.local_cache.clear()
+                async for message in pubsub.listen():
+                    if message and message.get("type") == "message":
+                        self.local_cache.invalidate(message["data"].split())
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Cache invalidation subscription lost: %s", exc)
+                self.local_cache.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def get_local_cache_stats(self) -> Optional[Dict[str, float]]:
+        return self.local_cache.stats() if self.local_cache else None
+
     async def close(self):
         """Close Redis connection"""
         if self.redis:
@@ -60,47 +462,191 @@ class RedisManager:
     async def sync_with_database(self, db_counts: Dict[int, int]):
         """Sync Redis cache with database counts"""
         await self.redis.hset(self.DEBATE_COUNTS_KEY, mapping={
-            str(k): v for k, v in db_counts.items()
+            **{str(case): 0 for case in self.LIMITS},
+            **{str(k): v for k, v in db_counts.items()},
         })
+        await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
         logger.info(f"Synced Redis cache with database: {db_counts}")
     
+    async def seed_debate_counts(self, db_counts: Dict[int, int]) -> int:
+        """Fill only missing debate counters from the DB; counters already in Redis are left to the reconciler.
+
+        Seats admitted in Redis but not written to the DB yet must not be dropped, so
+        existing values are never overwritten here. Returns the number of counters set.
+        """
+        counts = {case: 0 for case in self.LIMITS}
+        counts.update(db_counts)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for case_number, count in counts.items():
+                pipe.hsetnx(self.DEBATE_COUNTS_KEY, str(case_number), count)
+            seeded = sum(await pipe.execute())
+        if seeded:
+            await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
+            logger.info("Seeded %s missing debate counters from the database", seeded)
+        return seeded
+
     async def get_debate_counts(self) -> Dict[int, int]:
         """Get current debate registration counts from cache"""
-        counts_data = await self.redis.hgetall(self.DEBATE_COUNTS_KEY)
+        counts_data = await self._cached(self.DEBATE_COUNTS_KEY, lambda: self.redis.hgetall(self.DEBATE_COUNTS_KEY))
         if not counts_data:
             return {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
         
         return {int(k): int(v) for k, v in counts_data.items()}
     
+    async def get_debate_overview(self) -> Tuple[Dict[int, int], Dict[int, int], Dict[int, int]]:
+        """Return (counts, remaining, held) per case in one pipelined roundtrip."""
+        keys, args = self._debate_case_script_params("peek", 0)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.DEBATE_COUNTS_KEY)
+            await self._debate_case_script(keys=keys, args=args, client=pipe)
+            counts_data, result = await pipe.execute()
+
+        counts = {case: 0 for case in self.LIMITS}
+        counts.update({int(k): int(v) for k, v in counts_data.items()})
+        status, remaining, held = self._parse_debate_case_result(result)
+        if status is None:
+            remaining, held = await self._load_debate_availability()
+        return counts, remaining, held
+
+    async def apply_debate_count_delta(self, deltas: Dict[int, int]) -> bool:
+        """Adjust cached debate counts in place; False means they are not loaded."""
+        args: List = []
+        for case_number, delta in deltas.items():
+            args.extend((str(case_number), delta))
+        if not args:
+            return False
+        applied = await self._apply_debate_delta_script(keys=[self.DEBATE_COUNTS_KEY], args=args)
+        if applied:
+            await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
+        return bool(applied)
+
+    async def heal_debate_counts(self, expected: Dict[int, str], counts: Dict[int, int]) -> bool:
+        """Replace drifted debate counts unless they changed since ``expected`` (raw values) was read."""
+        args: List = []
+        for case_number, count in counts.items():
+            args.extend((str(case_number), expected.get(case_number, "0"), count))
+        healed = await self._heal_debate_counts_script(keys=[self.DEBATE_COUNTS_KEY], args=args)
+        if healed:
+            await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
+        return bool(healed)
+
+    async def get_counter_hashes(self, group_ids: Iterable[str]) -> Tuple[Dict[str, str], Dict[str, Dict[str, str]]]:
+        """Raw debate counts and group counts hashes in one pipelined roundtrip, bypassing the local cache."""
+        group_order = list(dict.fromkeys(group_ids))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self.DEBATE_COUNTS_KEY)
+            for group_id in group_order:
+                pipe.hgetall(self._event_group_key(group_id))
+            debate, *groups = await pipe.execute()
+        return debate, dict(zip(group_order, groups))
+
+    async def claim_counts_notification(self, nid: int) -> bool:
+        """Return True for the first bot instance that sees the notification."""
+        claimed = await self.redis.set(
+            f"{self.COUNTS_FEED_PREFIX}:{nid}", "1", nx=True, ex=self.COUNTS_FEED_TTL_SECONDS
+        )
+        return bool(claimed)
+
     async def increment_debate_count(self, case_number: int) -> int:
         """Increment debate registration count for a case"""
         new_count = await self.redis.hincrby(self.DEBATE_COUNTS_KEY, str(case_number), 1)
+        await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
         logger.info(f"Incremented case {case_number} count to {new_count}")
         return new_count
     
     async def get_remaining_slots(self) -> Dict[int, int]:
-        """Get remaining slots for each debate case considering shared limits"""
+        """Get remaining slots for each debate case considering shared limits and active holds"""
+        remaining, _ = await self.get_debate_availability()
+        return remaining
+
+    async def get_debate_availability(self) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Return remaining and temporarily held seats per case (shared across a pool)."""
+        return await self._cached(self.DEBATE_AVAILABILITY_CACHE_KEY, self._load_debate_availability)
+
+    async def _load_debate_availability(self) -> Tuple[Dict[int, int], Dict[int, int]]:
+        status, remaining, held = await self._run_debate_case_script("peek", 0)
+        if status is not None:
+            return remaining, held
+
         counts = await self.get_debate_counts()
-        
         remaining = {}
-        
-        # ВТБ - individual limit
-        remaining[1] = max(0, self.LIMITS[1] - counts[1])
-        
-        # Алабуга + Б1 - shared limit
-        shared_count_23 = counts[2] + counts[3]
-        remaining_23 = max(0, self.LIMITS[2] - shared_count_23)
-        remaining[2] = remaining_23
-        remaining[3] = remaining_23
-        
-        # Северсталь + Альфа - shared limit  
-        shared_count_45 = counts[4] + counts[5]
-        remaining_45 = max(0, self.LIMITS[4] - shared_count_45)
-        remaining[4] = remaining_45
-        remaining[5] = remaining_45
-        
+        for cases, limit in self.DEBATE_POOLS:
+            pool_remaining = max(0, limit - sum(counts.get(case, 0) for case in cases))
+            for case in cases:
+                remaining[case] = pool_remaining
+        return remaining, {case: 0 for case in remaining}
+
+    def _debate_hold_key(self, case_number: int) -> str:
+        return f"{self.DEBATE_HOLDS_PREFIX}:{case_number}"
+
+    async def _run_debate_case_script(
+        self,
+        op: str,
+        case_number: int,
+        user_id: Optional[int] = None,
+    ) -> Tuple[Optional[bool], Dict[int, int], Dict[int, int]]:
+        keys, args = self._debate_case_script_params(op, case_number, user_id)
+        result = await self._debate_case_script(keys=keys, args=args)
+        if op != "peek" and int(result[0]) > 0:
+            await self._publish_invalidation(self.DEBATE_COUNTS_KEY, self.DEBATE_AVAILABILITY_CACHE_KEY)
+        return self._parse_debate_case_result(result)
+
+    def _debate_case_script_params(
+        self,
+        op: str,
+        case_number: int,
+        user_id: Optional[int] = None,
+    ) -> Tuple[List[str], List]:
+        keys = [self.DEBATE_COUNTS_KEY]
+        args = [op, str(case_number), str(user_id or ""), self.DEBATE_HOLD_TTL_SECONDS, len(self.DEBATE_POOLS)]
+        for cases, limit in self.DEBATE_POOLS:
+            args.extend((limit, len(cases), *(str(case) for case in cases)))
+            keys.extend(self._debate_hold_key(case) for case in cases)
+        return keys, args
+
+    @staticmethod
+    def _parse_debate_case_result(result: List) -> Tuple[Optional[bool], Dict[int, int], Dict[int, int]]:
+        status = int(result[0])
+        if status < 0:
+            return None, {}, {}
+        remaining: Dict[int, int] = {}
+        held: Dict[int, int] = {}
+        for i in range(1, len(result), 3):
+            remaining[int(result[i])] = int(result[i + 1])
+            held[int(result[i])] = int(result[i + 2])
+        return status == 1, remaining, held
+
+    async def hold_debate_case(self, case_number: int, user_id: int) -> Tuple[Optional[bool], Dict[int, int]]:
+        """Hold a seat for the user while they confirm; expires after DEBATE_HOLD_TTL_SECONDS.
+
+        Returns (held, remaining per case); held is None if counts are not loaded yet.
+        """
+        held, remaining, _ = await self._run_debate_case_script("hold", case_number, user_id)
+        return held, remaining
+
+    async def release_debate_hold(self, case_number: int, user_id: int) -> None:
+        """Drop the user's hold on the case (confirmation cancelled)."""
+        await self._run_debate_case_script("unhold", case_number, user_id)
+
+    async def admit_debate_case(
+        self,
+        case_number: int,
+        user_id: Optional[int] = None,
+    ) -> Tuple[Optional[bool], Dict[int, int]]:
+        """Atomically take a seat in the case's pool, consuming the user's hold if there is one.
+
+        Returns (admitted, remaining per case); admitted is None if counts are not loaded yet.
+        """
+        admitted, remaining, _ = await self._run_debate_case_script("admit", case_number, user_id)
+        logger.info("Debate case %s admission: %s, remaining %s", case_number, admitted, remaining)
+        return admitted, remaining
+
+    async def release_debate_case(self, case_number: int) -> Dict[int, int]:
+        """Atomically return a seat of the case to its pool; returns remaining per case."""
+        _, remaining, _ = await self._run_debate_case_script("release", case_number)
+        logger.info("Debate case %s seat released, remaining %s", case_number, remaining)
         return remaining
-    
+
     async def can_register_for_case(self, case_number: int) -> bool:
         """Check if registration is possible for a specific case"""
         remaining = await self.get_remaining_slots()
@@ -124,18 +670,462 @@ class RedisManager:
 
     async def get_event_group_counts(self, group_id: str) -> Optional[Dict[str, int]]:
         """Return cached counts for a parallel group or None if cache missing."""
+        counts, _, _ = await self.get_event_group_state(group_id)
+        return counts
+
+    async def get_event_group_state(self, group_id: str) -> Tuple[Optional[Dict[str, int]], str, float]:
+        """Return (counts or None, version, refreshed_at) of a cached group.
+
+        The version is "" for a missing key and is passed back to set_event_group_counts.
+        """
         key = self._event_group_key(group_id)
-        data = await self.redis.hgetall(key)
-        if data is None or len(data) == 0:
+        data = await self._cached(key, lambda: self.redis.hgetall(key))
+        return self._parse_group_state(data)
+
+    async def get_many_group_states(
+        self,
+        group_ids: Iterable[str],
+    ) -> Dict[str, Tuple[Optional[Dict[str, int]], str, float]]:
+        """Batched get_event_group_state: local cache hits first, the rest in one pipelined roundtrip."""
+        raw: Dict[str, Dict[str, str]] = {}
+        pending: List[str] = []
+        for group_id in dict.fromkeys(group_ids):
+            cached = self.local_cache.get(self._event_group_key(group_id)) if self.local_cache else MISSING
+            if cached is MISSING:
+                pending.append(group_id)
+            else:
+                raw[group_id] = cached
+
+        if pending:
+            generation = self.local_cache.generation if self.local_cache else 0
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for group_id in pending:
+                    pipe.hgetall(self._event_group_key(group_id))
+                replies = await pipe.execute()
+            for group_id, data in zip(pending, replies):
+                raw[group_id] = data
+                if self.local_cache:
+                    self.local_cache.set(self._event_group_key(group_id), data, generation)
+
+        return {group_id: self._parse_group_state(data) for group_id, data in raw.items()}
+
+    @staticmethod
+    def _parse_group_state(data: Optional[Dict[str, str]]) -> Tuple[Optional[Dict[str, int]], str, float]:
+        if not data:
+            return None, "", 0.0
+        counts = {k: int(v) for k, v in data.items() if not k.startswith("__")}
+        return counts, data.get("__version__", "0"), float(data.get("__refreshed_at__", 0))
+
+    async def set_event_group_counts(self, group_id: str, counts: Dict[str, int], expected_version: str) -> bool:
+        """Store recounted counts unless the cache changed since expected_version was read."""
+        args: List = [expected_version, self.EVENT_TTL_SECONDS, time.time()]
+        for event_id, count in counts.items():
+            args.extend((event_id, count))
+        stored = await self._set_counts_script(
+            keys=[self._event_group_key(group_id), self._event_group_members_key(group_id)],
+            args=args,
+        )
+        if stored:
+            await self._publish_invalidation(self._event_group_key(group_id))
+        return bool(stored)
+
+    def _event_group_lock_key(self, group_id: str) -> str:
+        return f"{self.EVENT_GROUP_PREFIX}:{group_id}:{self.EVENT_GROUP_LOCK_SUFFIX}"
+
+    async def acquire_event_group_lock(self, group_id: str) -> Optional[str]:
+        """Take the short recount lock of a group; returns the token or None if it is held."""
+        token = f"{time.time_ns()}:{id(self)}"
+        acquired = await self.redis.set(
+            self._event_group_lock_key(group_id), token, nx=True, px=self.EVENT_LOCK_TTL_MS
+        )
+        return token if acquired else None
+
+    async def release_event_group_lock(self, group_id: str, token: str):
+        await self._release_lock_script(keys=[self._event_group_lock_key(group_id)], args=[token])
+
+    async def apply_event_group_delta(self, group_id: str, deltas: Dict[str, int]) -> bool:
+        """Atomically adjust cached counts; False means the group is not cached and needs a recount."""
+        args = [self.EVENT_TTL_SECONDS]
+        for event_id, delta in deltas.items():
+            args.extend((event_id, delta))
+        applied = await self._apply_counts_delta_script(
+            keys=[self._event_group_key(group_id), self._event_group_members_key(group_id)],
+            args=args,
+        )
+        if applied:
+            await self._publish_invalidation(self._event_group_key(group_id))
+        return bool(applied)
+
+    async def invalidate_event_groups(self, group_ids: Iterable[str]) -> int:
+        """Drop cached counts for the given groups; they are rebuilt on next read."""
+        counts_keys = []
+        keys = []
+        for group_id in group_ids:
+            counts_keys.append(self._event_group_key(group_id))
+            keys.append(self._event_group_members_key(group_id))
+            keys.append(self._slot_meta_key(group_id))
+        if not counts_keys:
+            return 0
+        deleted = await self.redis.delete(*counts_keys, *keys)
+        # В локальном кеше лежат только хеши счётчиков
+        await self._publish_invalidation(*counts_keys)
+        logger.info("Invalidated %s cached event groups", deleted)
+        return deleted
+
+    # --- Seat reservations -----------------------------------------------------------
+
+    def _event_group_members_key(self, group_id: str) -> str:
+        return f"{self.EVENT_GROUP_PREFIX}:{group_id}:{self.EVENT_GROUP_MEMBERS_SUFFIX}"
+
+    async def prime_event_group(self, group_id: str, members: Dict[int, str]) -> Dict[str, int]:
+        """Load group state (user -> event) from DB snapshot; counts are derived from it."""
+        counts: Dict[str, int] = {}
+        for event_id in members.values():
+            counts[event_id] = counts.get(event_id, 0) + 1
+
+        counts_key = self._event_group_key(group_id)
+        members_key = self._event_group_members_key(group_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(counts_key, members_key)
+            pipe.hset(
+                counts_key,
+                mapping={"__refreshed_at__": str(time.time()), **{k: str(v) for k, v in counts.items()}},
+            )
+            pipe.hincrby(counts_key, "__version__", 1)
+            pipe.hset(members_key, mapping={"__primed__": "1", **{str(k): v for k, v in members.items()}})
+            pipe.expire(counts_key, self.EVENT_TTL_SECONDS)
+            pipe.expire(members_key, self.EVENT_TTL_SECONDS)
+            await pipe.execute()
+        await self._publish_invalidation(counts_key)
+        return counts
+
+    async def reserve_event_seat(
+        self,
+        group_id: str,
+        user_id: int,
+        event_id: str,
+        capacity: int,
+    ) -> Tuple[str, str]:
+        """Atomically reserve a seat in Redis. See RESERVE_SEAT_LUA for the result codes."""
+        status, detail = await self._reserve_seat_script(
+            keys=[self._event_group_key(group_id), self._event_group_members_key(group_id)],
+            args=[str(user_id), event_id, capacity, self.EVENT_TTL_SECONDS],
+        )
+        if status == "OK":
+            await self._publish_invalidation(self._event_group_key(group_id))
+        return status, detail
+
+    async def move_event_seat(self, group_id: str, user_id: int, from_event_id: str, to_event_id: str) -> bool:
+        """Move user's reserved seat (used for unregister and to compensate failed DB writes)."""
+        moved = await self._move_seat_script(
+            keys=[self._event_group_key(group_id), self._event_group_members_key(group_id)],
+            args=[str(user_id), from_event_id or "", to_event_id or ""],
+        )
+        if moved:
+            await self._publish_invalidation(self._event_group_key(group_id))
+        return bool(moved)
+
+    # --- Unit-capacity slot grids (VR-lab) ------------------------------------------
+
+    def _slot_meta_key(self, group_id: str) -> str:
+        return f"{self.EVENT_GROUP_PREFIX}:{group_id}:{self.EVENT_GROUP_SLOTS_SUFFIX}"
+
+    def _slot_bitmap_key(self, group_id: str, room: str) -> str:
+        return f"{self._slot_meta_key(group_id)}:{room}"
+
+    async def prime_slot_bitmaps(
+        self,
+        group_id: str,
+        layout_key: str,
+        slots_per_room: int,
+        taken: Dict[str, Iterable[int]],
+    ):
+        """Rebuild per-room bitmaps from a DB snapshot; layout_key guards against stale grids."""
+        meta_key = self._slot_meta_key(group_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(meta_key, *(self._slot_bitmap_key(group_id, room) for room in taken))
+            for room, indexes in taken.items():
+                key = self._slot_bitmap_key(group_id, room)
+                # Ключ нужной длины существует, даже если в аудитории нет занятых слотов
+                pipe.setbit(key, slots_per_room - 1, 0)
+                for index in indexes:
+                    pipe.setbit(key, index, 1)
+                pipe.expire(key, self.EVENT_TTL_SECONDS)
+            pipe.hset(meta_key, mapping={"layout": layout_key})
+            pipe.expire(meta_key, self.EVENT_TTL_SECONDS)
+            await pipe.execute()
+
+    async def get_slot_occupancy(
+        self,
+        group_id: str,
+        layout_key: str,
+        rooms: Iterable[str],
+        slots_per_room: int,
+    ) -> Optional[Dict[str, Tuple[bool, ...]]]:
+        """Return room -> taken flags per slot, or None if bitmaps are not primed."""
+        rooms_list = list(rooms)
+        # Один BITFIELD на аудиторию: битовая карта читается целым числом (GET вернул бы строку,
+        # а ответы декодируются как UTF-8), биты разбираются уже в Python
+        widths = [min(63, slots_per_room - offset) for offset in range(0, slots_per_room, 63)]
+        command: List = []
+        for offset, width in zip(range(0, slots_per_room, 63), widths):
+            command.extend(("GET", f"u{width}", offset))
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hget(self._slot_meta_key(group_id), "layout")
+            for room in rooms_list:
+                pipe.execute_command("BITFIELD", self._slot_bitmap_key(group_id, room), *command)
+            layout, *room_values = await pipe.execute()
+        if layout != layout_key:
             return None
 
-        cleaned = {k: int(v) for k, v in data.items() if not k.startswith("__")}
-        return cleaned
+        occupancy: Dict[str, Tuple[bool, ...]] = {}
+        for room, values in zip(rooms_list, room_values):
+            flags: List[bool] = []
+            for value, width in zip(values, widths):
+                # Бит 0 – старший бит прочитанного поля
+                flags.extend(bool(value >> (width - 1 - index) & 1) for index in range(width))
+            occupancy[room] = tuple(flags)
+        return occupancy
 
-    async def set_event_group_counts(self, group_id: str, counts: Dict[str, int]):
-        """Store counts for event group and refresh TTL."""
-        key = self._event_group_key(group_id)
-        mapping = {k: str(v) for k, v in counts.items()} if counts else {"__placeholder__": "0"}
+    async def claim_free_slot(
+        self,
+        group_id: str,
+        layout_key: str,
+        rooms: Iterable[str],
+        slots_per_room: int,
+    ) -> Tuple[str, Optional[str], Optional[int]]:
+        """Atomically take the earliest free slot. See CLAIM_SLOT_LUA for the result codes."""
+        rooms_list = list(rooms)
+        status, room_index, slot_index = await self._claim_slot_script(
+            keys=[self._slot_meta_key(group_id), *(self._slot_bitmap_key(group_id, room) for room in rooms_list)],
+            args=[layout_key, slots_per_room],
+        )
+        if status != "OK":
+            return status, None, None
+        return status, rooms_list[int(room_index)], int(slot_index)
+
+    async def set_slot_taken(self, group_id: str, layout_key: str, room: str, slot_index: int, taken: bool) -> bool:
+        """Mirror a committed registration change into the room bitmap (no-op if not primed)."""
+        applied = await self._set_slot_script(
+            keys=[self._slot_meta_key(group_id), self._slot_bitmap_key(group_id, room)],
+            args=[layout_key, slot_index, 1 if taken else 0],
+        )
+        return bool(applied)
+
+    # --- Per-user registrations -------------------------------------------------------
+
+    def _user_registrations_key(self, user_id: int) -> str:
+        return f"{self.USER_REGISTRATIONS_PREFIX}:{user_id}:registrations"
+
+    async def get_user_registrations(self, user_id: int) -> Tuple[Optional[Dict[str, str]], str, str]:
+        """Return cached group_id -> event_id mapping (None on miss), the current epoch and the hash version.
+
+        The hash is valid only if it was built under the current epoch; the epoch and
+        version are returned so a rebuild started after a miss can't overwrite a newer
+        bulk change or a registration written through in the meantime.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._user_registrations_key(user_id))
+            pipe.get(self.USER_REGISTRATIONS_EPOCH_KEY)
+            data, epoch = await pipe.execute()
+
+        epoch = epoch or "0"
+        version = data.get("__version__", "0")
+        if not data or data.get(self.USER_REGISTRATIONS_EPOCH_FIELD) != epoch:
+            return None, epoch, version
+        return {k: v for k, v in data.items() if not k.startswith("__")}, epoch, version
+
+    async def set_user_registrations(
+        self,
+        user_id: int,
+        registrations: Dict[str, str],
+        epoch: str,
+        expected_version: str,
+    ) -> bool:
+        """Replace cached registrations unless they were written through since expected_version was read."""
+        args: List = [expected_version, self.EVENT_TTL_SECONDS, self.USER_REGISTRATIONS_EPOCH_FIELD, epoch]
+        for group_id, event_id in registrations.items():
+            args.extend((group_id, event_id))
+        stored = await self._set_user_registrations_script(keys=[self._user_registrations_key(user_id)], args=args)
+        return bool(stored)
+
+    async def set_user_registration(self, user_id: int, group_id: str, event_id: Optional[str]):
+        """Write-through update of one group; None removes the registration.
+
+        Writing into a missing hash leaves it without an epoch, so it is still treated as a miss.
+        The version bump makes a rebuild that read the DB before this change drop its write.
+        """
+        key = self._user_registrations_key(user_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hincrby(key, "__version__", 1)
+            if event_id:
+                pipe.hset(key, group_id, event_id)
+            else:
+                pipe.hdel(key, group_id)
+            pipe.expire(key, self.EVENT_TTL_SECONDS)
+            await pipe.execute()
+
+    async def bump_registrations_epoch(self) -> int:
+        """Invalidate every cached per-user registrations hash after a bulk change."""
+        epoch = await self.redis.incr(self.USER_REGISTRATIONS_EPOCH_KEY)
+        logger.info("User registrations cache epoch bumped to %s", epoch)
+        return epoch
+
+    # --- Known users ------------------------------------------------------------------
+
+    def _known_user_key(self, user_id: int) -> str:
+        return f"{self.KNOWN_USER_PREFIX}:{user_id}"
+
+    async def is_known_user(self, user_id: int, fingerprint: str) -> bool:
+        """True if the user is stored in the DB with the profile the fingerprint was built from."""
+        key = self._known_user_key(user_id)
+        return await self._cached(key, lambda: self.redis.get(key)) == fingerprint
+
+    async def remember_known_user(self, user_id: int, fingerprint: str):
+        key = self._known_user_key(user_id)
+        await self.redis.set(key, fingerprint, ex=self.KNOWN_USER_TTL_SECONDS)
+        await self._publish_invalidation(key)
+
+    async def forget_known_user(self, user_id: int):
+        """Make the next /start write the user again, e.g. after the row disappeared from the DB."""
+        key = self._known_user_key(user_id)
         await self.redis.delete(key)
-        await self.redis.hset(key, mapping=mapping)
-        await self.redis.expire(key, self.EVENT_TTL_SECONDS)
\ No newline at end of file
+        await self._publish_invalidation(key)
+
+    # --- User snapshots ---------------------------------------------------------------
+
+    def _user_snapshot_key(self, user_id: int) -> str:
+        return f"{self.USER_SNAPSHOT_PREFIX}:{user_id}"
+
+    async def get_user_snapshot(self, user_id: int) -> Tuple[Optional[Dict[str, str]], str]:
+        """Return cached snapshot fields (None on miss) and the version to pass to set_user_snapshot."""
+        key = self._user_snapshot_key(user_id)
+        data = await self._cached(key, lambda: self.redis.hgetall(key))
+        version = data.get("__version__", "0")
+        if "exists" not in data:
+            return None, version
+        return {k: v for k, v in data.items() if not k.startswith("__")}, version
+
+    async def set_user_snapshot(self, user_id: int, fields: Dict[str, str], expected_version: str) -> bool:
+        """Store a snapshot read from the DB unless it was invalidated since expected_version was read."""
+        key = self._user_snapshot_key(user_id)
+        args: List = [expected_version, self.USER_SNAPSHOT_TTL_SECONDS]
+        for name, value in fields.items():
+            args.extend((name, value))
+        stored = await self._set_user_snapshot_script(keys=[key], args=args)
+        await self._publish_invalidation(key)
+        return bool(stored)
+
+    async def invalidate_user_snapshot(self, user_id: int):
+        key = self._user_snapshot_key(user_id)
+        await self._invalidate_user_snapshot_script(
+            keys=[key], args=[self.USER_SNAPSHOT_TTL_SECONDS, *self.USER_SNAPSHOT_FIELDS]
+        )
+        await self._publish_invalidation(key)
+
+    # --- Waitlists --------------------------------------------------------------------
+
+    def _waitlist_key(self, event_id: str) -> str:
+        return f"{self.WAITLIST_PREFIX}:{event_id}"
+
+    async def join_waitlist(self, event_id: str, user_id: int) -> int:
+        """Add user to the event's FIFO waitlist (keeps the original place); returns 1-based position."""
+        key = self._waitlist_key(event_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {str(user_id): time.time()}, nx=True)
+            pipe.zrank(key, str(user_id))
+            _, rank = await pipe.execute()
+        return rank + 1
+
+    async def leave_waitlist(self, event_id: str, user_id: int) -> bool:
+        return bool(await self.redis.zrem(self._waitlist_key(event_id), str(user_id)))
+
+    async def get_waitlists_state(
+        self,
+        event_ids: Iterable[str],
+        user_id: Optional[int],
+    ) -> Dict[str, Tuple[Optional[int], int]]:
+        """Return event_id -> (user's 1-based position or None, waitlist size) in one roundtrip."""
+        event_ids_list: List[str] = list(event_ids)
+        if not event_ids_list:
+            return {}
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event_id in event_ids_list:
+                key = self._waitlist_key(event_id)
+                pipe.zrank(key, str(user_id or ""))
+                pipe.zcard(key)
+            replies = await pipe.execute()
+        state = {}
+        for index, event_id in enumerate(event_ids_list):
+            rank, size = replies[2 * index], replies[2 * index + 1]
+            state[event_id] = (rank + 1 if rank is not None else None, size)
+        return state
+
+    async def park_waitlist_head(self, event_id: str) -> Optional[Tuple[int, float]]:
+        """Atomically take the first user off the waitlist into the parked hash; returns (user_id, joined_at)."""
+        popped = await self._park_waitlist_head_script(
+            keys=[self._waitlist_key(event_id), self.WAITLIST_PARKED_KEY],
+            args=[event_id, time.time()],
+        )
+        if not popped:
+            return None
+        member, score = popped
+        return int(member), float(score)
+
+    async def unpark_waitlist_entry(self, event_id: str, user_id: int, joined_at: float, requeue: bool):
+        """Release a parked user; requeue puts them back at their original place."""
+        await self._unpark_waitlist_entry_script(
+            keys=[self._waitlist_key(event_id), self.WAITLIST_PARKED_KEY],
+            args=[event_id, user_id, joined_at, 1 if requeue else 0],
+        )
+
+    async def requeue_stale_parked(self, older_than: float) -> int:
+        """Return users parked longer than older_than seconds ago (their promoter died) to their waitlists."""
+        deadline = time.time() - older_than
+        requeued = 0
+        for field, value in (await self.redis.hgetall(self.WAITLIST_PARKED_KEY)).items():
+            event_id, user_id = field.rsplit("\t", 1)
+            joined_at, parked_at = value.split("|", 1)
+            if float(parked_at) <= deadline:
+                await self.unpark_waitlist_entry(event_id, int(user_id), float(joined_at), requeue=True)
+                requeued += 1
+        return requeued
+
+    async def get_waitlisted_events(self) -> List[str]:
+        """Event ids that have a non-empty waitlist (empty zsets don't exist in Redis)."""
+        prefix = f"{self.WAITLIST_PREFIX}:"
+        return [key[len(prefix):] async for key in self.redis.scan_iter(match=f"{prefix}*")]
+
+    async def mark_waitlist_pending(self, group_id: str, event_id: str):
+        """Record that a seat was freed in the event; survives restarts until a promoter takes it."""
+        await self.redis.sadd(self.WAITLIST_PENDING_KEY, f"{group_id}\t{event_id}")
+
+    async def take_pending_waitlist(self) -> Optional[Tuple[str, str]]:
+        """Take one pending (group_id, event_id); each is handed to a single bot instance."""
+        member = await self.redis.spop(self.WAITLIST_PENDING_KEY)
+        if member is None:
+            return None
+        group_id, event_id = member.split("\t", 1)
+        return group_id, event_id
+
+    # --- Rendered schedule templates -------------------------------------------------
+
+    def _schedule_render_key(self, version: str, day: int) -> str:
+        return f"{self.SCHEDULE_RENDER_PREFIX}:{version}:{day}"
+
+    async def get_schedule_template(self, version: str, day: int) -> Optional[str]:
+        """Return serialized day schedule template for the timetable version."""
+        return await self.redis.get(self._schedule_render_key(version, day))
+
+    async def set_schedule_template(self, version: str, day: int, payload: str):
+        """Share serialized day schedule template with other bot instances."""
+        await self.redis.set(
+            self._schedule_render_key(version, day), payload, ex=self.SCHEDULE_RENDER_TTL_SECONDS
+        )
+
+    async def invalidate_schedule_templates(self, version: str) -> int:
+        """Drop shared schedule templates of an outdated timetable version."""
+        keys = [key async for key in self.redis.scan_iter(match=f"{self.SCHEDULE_RENDER_PREFIX}:{version}:*")]
+        if not keys:
+            return 0
+        return await self.redis.delete(*keys)
@@ -0,0 +1,183 @@
+"""Apply timetable.json changes to a running bot without a restart."""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.infrastructure.database import DatabaseManager, RedisManager
+from app.infrastructure.database.database import EventRegistrationRow
+from config.config import Config, Event, TimetableIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TimetableDiff:
+    """Difference between two timetable versions in terms of event identifiers."""
+
+    old_version: str
+    new_version: str
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    rekeyed: Dict[str, str] = field(default_factory=dict)
+    affected_groups: Set[str] = field(default_factory=set)
+    migrated_registrations: int = 0
+    dropped_registrations: List[EventRegistrationRow] = field(default_factory=list)
+    migration_error: Optional[str] = None
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.rekeyed)
+
+
+def _slot_key(event: Event) -> Tuple[str, str, str, str, str, bool]:
+    return (
+        event.start_date,
+        event.start_time,
+        event.end_date,
+        event.end_time,
+        event.location,
+        event.registration_required,
+    )
+
+
+def _match_unique(
+    removed: List[Event],
+    added: List[Event],
+    key,
+    rekeyed: Dict[str, str],
+    claimed: Set[str],
+) -> None:
+    """Pair removed and added events sharing a key when the pairing is unambiguous."""
+    candidates: Dict[object, List[Event]] = {}
+    for event in added:
+        if event.event_id in claimed:
+            continue
+        event_key = key(event)
+        if event_key is not None:
+            candidates.setdefault(event_key, []).append(event)
+
+    removed_by_key: Dict[object, List[Event]] = {}
+    for event in removed:
+        if event.event_id in rekeyed:
+            continue
+        event_key = key(event)
+        if event_key is not None:
+            removed_by_key.setdefault(event_key, []).append(event)
+
+    for event_key, old_events in removed_by_key.items():
+        new_events = candidates.get(event_key, [])
+        if len(old_events) == 1 and len(new_events) == 1:
+            rekeyed[old_events[0].event_id] = new_events[0].event_id
+            claimed.add(new_events[0].event_id)
+
+
+def diff_timetables(old: TimetableIndex, new: TimetableIndex) -> TimetableDiff:
+    """Report added/removed events and detect renamed ones whose event_id changed.
+
+    An event is considered re-keyed when a removed and an added event share the
+    same alias on the same day, or failing that the same time slot and location.
+    """
+    diff = TimetableDiff(old_version=old.version, new_version=new.version)
+
+    old_ids = set(old.events_by_id)
+    new_ids = set(new.events_by_id)
+    removed = [old.events_by_id[event_id] for event_id in sorted(old_ids - new_ids)]
+    added = [new.events_by_id[event_id] for event_id in sorted(new_ids - old_ids)]
+
+    claimed: Set[str] = set()
+    _match_unique(
+        removed,
+        added,
+        lambda event: (event.alias, event.start_date) if event.alias else None,
+        diff.rekeyed,
+        claimed,
+    )
+    _match_unique(removed, added, _slot_key, diff.rekeyed, claimed)
+
+    diff.removed = [event.event_id for event in removed if event.event_id not in diff.rekeyed]
+    diff.added = [event.event_id for event in added if event.event_id not in claimed]
+
+    for event in removed:
+        if event.group_id:
+            diff.affected_groups.add(event.group_id)
+    for event in added:
+        if event.group_id:
+            diff.affected_groups.add(event.group_id)
+
+    # Membership of a group changed: capacities are redistributed, counts must be rebuilt
+    for group_id in set(old.events_by_group) | set(new.events_by_group):
+        old_members = {event.event_id for event in old.get_group_events(group_id)}
+        new_members = {event.event_id for event in new.get_group_events(group_id)}
+        if old_members != new_members:
+            diff.affected_groups.add(group_id)
+
+    return diff
+
+
+class TimetableReloader:
+    """Reacts to ConfigProvider reloads: migrates registrations and drops stale caches."""
+
+    def __init__(self, db_manager: DatabaseManager, redis_manager: RedisManager):
+        self.db_manager = db_manager
+        self.redis_manager = redis_manager
+        self.last_diff: Optional[TimetableDiff] = None
+
+    async def on_config_reloaded(self, old_config: Optional[Config], new_config: Config) -> None:
+        if old_config is None:
+            return
+
+        old_index = old_config.timetable
+        new_index = new_config.timetable
+        if old_index.version == new_index.version:
+            self.last_diff = TimetableDiff(old_version=old_index.version, new_version=new_index.version)
+            return
+
+        diff = diff_timetables(old_index, new_index)
+
+        if diff.rekeyed:
+            event_mapping: Dict[str, str] = {}
+            group_mapping: Dict[str, str] = {}
+            for old_event_id, new_event_id in diff.rekeyed.items():
+                old_event = old_index.events_by_id[old_event_id]
+                new_event = new_index.events_by_id[new_event_id]
+                if not (old_event.group_id and new_event.group_id):
+                    continue
+                event_mapping[old_event_id] = new_event_id
+                if old_event.group_id != new_event.group_id:
+                    group_mapping[old_event_id] = new_event.group_id
+            try:
+                (
+                    diff.migrated_registrations,
+                    diff.dropped_registrations,
+                ) = await self.db_manager.rekey_event_registrations(event_mapping, group_mapping)
+            except Exception as exc:  # noqa: BLE001
+                # Регистрации остались под старыми event_id: администратор увидит это в ответе
+                logger.exception("Failed to migrate registrations for re-keyed events", exc_info=exc)
+                diff.migration_error = str(exc) or exc.__class__.__name__
+            if diff.migrated_registrations or diff.dropped_registrations:
+                await self.redis_manager.bump_registrations_epoch()
+
+        if diff.affected_groups:
+            await self.redis_manager.invalidate_event_groups(diff.affected_groups)
+
+        if new_config.redis.share_schedule_cache:
+            try:
+                await self.redis_manager.invalidate_schedule_templates(old_index.version)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("Failed to drop shared schedule templates: %s", exc)
+
+        self.last_diff = diff
+        logger.info(
+            "Timetable %s -> %s: added=%s removed=%s rekeyed=%s migrated=%s dropped=%s invalidated_groups=%s",
+            diff.old_version,
+            diff.new_version,
+            len(diff.added),
+            len(diff.removed),
+            len(diff.rekeyed),
+            diff.migrated_registrations,
+            len(diff.dropped_registrations),
+            len(diff.affected_groups),
+        )
@@ -1,10 +1,12 @@
+import asyncio
 import logging
 import json
 import os
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from types import MappingProxyType
+from typing import Awaitable, Callable, Dict, FrozenSet, Iterable, List, Any, Mapping, Optional, Tuple
 import hashlib
 from environs import Env
 
@@ -18,6 +20,18 @@ class DatabaseConfig:
     user: str
     password: str
     database: str
+    session_per_update: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = -1  # seconds, -1 – never recycle
+    pool_pre_ping: bool = False
+    pool_warmup: int = 0  # connections opened at startup
+    statement_cache_size: int = 100  # asyncpg prepared statements per connection
+    pgbouncer: bool = False  # transaction pooling: no prepared statement cache, no client-side pool
+    direct_host: Optional[str] = None  # LISTEN needs a session: bypass pgbouncer
+    direct_port: Optional[int] = None
+    auto_migrate: bool = False  # behind the migration head: upgrade on start instead of failing
 
 
 @dataclass
@@ -25,6 +39,13 @@ class RedisConfig:
     host: str
     port: int
     password: str
+    share_schedule_cache: bool = False
+    seat_reservation: bool = False
+    local_cache: bool = False
+    local_cache_size: int = 1024
+    local_cache_ttl: float = 30.0
+    reconcile_interval: float = 300.0
+    user_snapshots: bool = False
 
 
 @dataclass
@@ -49,7 +70,7 @@ class GoogleSheetsConfig:
     coach_spreadsheet_id: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Event:
     title: str
     description: str
@@ -62,28 +83,33 @@ class Event:
     group_title: Optional[str] = None
     capacity_override: Optional[int] = None
     alias: Optional[str] = None
-
-    @property
-    def start_datetime(self) -> datetime:
-        return datetime.strptime(f"{self.start_date} {self.start_time}", "%Y-%m-%d %H:%M")
-    
-    @property
-    def end_datetime(self) -> datetime:
-        return datetime.strptime(f"{self.end_date} {self.end_time}", "%Y-%m-%d %H:%M")
-
-    @property
-    def event_id(self) -> str:
-        """Deterministic identifier for the event, safe to store in DB."""
+    # Сетка слотов для событий с индивидуальной записью (VR-lab): аудитории и длина слота
+    slot_rooms: Optional[Tuple[str, ...]] = None
+    slot_minutes: Optional[int] = None
+    # Derived values are computed once in __post_init__ and never re-parsed
+    start_datetime: datetime = field(init=False, repr=False, compare=False)
+    end_datetime: datetime = field(init=False, repr=False, compare=False)
+    event_id: str = field(init=False, repr=False, compare=False)
+    group_id: Optional[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        start = datetime.strptime(f"{self.start_date} {self.start_time}", "%Y-%m-%d %H:%M")
+        end = datetime.strptime(f"{self.end_date} {self.end_time}", "%Y-%m-%d %H:%M")
+        object.__setattr__(self, "start_datetime", start)
+        object.__setattr__(self, "end_datetime", end)
+        if self.slot_rooms is not None:
+            object.__setattr__(self, "slot_rooms", tuple(str(room) for room in self.slot_rooms))
+
+        # Deterministic identifier for the event, safe to store in DB
         payload = f"{self.title}|{self.start_date}|{self.start_time}"
-        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        object.__setattr__(self, "event_id", hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16])
 
-    @property
-    def group_id(self) -> Optional[str]:
-        """Identifier for a parallel registration group, if applicable."""
-        if not self.registration_required:
-            return None
-        payload = f"{self.start_date}|{self.start_time}|parallel"
-        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+        # Identifier for a parallel registration group, if applicable
+        group_id = None
+        if self.registration_required:
+            group_payload = f"{self.start_date}|{self.start_time}|parallel"
+            group_id = hashlib.sha1(group_payload.encode("utf-8")).hexdigest()[:12]
+        object.__setattr__(self, "group_id", group_id)
 
     @property
     def short_title(self) -> str:
@@ -91,6 +117,113 @@ class Event:
         return self.alias or self.title
 
 
+CONFERENCE_DAYS = 5
+TIMETABLE_MEDIA_PATH = Path("assets") / "timetable" / "file_ids.json"
+CONFIG_SOURCE_PATHS: Tuple[Path, ...] = (
+    Path(".env"),
+    Path("config.json"),
+    Path("timetable.json"),
+    TIMETABLE_MEDIA_PATH,
+)
+MEDIA_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def _resolve_day_media(timetable_media: Mapping[str, str], day: int) -> Optional[str]:
+    """Pick file_id of the timetable illustration for a conference day."""
+    day_key = str(day)
+    file_id = timetable_media.get(day_key)
+    if file_id is None:
+        fallback_key = f"{day}.png"
+        if fallback_key == "0.png":
+            fallback_key = "1.png"
+        file_id = timetable_media.get(fallback_key)
+
+    if file_id is None:
+        ordered_filenames = sorted(
+            name for name in timetable_media.keys() if name.lower().endswith(MEDIA_EXTENSIONS)
+        )
+        if 0 <= day < len(ordered_filenames):
+            file_id = timetable_media.get(ordered_filenames[day])
+
+    return file_id or None
+
+
+@dataclass(frozen=True, slots=True)
+class TimetableIndex:
+    """Immutable lookup tables compiled from timetable.json at load time."""
+
+    start_date: datetime
+    version: str
+    events: Tuple[Event, ...]
+    days: Tuple[int, ...]
+    events_by_day: Mapping[int, Tuple[Event, ...]]
+    events_by_group: Mapping[str, Tuple[Event, ...]]
+    events_by_id: Mapping[str, Event]
+    media_by_day: Mapping[int, str]
+
+    @classmethod
+    def build(
+        cls,
+        start_date: datetime,
+        events: Iterable[Event],
+        timetable_media: Optional[Mapping[str, str]] = None,
+    ) -> "TimetableIndex":
+        ordered = tuple(sorted(events, key=lambda event: event.start_datetime))
+        start_day = start_date.date()
+
+        by_day: Dict[int, List[Event]] = {}
+        by_group: Dict[str, List[Event]] = {}
+        by_id: Dict[str, Event] = {}
+        for event in ordered:
+            day = (event.start_datetime.date() - start_day).days
+            by_day.setdefault(day, []).append(event)
+            if event.group_id:
+                by_group.setdefault(event.group_id, []).append(event)
+            by_id.setdefault(event.event_id, event)
+
+        days = tuple(sorted(day for day in by_day if 0 <= day < CONFERENCE_DAYS))
+        # Content hash: any edit of timetable.json (events or start date) produces a new version,
+        # the start date and number of days decide which day index an event falls on
+        payload = repr((start_day.isoformat(), CONFERENCE_DAYS, ordered))
+        version = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+        return cls(
+            start_date=start_date,
+            version=version,
+            events=ordered,
+            days=days,
+            events_by_day=MappingProxyType({day: tuple(items) for day, items in by_day.items()}),
+            events_by_group=MappingProxyType({group: tuple(items) for group, items in by_group.items()}),
+            events_by_id=MappingProxyType(by_id),
+            media_by_day=cls._build_media_map(by_day.keys(), timetable_media or {}),
+        )
+
+    @staticmethod
+    def _build_media_map(event_days: Iterable[int], timetable_media: Mapping[str, str]) -> Mapping[int, str]:
+        media: Dict[int, str] = {}
+        if timetable_media:
+            for day in set(range(CONFERENCE_DAYS)) | set(event_days):
+                file_id = _resolve_day_media(timetable_media, day)
+                if file_id:
+                    media[day] = file_id
+        return MappingProxyType(media)
+
+    def with_media(self, timetable_media: Mapping[str, str]) -> "TimetableIndex":
+        """Return a copy of the index with a recomputed day→file_id map."""
+        return replace(self, media_by_day=self._build_media_map(self.events_by_day.keys(), timetable_media))
+
+    def get_day_events(self, day: int) -> Tuple[Event, ...]:
+        return self.events_by_day.get(day, ())
+
+    def get_group_events(self, group_id: str) -> Tuple[Event, ...]:
+        return self.events_by_group.get(group_id, ())
+
+    def get_event(self, event_id: str) -> Optional[Event]:
+        return self.events_by_id.get(event_id)
+
+    def get_day_media(self, day: int) -> Optional[str]:
+        return self.media_by_day.get(day)
+
+
 @dataclass
 class Config:
     tg_bot: TgBot
@@ -101,39 +234,31 @@ class Config:
     start_date: datetime
     events: List[Event]
     timetable_media: Dict[str, str] = field(default_factory=dict)
+    timetable: TimetableIndex = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.timetable = TimetableIndex.build(self.start_date, self.events, self.timetable_media)
+
+    def set_timetable_media(self, timetable_media: Dict[str, str]) -> None:
+        """Replace timetable illustrations mapping and refresh the day→file_id index."""
+        self.timetable_media = timetable_media
+        self.timetable = self.timetable.with_media(timetable_media)
 
-    def get_day_events(self, day: int) -> List[Event]:
-        """Получить события для определенного дня конференции (0-4)"""
-        target_date = self.start_date.replace(
-            day=self.start_date.day + day
-        ).date()
-        
-        day_events = [
-            event for event in self.events
-            if datetime.strptime(event.start_date, "%Y-%m-%d").date() == target_date
-        ]
-        
-        # Сортируем по времени начала
-        return sorted(day_events, key=lambda x: x.start_datetime)
+    def get_day_events(self, day: int) -> Tuple[Event, ...]:
+        """Получить события для определенного дня конференции (0-4), отсортированные по времени"""
+        return self.timetable.get_day_events(day)
 
     def get_days_with_events(self) -> List[int]:
         """Получить список дней, в которые есть мероприятия"""
-        conference_dates = set()
-        for event in self.events:
-            event_date = datetime.strptime(event.start_date, "%Y-%m-%d").date()
-            day_diff = (event_date - self.start_date.date()).days
-            if 0 <= day_diff <= 4:  # Только дни 0-4
-                conference_dates.add(day_diff)
-        
-        return sorted(list(conference_dates))
+        return list(self.timetable.days)
 
 
-def load_config(path: str = None) -> Config:
+def load_config(path: str = None, override_env: bool = False) -> Config:
     """Загрузить конфигурацию из .env и JSON файлов"""
     
     # Загрузка переменных окружения
     env = Env()
-    env.read_env()
+    env.read_env(override=override_env)
 
     # Конфигурация бота
     tg_bot = TgBot(token=env.str("BOT_TOKEN"))
@@ -144,14 +269,33 @@ def load_config(path: str = None) -> Config:
         port=env.int("POSTGRES_PORT", 5432),
         user=env.str("POSTGRES_USER"),
         password=env.str("POSTGRES_PASSWORD"),
-        database=env.str("POSTGRES_DB")
+        database=env.str("POSTGRES_DB"),
+        session_per_update=env.bool("POSTGRES_SESSION_PER_UPDATE", False),
+        pool_size=env.int("POSTGRES_POOL_SIZE", 5),
+        max_overflow=env.int("POSTGRES_MAX_OVERFLOW", 10),
+        pool_timeout=env.float("POSTGRES_POOL_TIMEOUT", 30.0),
+        pool_recycle=env.int("POSTGRES_POOL_RECYCLE", -1),
+        pool_pre_ping=env.bool("POSTGRES_POOL_PRE_PING", False),
+        pool_warmup=env.int("POSTGRES_POOL_WARMUP", 0),
+        statement_cache_size=env.int("POSTGRES_STATEMENT_CACHE_SIZE", 100),
+        pgbouncer=env.bool("POSTGRES_PGBOUNCER", False),
+        direct_host=env.str("POSTGRES_DIRECT_HOST", None),
+        direct_port=env.int("POSTGRES_DIRECT_PORT", None),
+        auto_migrate=env.bool("POSTGRES_AUTO_MIGRATE", False),
     )
 
     # Конфигурация Redis
     redis_config = RedisConfig(
         host=env.str("REDIS_HOST"),
         port=env.int("REDIS_PORT", 6379),
-        password=env.str("REDIS_PASSWORD")
+        password=env.str("REDIS_PASSWORD"),
+        share_schedule_cache=env.bool("REDIS_SHARE_SCHEDULE_CACHE", False),
+        seat_reservation=env.bool("REDIS_SEAT_RESERVATION", False),
+        local_cache=env.bool("REDIS_LOCAL_CACHE", False),
+        local_cache_size=env.int("REDIS_LOCAL_CACHE_SIZE", 1024),
+        local_cache_ttl=env.float("REDIS_LOCAL_CACHE_TTL", 30.0),
+        reconcile_interval=env.float("REDIS_RECONCILE_INTERVAL", 300.0),
+        user_snapshots=env.bool("REDIS_USER_SNAPSHOTS", False),
     )
 
     # Конфигурация логирования
@@ -197,7 +341,7 @@ def load_config(path: str = None) -> Config:
     events = [Event(**event_data) for event_data in timetable_data]
 
     # Загрузка file_id для изображений расписания (если уже сохранены)
-    timetable_media_path = Path("assets") / "timetable" / "file_ids.json"
+    timetable_media_path = TIMETABLE_MEDIA_PATH
     timetable_media: Dict[str, str] = {}
     if timetable_media_path.exists():
         try:
@@ -221,3 +365,141 @@ def load_config(path: str = None) -> Config:
         events=events,
         timetable_media=timetable_media
     )
+
+
+ConfigListener = Callable[[Optional[Config], Config], Awaitable[None]]
+_FileState = Tuple[int, int]
+
+
+class ConfigProvider:
+    """Process-wide holder of the current Config.
+
+    Handlers read ``provider.config`` which is a plain attribute access; the
+    source files are only stat'ed by the background ``watch`` loop (or an
+    explicit ``refresh``) and re-parsed when their mtime and content hash change.
+    """
+
+    WATCH_INTERVAL_SECONDS = 5
+
+    def __init__(self, sources: Iterable[Path] = CONFIG_SOURCE_PATHS):
+        self._sources = tuple(sources)
+        self._config: Optional[Config] = None
+        self._admin_ids: FrozenSet[int] = frozenset()
+        self._file_states: Dict[Path, Optional[_FileState]] = {}
+        self._file_digests: Dict[Path, Optional[str]] = {}
+        self._listeners: List[ConfigListener] = []
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def config(self) -> Config:
+        if self._config is None:
+            self.load()
+        return self._config
+
+    @property
+    def admin_ids(self) -> FrozenSet[int]:
+        if self._config is None:
+            self.load()
+        return self._admin_ids
+
+    def is_admin(self, user_id: int) -> bool:
+        return user_id in self.admin_ids
+
+    def add_listener(self, listener: ConfigListener) -> None:
+        """Register coroutine called with (old, new) config after every reload."""
+        self._listeners.append(listener)
+
+    def load(self) -> Config:
+        """Synchronously (re)load configuration and remember source signatures."""
+        states, digests = self._snapshot_sources()
+        self._swap(load_config())
+        self._file_states, self._file_digests = states, digests
+        return self._config
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reload configuration if any source file changed. Returns True on reload."""
+        async with self._refresh_lock:
+            if self._config is None:
+                await asyncio.to_thread(self.load)
+                return True
+
+            changed, states, digests = await asyncio.to_thread(self._detect_changes)
+            if not changed and not force:
+                self._file_states, self._file_digests = states, digests
+                return False
+
+            new_config = await asyncio.to_thread(load_config, None, True)
+            old_config = self._swap(new_config)
+            self._file_states, self._file_digests = states, digests
+            logger.info("Configuration reloaded (%s events)", len(new_config.events))
+
+        for listener in self._listeners:
+            try:
+                await listener(old_config, new_config)
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Config reload listener failed", exc_info=exc)
+        return True
+
+    async def watch(self, interval: float = WATCH_INTERVAL_SECONDS) -> None:
+        """Poll source files and hot-reload configuration until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Failed to reload configuration", exc_info=exc)
+
+    def _swap(self, new_config: Config) -> Optional[Config]:
+        old_config = self._config
+        self._admin_ids = frozenset(new_config.logging.admin_ids)
+        self._config = new_config
+        return old_config
+
+    def _detect_changes(self) -> Tuple[bool, Dict[Path, Optional[_FileState]], Dict[Path, Optional[str]]]:
+        states: Dict[Path, Optional[_FileState]] = {}
+        digests = dict(self._file_digests)
+        changed = False
+        for path in self._sources:
+            state = self._file_state(path)
+            states[path] = state
+            if state == self._file_states.get(path):
+                continue
+            # mtime moved: compare content so a plain `touch` does not trigger reload
+            digest = self._file_digest(path)
+            if digest != self._file_digests.get(path):
+                changed = True
+            digests[path] = digest
+        return changed, states, digests
+
+    def _snapshot_sources(self) -> Tuple[Dict[Path, Optional[_FileState]], Dict[Path, Optional[str]]]:
+        states = {path: self._file_state(path) for path in self._sources}
+        digests = {path: self._file_digest(path) for path in self._sources}
+        return states, digests
+
+    @staticmethod
+    def _file_state(path: Path) -> Optional[_FileState]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    @staticmethod
+    def _file_digest(path: Path) -> Optional[str]:
+        try:
+            return hashlib.sha1(path.read_bytes()).hexdigest()
+        except FileNotFoundError:
+            return None
+
+
+_config_provider: Optional[ConfigProvider] = None
+
+
+def get_config_provider() -> ConfigProvider:
+    """Return the process-wide ConfigProvider, creating it on first use."""
+    global _config_provider
+    if _config_provider is None:
+        _config_provider = ConfigProvider()
+    return _config_provider
@@ -5,15 +5,15 @@ import os
 
 from app.bot.bot import main
 from app.infrastructure.logging import setup_logging, cleanup_old_logs
-from config.config import load_config
+from config.config import get_config_provider
 
 # Добавим путь к корневой директории проекта
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 
 if __name__ == "__main__":
-    # Загружаем конфигурацию
-    config = load_config()
+    # Загружаем конфигурацию (тот же экземпляр затем использует бот)
+    config = get_config_provider().config
     
     # Настройка логирования с параметрами из конфигурации
     setup_logging(
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for DatabaseManager sessions with POSTGRES_SESSION_PER_UPDATE off and on.
+Runs one read and one write in both modes against the configured database.
+"""
+
+import asyncio
+import dataclasses
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete
+
+from app.infrastructure.database.database import DatabaseManager
+from app.infrastructure.database.models import User
+from config.config import load_config
+
+TEST_USER_ID = 9999999998
+
+
+async def run_read_and_write(db_manager: DatabaseManager) -> bool:
+    created = await db_manager.upsert_user(TEST_USER_ID, "test_session_user", "Test Session User")
+    user = await db_manager.get_user(TEST_USER_ID)
+    return created is True and user is not None and user.id == TEST_USER_ID
+
+
+async def test_mode(session_per_update: bool) -> bool:
+    label = "on" if session_per_update else "off"
+    print(f"Testing with POSTGRES_SESSION_PER_UPDATE={label}")
+
+    config = load_config()
+    db_manager = DatabaseManager(dataclasses.replace(config.db, session_per_update=session_per_update))
+    await db_manager.init()
+
+    try:
+        if session_per_update:
+            async with db_manager.unit_of_work():
+                ok = await run_read_and_write(db_manager)
+            # После выхода из unit of work запись должна быть закоммичена
+            ok = ok and await db_manager.get_user(TEST_USER_ID) is not None
+        else:
+            ok = await run_read_and_write(db_manager)
+        print(f"  {'✅' if ok else '❌'} Read and write {'succeeded' if ok else 'failed'}")
+        return ok
+    except Exception as e:
+        print(f"  ❌ Error: {e}")
+        return False
+    finally:
+        # Clean up test user
+        async with db_manager.sessionmaker() as session:
+            await session.execute(delete(User).where(User.id == TEST_USER_ID))
+            await session.commit()
+        await db_manager.close()
+
+
+async def main():
+    """Main test function"""
+    print("🚀 Starting session per update test")
+    print("=" * 60)
+
+    results = [await test_mode(False), await test_mode(True)]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("🎉 ALL TESTS PASSED")
+    else:
+        print("❌ TESTS FAILED")
+    return all(results)
+
+
+if __name__ == "__main__":
+    result = asyncio.run(main())
+    sys.exit(0 if result else 1)
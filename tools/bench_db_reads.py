@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of hot DatabaseManager reads: ORM entities vs Core rows.
+
+For every lookup runs N sequential calls in both variants and reports mean and
+p95 latency per call and the peak memory allocated per call (tracemalloc).
+Variant "orm" reproduces the old lookups that load full entities, "core" calls
+the current DatabaseManager methods built on module-level Core statements.
+
+Usage: python tools/bench_db_reads.py --user-id 123 [--calls 2000] [--group-id vr_lab:20251024]
+Read-only: the user (and their registrations) should exist for meaningful numbers.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Awaitable, Callable, List, Tuple
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import select
+
+from config.config import load_config
+from app.infrastructure.database import DatabaseManager, EventRegistration, User
+from app.infrastructure.database.models import CoachSessionRequest
+
+WARMUP_CALLS = 50
+
+
+def orm_lookups(db_manager: DatabaseManager, user_id: int, group_id: str) -> List[Tuple[str, Callable[[], Awaitable]]]:
+    """Old implementations: full ORM entities through a fresh session."""
+
+    async def get_user():
+        async with db_manager.sessionmaker() as session:
+            result = await session.execute(select(User).where(User.id == user_id))
+            return result.scalar_one_or_none()
+
+    async def check_user_already_registered():
+        user = await get_user()
+        return user.debate_reg if user else None
+
+    async def get_user_event_registration():
+        async with db_manager.sessionmaker() as session:
+            result = await session.execute(
+                select(EventRegistration).where(
+                    EventRegistration.user_id == user_id,
+                    EventRegistration.group_id == group_id,
+                )
+            )
+            return result.scalar_one_or_none()
+
+    async def get_last_coach_session_request():
+        async with db_manager.sessionmaker() as session:
+            result = await session.execute(
+                select(CoachSessionRequest)
+                .where(CoachSessionRequest.user_id == user_id)
+                .order_by(CoachSessionRequest.created_at.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+
+    return [
+        ("get_user", get_user),
+        ("check_user_already_registered", check_user_already_registered),
+        ("get_user_event_registration", get_user_event_registration),
+        ("get_last_coach_session_request", get_last_coach_session_request),
+    ]
+
+
+def core_lookups(db_manager: DatabaseManager, user_id: int, group_id: str) -> List[Tuple[str, Callable[[], Awaitable]]]:
+    return [
+        ("get_user", lambda: db_manager.get_user(user_id)),
+        ("check_user_already_registered", lambda: db_manager.check_user_already_registered(user_id)),
+        ("get_user_event_registration", lambda: db_manager.get_user_event_registration(user_id, group_id)),
+        ("get_last_coach_session_request", lambda: db_manager.get_last_coach_session_request(user_id)),
+    ]
+
+
+async def measure(call: Callable[[], Awaitable], calls: int) -> Tuple[float, float, float]:
+    """Return (mean ms, p95 ms, peak allocated bytes per call)."""
+    for _ in range(WARMUP_CALLS):
+        await call()
+
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    # Пиковый прирост памяти за вызов – отдельный проход, tracemalloc искажает задержки
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(calls):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await call()
+        _, peak = tracemalloc.get_traced_memory()
+        allocated += peak - current
+    tracemalloc.stop()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return statistics.mean(latencies), p95, allocated / calls
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hot DatabaseManager reads")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--user-id", type=int, required=True)
+    parser.add_argument("--group-id", default="vr_lab:20251024")
+    args = parser.parse_args()
+
+    config = load_config()
+    db_manager = DatabaseManager(config.db)
+    await db_manager.init()
+
+    try:
+        orm = orm_lookups(db_manager, args.user_id, args.group_id)
+        core = core_lookups(db_manager, args.user_id, args.group_id)
+
+        print("=" * 78)
+        print(f"Вызовов на метод: {args.calls} · пользователь: {args.user_id}")
+        print(f"{'Метод':<32}{'Режим':<7}{'Среднее, мс':>13}{'p95, мс':>10}{'Байт/вызов':>14}")
+        print("-" * 78)
+        for (name, orm_call), (_, core_call) in zip(orm, core):
+            for mode, call in (("orm", orm_call), ("core", core_call)):
+                mean, p95, allocated = await measure(call, args.calls)
+                print(f"{name:<32}{mode:<7}{mean:>13.3f}{p95:>10.3f}{allocated:>14.0f}")
+        print("=" * 78)
+    finally:
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Benchmark seat allocation for one parallel group under concurrent load.
+
+Creates temporary users, fires concurrent registrations for a single event
+and reports registrations/second together with the outcome breakdown.
+Mode "counter" uses DatabaseManager (event_capacity counter), mode "legacy"
+reproduces the old SELECT ... FOR UPDATE over all registrations of the event.
+
+Usage: python tools/bench_event_registration.py [--users 500] [--capacity 115] [--mode counter|legacy]
+WARNING: writes to the configured database; temporary rows are removed afterwards.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config.config import load_config
+from app.infrastructure.database import DatabaseManager, EventCapacity, EventRegistration, User
+from app.infrastructure.database.database import EventRegistrationStatus
+
+BENCH_USER_ID_BASE = 9_900_000_000
+BENCH_EVENT_ID = "bench_event"
+BENCH_GROUP_ID = "bench_group"
+
+
+async def legacy_register(db_manager: DatabaseManager, user_id: int, capacity: int) -> EventRegistrationStatus:
+    """Old allocation: lock and transfer every registration row of the event."""
+    async with db_manager.sessionmaker() as session:
+        try:
+            async with session.begin():
+                count_stmt = (
+                    select(EventRegistration.id)
+                    .where(EventRegistration.event_id == BENCH_EVENT_ID)
+                    .with_for_update()
+                )
+                current_count = len((await session.execute(count_stmt)).scalars().all())
+                if current_count >= capacity:
+                    return EventRegistrationStatus.GROUP_FULL
+                session.add(
+                    EventRegistration(
+                        user_id=user_id,
+                        event_id=BENCH_EVENT_ID,
+                        group_id=BENCH_GROUP_ID,
+                        registered_at=datetime.now(timezone.utc),
+                    )
+                )
+                await session.flush()
+                return EventRegistrationStatus.SUCCESS
+        except Exception:
+            return EventRegistrationStatus.ERROR
+
+
+async def cleanup(db_manager: DatabaseManager, users: int) -> None:
+    async with db_manager.sessionmaker() as session:
+        async with session.begin():
+            await session.execute(delete(EventCapacity).where(EventCapacity.event_id == BENCH_EVENT_ID))
+            await session.execute(
+                delete(User).where(User.id.between(BENCH_USER_ID_BASE, BENCH_USER_ID_BASE + users))
+            )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark event seat allocation")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=115)
+    parser.add_argument("--mode", choices=("counter", "legacy"), default="counter")
+    args = parser.parse_args()
+
+    config = load_config()
+    db_manager = DatabaseManager(config.db)
+    await db_manager.init()
+
+    user_ids = [BENCH_USER_ID_BASE + index for index in range(args.users)]
+    try:
+        await cleanup(db_manager, args.users)
+        async with db_manager.sessionmaker() as session:
+            async with session.begin():
+                await session.execute(
+                    pg_insert(User)
+                    .values([{"id": user_id, "visible_name": f"bench {user_id}"} for user_id in user_ids])
+                    .on_conflict_do_nothing()
+                )
+
+        if args.mode == "counter":
+            async def register(user_id: int) -> EventRegistrationStatus:
+                result = await db_manager.register_user_for_event(
+                    user_id, BENCH_EVENT_ID, BENCH_GROUP_ID, args.capacity
+                )
+                return result.status
+        else:
+            register = lambda user_id: legacy_register(db_manager, user_id, args.capacity)  # noqa: E731
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(register(user_id) for user_id in user_ids))
+        elapsed = time.perf_counter() - started
+
+        async with db_manager.sessionmaker() as session:
+            stored = len(
+                (
+                    await session.execute(
+                        select(EventRegistration.id).where(EventRegistration.event_id == BENCH_EVENT_ID)
+                    )
+                ).all()
+            )
+
+        breakdown = Counter(status.value for status in statuses)
+        print("=" * 60)
+        print(f"Режим: {args.mode} · пользователей: {args.users} · мест: {args.capacity}")
+        print(f"Время: {elapsed:.3f} с · {args.users / elapsed:.1f} попыток/с")
+        print(f"Успешных регистраций: {breakdown.get('success', 0)} ({breakdown.get('success', 0) / elapsed:.1f}/с)")
+        print(f"Итоги: {dict(breakdown)}")
+        print(f"Записей в БД: {stored} {'✅' if stored <= args.capacity else '❌ превышен лимит'}")
+        print("=" * 60)
+    finally:
+        await cleanup(db_manager, args.users)
+        await db_manager.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -27,8 +27,7 @@ async def show_statistics():
     try:
         # Get data from database and Redis
         db_counts = await db_manager.get_debate_registrations_count()
-        redis_counts = await redis_manager.get_debate_counts()
-        remaining = await redis_manager.get_remaining_slots()
+        redis_counts, remaining, _ = await redis_manager.get_debate_overview()
         
         print("=" * 60)
         print("СТАТИСТИКА РЕГИСТРАЦИИ НА ДЕБАТЫ")
@@ -11,7 +11,7 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from config.config import load_config
-from app.infrastructure.database import DatabaseManager
+from app.infrastructure.database import DatabaseManager, RedisManager
 
 TARGET_ALIASES: List[str] = []
 
@@ -64,6 +64,8 @@ async def main() -> None:
 
     db_manager = DatabaseManager(config.db)
     await db_manager.init()
+    redis_manager = RedisManager(config.redis)
+    await redis_manager.init()
 
     try:
         deleted_aliases = 0
@@ -74,8 +76,15 @@ async def main() -> None:
         for slot, group_id, matches in slot_groups:
             deleted = await db_manager.delete_event_registrations_by_group(group_id)
             deleted_groups.append((slot, group_id, deleted, matches))
+
+        # Кэш записей пользователей и счётчики групп больше не соответствуют БД
+        await redis_manager.bump_registrations_epoch()
+        affected_groups = {event.group_id for _, event in target_events if event.group_id}
+        affected_groups.update(group_id for _, group_id, _ in slot_groups)
+        await redis_manager.invalidate_event_groups(affected_groups)
     finally:
         await db_manager.close()
+        await redis_manager.close()
 
     if target_events:
         readable_targets = ", ".join(f"{alias} ({event.event_id})" for alias, event in target_events)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Report how many bytes the timetable dialog keeps in FSM storage per user.
+
+Compares the old layout (serialized events, groups and capacities copied into
+dialog_data on every render) with the current one (references only).
+Usage: python tools/fsm_size_report.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.config import load_config
+from app.bot.dialogs.timetable.registry import TOTAL_PARALLEL_CAPACITY
+from app.bot.dialogs.timetable.utils import build_day_schedule, distribute_capacity, serialize_event
+
+SAMPLE_USER_ID = 5188011832
+
+
+def _size(payload: dict) -> int:
+    # RedisStorage сериализует данные стандартным json.dumps (ensure_ascii=True)
+    return len(json.dumps(payload).encode("utf-8"))
+
+
+def legacy_dialog_data(config, day: int) -> dict:
+    day_events = list(config.get_day_events(day))
+    _, raw_group_map = build_day_schedule(day_events)
+    event_map = {event.event_id: serialize_event(event) for event in day_events}
+    return {
+        "current_user_id": SAMPLE_USER_ID,
+        "selected_day": day,
+        "event_map": event_map,
+        "event_to_group": {
+            event_id: payload["group_id"] if payload.get("registration_required") else None
+            for event_id, payload in event_map.items()
+        },
+        "group_map": {
+            group_id: [event_map[event.event_id] for event in events]
+            for group_id, events in raw_group_map.items()
+        },
+        "group_capacities": {
+            group_id: distribute_capacity(TOTAL_PARALLEL_CAPACITY, events)
+            for group_id, events in raw_group_map.items()
+        },
+        "user_group_registrations": {group_id: events[0].event_id for group_id, events in raw_group_map.items()},
+    }
+
+
+def current_dialog_data(config, day: int) -> dict:
+    _, raw_group_map = build_day_schedule(list(config.get_day_events(day)))
+    return {
+        "current_user_id": SAMPLE_USER_ID,
+        "selected_day": day,
+        "timetable_version": config.timetable.version,
+        "user_group_registrations": {group_id: events[0].event_id for group_id, events in raw_group_map.items()},
+    }
+
+
+def main():
+    config = load_config()
+
+    print(f"{'День':<6}{'До, байт':>12}{'После, байт':>14}{'Экономия':>10}")
+    for day in config.get_days_with_events():
+        before = _size(legacy_dialog_data(config, day))
+        after = _size(current_dialog_data(config, day))
+        print(f"{day:<6}{before:>12}{after:>14}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -40,6 +40,8 @@ async def register_user_to_case(user_id: int, case_number: int):
     
     redis_manager = RedisManager(config.redis)
     await redis_manager.init()
+    if config.redis.user_snapshots:
+        db_manager.attach_user_snapshots(redis_manager)
     
     try:
         # 1. Проверить существует ли пользователь
@@ -94,7 +96,7 @@ async def register_user_to_case(user_id: int, case_number: int):
         
         # 7. Обновить запись в базе данных
         print("💾 Обновляю запись в базе данных...")
-        await db_manager.update_user_debate_registration(user_id, case_number)
+        await db_manager.update_user_debate_registration(user_id, case_number, counts_applied=True)
         
         # 8. Синхронизировать Redis с базой данных (для консистентности)
         print("🔄 Синхронизирую кэш с базой данных...")